@@ -24,6 +24,10 @@ class ActionType(Enum):
     IMAGE_CLICK = "image_click"
     IMAGE_WAIT_CLICK = "image_wait_click"
     IMAGE_CHECK = "image_check"
+    IMAGE_FIND_ALL = "image_find_all"
+    PIXEL_CHECK = "pixel_check"
+    WAIT_STABLE = "wait_stable"
+    WAIT_REGION_CHANGE = "wait_region_change"
     ACTION_GROUP_REF = "action_group_ref"
 
 
@@ -75,12 +79,16 @@ class Action:
     
     @property
     def condition_marker(self) -> str:
-        if self.action_type == ActionType.IMAGE_CHECK:
+        if self.action_type in [ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL]:
             image_name = os.path.basename(self.params.get('image_path', ''))
             if image_name:
                 name_without_ext = os.path.splitext(image_name)[0]
                 safe_name = name_without_ext.replace(' ', '_').replace('-', '_')
                 return f"${safe_name}"
+        if self.action_type == ActionType.PIXEL_CHECK:
+            variable = str(self.params.get('variable', '')).strip()
+            if variable:
+                return f"${variable.replace(' ', '_').replace('-', '_')}"
         return ""
     
     def _generate_description(self) -> str:
@@ -105,18 +113,23 @@ class Action:
             ActionType.IMAGE_CLICK: f"图片点击: {os.path.basename(self.params.get('image_path', ''))}",
             ActionType.IMAGE_WAIT_CLICK: f"等待图片点击: {os.path.basename(self.params.get('image_path', ''))}",
             ActionType.IMAGE_CHECK: f"检查图片: {os.path.basename(self.params.get('image_path', ''))}",
+            ActionType.IMAGE_FIND_ALL: f"查找全部图片: {os.path.basename(self.params.get('image_path', ''))}",
+            ActionType.PIXEL_CHECK: f"检查像素颜色: {self.params.get('variable', '')}",
+            ActionType.WAIT_STABLE: f"等待画面稳定 {self.params.get('stable_ms', 300)} 毫秒 (最多 {self.params.get('timeout', 10.0)} 秒)",
+            ActionType.WAIT_REGION_CHANGE: f"等待区域{'停止变化' if self.params.get('mode') == 'stable' else '变化'} (最多 {self.params.get('timeout', 10.0)} 秒)",
             ActionType.ACTION_GROUP_REF: f"📁 动作组引用: {self.params.get('group_name', '未知')}",
         }
         return name_prefix + delay_prefix + desc_map.get(self.action_type, "未知动作") + bg_suffix + repeat_suffix
     
-    def execute(self, window_offset: Optional[Tuple[int, int]] = None, should_stop: Optional[Callable[[], bool]] = None, local_group_manager=None) -> bool:
+    def execute(self, window_offset: Optional[Tuple[int, int]] = None, should_stop: Optional[Callable[[], bool]] = None, local_group_manager=None,
+                search_region: Optional[Tuple[int, int, int, int]] = None) -> bool:
         repeat = max(1, self.repeat_count)
         for i in range(repeat):
             if should_stop and should_stop():
                 return False
             if i > 0:
                 time.sleep(0.1)
-            result = self._execute_once(window_offset, should_stop, local_group_manager)
+            result = self._execute_once(window_offset, should_stop, local_group_manager, search_region)
             if not result:
                 return False
         return True
@@ -146,7 +159,42 @@ class Action:
         except Exception as e:
             print(f"[激活窗口失败] {e}")
     
-    def _execute_once(self, window_offset: Optional[Tuple[int, int]] = None, should_stop: Optional[Callable[[], bool]] = None, local_group_manager=None) -> bool:
+    def _load_template(self, image_path: str):
+        from .template_cache import TemplateCache
+        template = TemplateCache.get_instance().get(image_path)
+        if template is None:
+            raise Exception(f"图片文件无法读取: {image_path}")
+        return template
+    
+    def _match_options(self):
+        from .image_matcher import MatchOptions
+        return MatchOptions.from_params(self.params)
+    
+    def _anchor(self):
+        """返回 (锚点模板, 锚点路径, 偏移)；未设置锚点或偏移时返回 None"""
+        from .image_matcher import ImageMatcher
+        anchor_path = self.params.get('anchor_image', '')
+        if not anchor_path:
+            return None
+        offset = ImageMatcher.parse_offset(self.params.get('anchor_offset', ''))
+        if offset is None:
+            return None
+        if not os.path.exists(anchor_path):
+            raise Exception(f"锚点图片不存在: {anchor_path}")
+        return self._load_template(anchor_path), anchor_path, offset
+    
+    def _locate_on_screen(self, template, confidence: float, search_region: Optional[Tuple[int, int, int, int]] = None,
+                          image_path: Optional[str] = None):
+        from .image_matcher import ImageMatcher
+        matcher = ImageMatcher.get_instance()
+        anchor = self._anchor()
+        if anchor is not None:
+            return matcher.locate_anchored_on_screen(anchor[0], template, confidence, anchor[2], search_region,
+                                                     anchor[1], image_path, self._match_options())
+        return matcher.locate_on_screen(template, confidence, search_region, image_path, self._match_options())
+    
+    def _execute_once(self, window_offset: Optional[Tuple[int, int]] = None, should_stop: Optional[Callable[[], bool]] = None, local_group_manager=None,
+                      search_region: Optional[Tuple[int, int, int, int]] = None) -> bool:
         if self.delay_before > 0:
             end_time = time.time() + self.delay_before
             while time.time() < end_time:
@@ -220,10 +268,50 @@ class Action:
             elif self.action_type == ActionType.WAIT:
                 time.sleep(self.params.get('seconds', 1.0))
             
+            elif self.action_type == ActionType.WAIT_STABLE:
+                from .change_detector import wait_until_stable
+                from .frame_grabber import FrameGrabber
+                region = self.params.get('region')
+                if not region or len(region) != 4 or region[2] <= 0 or region[3] <= 0:
+                    region = search_region
+                # 区域和绑定窗口都没有时只检测主屏幕 (FrameGrabber.grab(None))，副屏需设置检测区域
+                grabber = FrameGrabber.get_instance()
+                stable = wait_until_stable(lambda: grabber.grab(region, max_age=0).image,
+                                           float(self.params.get('threshold', 4.0)),
+                                           int(self.params.get('stable_ms', 300)) / 1000.0,
+                                           float(self.params.get('timeout', 10.0)), should_stop)
+                if should_stop and should_stop():
+                    return False
+                if not stable:
+                    print(f"[等待画面稳定] {self.params.get('timeout', 10.0)} 秒内画面未稳定，继续执行")
+            
+            elif self.action_type == ActionType.WAIT_REGION_CHANGE:
+                from .change_detector import wait_for_region_change
+                from .frame_grabber import FrameGrabber
+                region = self.params.get('region')
+                if not region or len(region) != 4 or region[2] <= 0 or region[3] <= 0:
+                    region = search_region
+                # 同等待画面稳定: 未设置区域时只检测主屏幕
+                grabber = FrameGrabber.get_instance()
+                triggered = wait_for_region_change(lambda: grabber.grab(region, max_age=0).image,
+                                                   self.params.get('mode', 'change'),
+                                                   float(self.params.get('threshold', 4.0)),
+                                                   int(self.params.get('stable_ms', 300)) / 1000.0,
+                                                   float(self.params.get('timeout', 10.0)), should_stop,
+                                                   float(self.params.get('sample_rate', 30)))
+                if should_stop and should_stop():
+                    return False
+                if not triggered:
+                    print(f"[等待区域变化] {self.params.get('timeout', 10.0)} 秒内未等到区域变化，继续执行")
+            
             elif self.action_type == ActionType.SCREENSHOT:
                 filename = self.params.get('filename', 'screenshot.png')
                 region = self.params.get('region')
-                pyautogui.screenshot(filename, region=region)
+                from .capture import save_image
+                from .frame_grabber import FrameGrabber
+                frame = FrameGrabber.get_instance().grab(region, max_age=0)
+                if not save_image(frame.image, filename):
+                    raise Exception(f"截图保存失败: {filename}")
             
             elif self.action_type == ActionType.MOUSE_MOVE_RELATIVE:
                 if window_offset:
@@ -272,18 +360,25 @@ class Action:
                 if not os.path.exists(image_path):
                     raise Exception(f"图片文件不存在: {image_path}")
                 
+                template = self._load_template(image_path)
+                
                 if not self.background_mode:
                     self._activate_window_for_image()
                 
+                from .match_telemetry import MatchTelemetry
+                telemetry = MatchTelemetry.get_instance()
                 location = None
-                for attempt in range(3):
-                    try:
-                        location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-                        if location:
-                            break
-                    except pyautogui.ImageNotFoundException:
-                        pass
-                    time.sleep(0.2)
+                with telemetry.measure(image_path, template, confidence) as probe:
+                    for attempt in range(3):
+                        try:
+                            with probe.attempt():
+                                location = self._locate_on_screen(template, confidence, search_region, image_path)
+                            if location:
+                                break
+                        except pyautogui.ImageNotFoundException:
+                            pass
+                        time.sleep(0.2)
+                    probe.outcome = telemetry.HIT if location else telemetry.MISS
                 
                 if location:
                     center = pyautogui.center(location)
@@ -313,23 +408,53 @@ class Action:
                 if not os.path.exists(image_path):
                     raise Exception(f"图片文件不存在: {image_path}")
                 
+                template = self._load_template(image_path)
+                
                 if not self.background_mode:
                     self._activate_window_for_image()
                 
+                from .image_matcher import ImageMatcher
+                from .change_detector import FrameChangeDetector, AdaptiveInterval
+                
+                matcher = ImageMatcher.get_instance()
+                options = self._match_options()
+                anchor = self._anchor()
+                templates = [template] + ([anchor[0]] if anchor else [])
+                # 未指定区域时每个显示器各截一帧，各自判断画面是否变化
+                detectors = {}
+                interval = AdaptiveInterval()
+                
+                from .match_telemetry import MatchTelemetry
+                telemetry = MatchTelemetry.get_instance()
                 location = None
                 start_time = time.time()
-                while (time.time() - start_time) < timeout:
-                    if should_stop and should_stop():
-                        return False
-                    try:
-                        location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-                        if location:
-                            break
-                    except pyautogui.ImageNotFoundException:
-                        pass
-                    except Exception:
-                        pass
-                    time.sleep(0.5)
+                with telemetry.measure(image_path, template, confidence) as probe:
+                    while (time.time() - start_time) < timeout:
+                        if should_stop and should_stop():
+                            return False
+                        try:
+                            changed = [frame for frame in matcher.grab_frames(templates, search_region)
+                                       if detectors.setdefault(frame.region, FrameChangeDetector()).update(frame.image)]
+                            if changed:
+                                with probe.attempt():
+                                    for frame in changed:
+                                        if anchor is not None:
+                                            location = matcher.locate_anchored(frame, anchor[0], template, confidence,
+                                                                               anchor[2], anchor[1], image_path, options)
+                                        else:
+                                            location = matcher.locate_in_frame(frame, template, confidence,
+                                                                               image_path, options)
+                                        if location:
+                                            break
+                                if location:
+                                    break
+                                interval.on_change()
+                            else:
+                                interval.on_static()
+                        except Exception:
+                            interval.on_static()
+                        time.sleep(interval.value)
+                    probe.outcome = telemetry.HIT if location else telemetry.TIMEOUT
                 
                 if location:
                     center = pyautogui.center(location)
@@ -359,7 +484,10 @@ class Action:
                 if not os.path.exists(image_path):
                     raise Exception(f"图片文件不存在: {image_path}")
                 
-                if not self.background_mode:
+                template = self._load_template(image_path)
+                
+                batch = getattr(self, '_image_check_batch', None)
+                if not self.background_mode and (batch is None or not batch.is_evaluated()):
                     self._activate_window_for_image()
                 
                 marker = self.condition_marker
@@ -370,14 +498,22 @@ class Action:
                 var_manager = VariableManager.get_instance()
                 
                 location = None
-                for attempt in range(3):
-                    try:
-                        location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-                        if location:
-                            break
-                    except pyautogui.ImageNotFoundException:
-                        pass
-                    time.sleep(0.1)
+                if batch is not None and batch.has_result(self):
+                    location = batch.get_location(self, should_stop)
+                else:
+                    from .match_telemetry import MatchTelemetry
+                    telemetry = MatchTelemetry.get_instance()
+                    with telemetry.measure(image_path, template, confidence) as probe:
+                        for attempt in range(3):
+                            try:
+                                with probe.attempt():
+                                    location = self._locate_on_screen(template, confidence, search_region, image_path)
+                                if location:
+                                    break
+                            except pyautogui.ImageNotFoundException:
+                                pass
+                            time.sleep(0.1)
+                        probe.outcome = telemetry.HIT if location else telemetry.MISS
                 
                 if location:
                     var_manager.set(var_name, True)
@@ -388,6 +524,66 @@ class Action:
                 else:
                     var_manager.set(var_name, False)
             
+            elif self.action_type == ActionType.IMAGE_FIND_ALL:
+                image_path = self.params.get('image_path', '')
+                confidence = self.params.get('confidence', 0.9)
+                max_results = int(self.params.get('max_results', 20) or 0)
+                
+                if not image_path:
+                    raise Exception("未设置图片路径")
+                if not os.path.exists(image_path):
+                    raise Exception(f"图片文件不存在: {image_path}")
+                
+                template = self._load_template(image_path)
+                
+                if not self.background_mode:
+                    self._activate_window_for_image()
+                
+                marker = self.condition_marker
+                if not marker:
+                    raise Exception("无法生成条件标记")
+                
+                from .image_matcher import ImageMatcher
+                from .match_telemetry import MatchTelemetry
+                telemetry = MatchTelemetry.get_instance()
+                with telemetry.measure(image_path, template, confidence) as probe:
+                    with probe.attempt():
+                        matches = ImageMatcher.get_instance().locate_all_on_screen(
+                            template, confidence, search_region, max_results, self._match_options())
+                    probe.outcome = telemetry.HIT if matches else telemetry.MISS
+                
+                var_name = marker[1:]
+                var_manager = VariableManager.get_instance()
+                var_manager.set(var_name, bool(matches))
+                var_manager.set(f"{var_name}_count", len(matches))
+                for index, match in enumerate(matches, 1):
+                    var_manager.set(f"{var_name}_{index}_x", match.left)
+                    var_manager.set(f"{var_name}_{index}_y", match.top)
+                    var_manager.set(f"{var_name}_{index}_width", match.width)
+                    var_manager.set(f"{var_name}_{index}_height", match.height)
+            
+            elif self.action_type == ActionType.PIXEL_CHECK:
+                from .pixel_probe import parse_probes, probe_settings, check_pixels, color_to_hex
+                probes = parse_probes(self.params.get('points', ''))
+                tolerance, radius = probe_settings(self.params)
+                if not probes:
+                    raise Exception("未设置取色点")
+                
+                marker = self.condition_marker
+                if not marker:
+                    raise Exception("未设置变量名")
+                
+                offset = window_offset if window_offset and self.use_relative_coords else None
+                result = check_pixels(probes, tolerance, radius, offset)
+                
+                var_name = marker[1:]
+                var_manager = VariableManager.get_instance()
+                var_manager.set(var_name, result.passed(self.params.get('match_mode', 'all')))
+                var_manager.set(f"{var_name}_count", result.count)
+                for index, (matched, color) in enumerate(zip(result.matched, result.colors), 1):
+                    var_manager.set(f"{var_name}_{index}", matched)
+                    var_manager.set(f"{var_name}_{index}_color", color_to_hex(color))
+            
             elif self.action_type == ActionType.ACTION_GROUP_REF:
                 from .action_group import ensure_action_group_available, GlobalActionGroupManager
                 group_name = self.params.get('group_name', '')
@@ -436,7 +632,7 @@ class Action:
                     group_action._on_sub_action_start = on_nested_sub_start
                     group_action._on_sub_action_end = on_nested_sub_end
                     
-                    group_action.execute(window_offset=window_offset, should_stop=should_stop, local_group_manager=local_group_manager)
+                    group_action.execute(window_offset=window_offset, should_stop=should_stop, local_group_manager=local_group_manager, search_region=search_region)
                     
                     if hasattr(self, '_on_sub_action_end') and self._on_sub_action_end:
                         self._on_sub_action_end(group_action, sub_index, True)
@@ -450,18 +646,55 @@ class Action:
             raise Exception(error_msg)
     
     def validate(self) -> Tuple[bool, str]:
-        if self.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK]:
+        if self.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL]:
             image_path = self.params.get('image_path', '')
             if not image_path:
                 return False, "未设置图片路径"
             if not os.path.exists(image_path):
                 return False, f"图片文件不存在: {image_path}"
+            anchor_path = self.params.get('anchor_image', '')
+            if anchor_path:
+                from .image_matcher import ImageMatcher
+                if not os.path.exists(anchor_path):
+                    return False, f"锚点图片不存在: {anchor_path}"
+                try:
+                    ImageMatcher.parse_offset(self.params.get('anchor_offset', ''))
+                except ValueError as e:
+                    return False, str(e)
         
         if self.action_type == ActionType.WAIT:
             seconds = self.params.get('seconds', 0)
             if seconds < 0:
                 return False, "等待时间不能为负数"
         
+        if self.action_type == ActionType.WAIT_STABLE:
+            if self.params.get('stable_ms', 300) <= 0:
+                return False, "稳定时长必须大于 0"
+            if self.params.get('timeout', 10.0) <= 0:
+                return False, "超时时间必须大于 0"
+        
+        if self.action_type == ActionType.WAIT_REGION_CHANGE:
+            if self.params.get('mode', 'change') not in ('change', 'stable'):
+                return False, f"未知的等待方式: {self.params.get('mode')}"
+            if self.params.get('timeout', 10.0) <= 0:
+                return False, "超时时间必须大于 0"
+            if self.params.get('sample_rate', 30) <= 0:
+                return False, "采样频率必须大于 0"
+            if self.params.get('mode') == 'stable' and self.params.get('stable_ms', 300) <= 0:
+                return False, "稳定时长必须大于 0"
+        
+        if self.action_type == ActionType.PIXEL_CHECK:
+            from .pixel_probe import parse_probes, probe_settings
+            try:
+                probes = parse_probes(self.params.get('points', ''))
+                probe_settings(self.params)
+            except ValueError as e:
+                return False, str(e)
+            if not probes:
+                return False, "未设置取色点"
+            if not self.condition_marker:
+                return False, "未设置变量名"
+        
         if self.action_type in [ActionType.MOUSE_CLICK, ActionType.MOUSE_DOUBLE_CLICK, 
                                 ActionType.MOUSE_RIGHT_CLICK, ActionType.MOUSE_MOVE]:
             x = self.params.get('x')
@@ -575,8 +808,9 @@ class Action:
         return action
     
     def to_code(self) -> str:
+        from .match_code import escape_path, find_all_lines, helper_lines, locate_expression
         indent = "    "
-        code_lines = []
+        code_lines = helper_lines([self])
         
         if self.delay_before > 0:
             code_lines.append(f"time.sleep({self.delay_before})")
@@ -633,6 +867,19 @@ class Action:
             seconds = self.params.get('seconds', 1.0)
             code_lines.append(f"time.sleep({seconds})")
         
+        elif self.action_type == ActionType.WAIT_STABLE:
+            from .change_detector import stable_wait_code_lines
+            code_lines.extend(stable_wait_code_lines(self.params.get('region'), self.params.get('threshold', 4.0),
+                                                     self.params.get('stable_ms', 300), self.params.get('timeout', 10.0)))
+        
+        elif self.action_type == ActionType.WAIT_REGION_CHANGE:
+            from .change_detector import region_change_code_lines
+            code_lines.extend(region_change_code_lines(self.params.get('region'), self.params.get('mode', 'change'),
+                                                       self.params.get('threshold', 4.0),
+                                                       self.params.get('stable_ms', 300),
+                                                       self.params.get('timeout', 10.0),
+                                                       self.params.get('sample_rate', 30)))
+        
         elif self.action_type == ActionType.SCREENSHOT:
             filename = self.params.get('filename', 'screenshot.png')
             region = self.params.get('region')
@@ -669,37 +916,48 @@ class Action:
                     code_lines.append(f"pyautogui.click(x=window_x + {x}, y=window_y + {y})")
         
         elif self.action_type == ActionType.IMAGE_CLICK:
-            image_path = self.params.get('image_path', '')
-            confidence = self.params.get('confidence', 0.9)
-            escaped_path = image_path.replace('\\', '\\\\')
-            code_lines.append(f"location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+            path_expr = f"r'{escape_path(self.params.get('image_path', ''))}'"
+            code_lines.append(f"location = {locate_expression(self, path_expr)}")
             code_lines.append("if location:")
             code_lines.append("    center = pyautogui.center(location)")
             code_lines.append("    pyautogui.click(center.x, center.y)")
         
         elif self.action_type == ActionType.IMAGE_WAIT_CLICK:
-            image_path = self.params.get('image_path', '')
-            confidence = self.params.get('confidence', 0.9)
             timeout = self.params.get('timeout', 10)
-            escaped_path = image_path.replace('\\', '\\\\')
-            code_lines.append(f"location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+            path_expr = f"r'{escape_path(self.params.get('image_path', ''))}'"
+            code_lines.append(f"location = {locate_expression(self, path_expr)}")
             code_lines.append(f"start_time = time.time()")
             code_lines.append(f"while location is None and (time.time() - start_time) < {timeout}:")
             code_lines.append("    time.sleep(0.5)")
-            code_lines.append(f"    location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+            code_lines.append(f"    location = {locate_expression(self, path_expr)}")
             code_lines.append("if location:")
             code_lines.append("    center = pyautogui.center(location)")
             code_lines.append("    pyautogui.click(center.x, center.y)")
         
         elif self.action_type == ActionType.IMAGE_CHECK:
-            image_path = self.params.get('image_path', '')
-            confidence = self.params.get('confidence', 0.9)
             marker = self.condition_marker
             var_name = marker[1:] if marker else 'image_found'
-            escaped_path = image_path.replace('\\', '\\\\')
-            code_lines.append(f"location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+            path_expr = f"r'{escape_path(self.params.get('image_path', ''))}'"
+            code_lines.append(f"location = {locate_expression(self, path_expr)}")
             code_lines.append(f"{var_name} = location is not None")
         
+        elif self.action_type == ActionType.IMAGE_FIND_ALL:
+            image_path = self.params.get('image_path', '')
+            marker = self.condition_marker
+            var_name = marker[1:] if marker else 'images'
+            code_lines.extend(find_all_lines(self, f"r'{escape_path(image_path)}'", var_name))
+        
+        elif self.action_type == ActionType.PIXEL_CHECK:
+            from .pixel_probe import parse_probes, probe_settings, to_code_lines
+            marker = self.condition_marker
+            var_name = marker[1:] if marker else 'pixel'
+            try:
+                probes = parse_probes(self.params.get('points', ''))
+                tolerance, radius = probe_settings(self.params)
+            except ValueError:
+                probes, tolerance, radius = [], 20, 0
+            code_lines.extend(to_code_lines(probes, tolerance, radius, self.params.get('match_mode', 'all'), var_name))
+        
         elif self.action_type == ActionType.ACTION_GROUP_REF:
             group_name = self.params.get('group_name', '')
             code_lines.append(f"# 执行动作组: {group_name}")
@@ -711,6 +969,106 @@ class Action:
         return '\n'.join([indent + line for line in code_lines])
 
 
+class ImageCheckBatch:
+    """
+    相邻 IMAGE_CHECK 动作的批量求值
+
+    第一个动作执行时截取一帧，所有模板在同一帧上匹配；
+    未找到的模板按原有规则最多重试 3 次，每次重新截取一帧。
+    """
+    
+    def __init__(self, actions: List['Action'], search_region: Optional[Tuple[int, int, int, int]] = None):
+        self._actions = list(actions)
+        self._action_ids = {id(action) for action in self._actions}
+        self._search_region = search_region
+        self._results: Optional[Dict[int, Any]] = None
+    
+    def __contains__(self, action: 'Action') -> bool:
+        return id(action) in self._action_ids
+    
+    def has_result(self, action: 'Action') -> bool:
+        if id(action) not in self._action_ids:
+            return False
+        return self._results is None or id(action) in self._results
+    
+    def __len__(self) -> int:
+        return len(self._actions)
+    
+    def is_evaluated(self) -> bool:
+        return self._results is not None
+    
+    def get_location(self, action: 'Action', should_stop: Optional[Callable[[], bool]] = None):
+        if self._results is None:
+            self._evaluate(should_stop)
+        return self._results.get(id(action))
+    
+    def _evaluate(self, should_stop: Optional[Callable[[], bool]] = None):
+        from .image_matcher import ImageMatcher
+        from .match_telemetry import MatchProbe, MatchTelemetry
+        
+        self._results = {}
+        pending = []
+        for action in self._actions:
+            image_path = action.params.get('image_path', '')
+            if not image_path or not os.path.exists(image_path) or not action.condition_marker:
+                continue
+            try:
+                template = action._load_template(image_path)
+            except Exception:
+                continue
+            self._results[id(action)] = None
+            pending.append((action, template, action.params.get('confidence', 0.9), image_path, action._match_options()))
+        
+        matcher = ImageMatcher.get_instance()
+        telemetry = MatchTelemetry.get_instance()
+        items = list(pending)
+        probes = {id(item[0]): MatchProbe() for item in items}
+        outcome = telemetry.STOPPED
+        with matcher.track_scores([item[1] for item in items]) as scores:
+            try:
+                for attempt in range(3):
+                    if not pending or (should_stop and should_stop()):
+                        break
+                    if attempt > 0:
+                        time.sleep(0.1)
+                    plain = [p for p in pending if not p[0].params.get('anchor_image')]
+                    start = time.perf_counter()
+                    located = dict(zip([id(p[0]) for p in plain], matcher.locate_many(
+                        [p[1] for p in plain], [p[2] for p in plain], self._search_region,
+                        [p[3] for p in plain], [p[4] for p in plain])))
+                    share = (time.perf_counter() - start) / len(plain) if plain else 0.0
+                    for item in plain:
+                        probes[id(item[0])].duration += share
+                        probes[id(item[0])].attempts += 1
+                    for item in pending:
+                        if id(item[0]) not in located:
+                            try:
+                                with probes[id(item[0])].attempt():
+                                    located[id(item[0])] = item[0]._locate_on_screen(item[1], item[2],
+                                                                                     self._search_region, item[3])
+                            except Exception:
+                                located[id(item[0])] = None
+                    locations = [located[id(p[0])] for p in pending]
+                    still_pending = []
+                    for item, location in zip(pending, locations):
+                        if location:
+                            self._results[id(item[0])] = location
+                        else:
+                            still_pending.append(item)
+                    pending = still_pending
+                else:
+                    outcome = telemetry.MISS
+            except BaseException:
+                outcome = telemetry.ERROR
+                raise
+            finally:
+                for action, template, confidence, image_path, _ in items:
+                    probe = probes[id(action)]
+                    found = self._results.get(id(action)) is not None
+                    telemetry.record(image_path, probe.duration, scores.get(id(template)), confidence,
+                                     probe.retries, telemetry.HIT if found else outcome)
+
+
 class ActionManager:
     ACTION_DEFINITIONS = {
         ActionType.MOUSE_CLICK: {
@@ -797,6 +1155,29 @@ class ActionManager:
                 {'name': 'seconds', 'type': 'float', 'default': 1.0, 'description': '等待时间(秒)'},
             ]
         },
+        ActionType.WAIT_STABLE: {
+            'name': '等待画面稳定',
+            'category': '控制',
+            'params': [
+                {'name': 'region', 'type': 'tuple', 'default': None, 'description': '检测区域(留空为绑定窗口或主屏幕)'},
+                {'name': 'threshold', 'type': 'float', 'default': 4.0, 'description': '变化阈值(分块灰度差 0-255)'},
+                {'name': 'stable_ms', 'type': 'int', 'default': 300, 'description': '持续稳定时长(毫秒)'},
+                {'name': 'timeout', 'type': 'float', 'default': 10.0, 'description': '超时时间(秒)'},
+            ]
+        },
+        ActionType.WAIT_REGION_CHANGE: {
+            'name': '等待区域变化',
+            'category': '控制',
+            'params': [
+                {'name': 'region', 'type': 'tuple', 'default': None, 'description': '检测区域(留空为绑定窗口或主屏幕)'},
+                {'name': 'mode', 'type': 'str', 'default': 'change', 'description': '等待方式',
+                 'options': [('区域变化', 'change'), ('变化后停止变化', 'stable')]},
+                {'name': 'threshold', 'type': 'float', 'default': 4.0, 'description': '变化阈值(分块灰度差 0-255)'},
+                {'name': 'stable_ms', 'type': 'int', 'default': 300, 'description': '停止变化时长(毫秒)'},
+                {'name': 'timeout', 'type': 'float', 'default': 10.0, 'description': '超时时间(秒)'},
+                {'name': 'sample_rate', 'type': 'int', 'default': 30, 'description': '采样频率(次/秒)'},
+            ]
+        },
         ActionType.SCREENSHOT: {
             'name': '截图',
             'category': '其他',
@@ -829,6 +1210,11 @@ class ActionManager:
             'params': [
                 {'name': 'image_path', 'type': 'str', 'default': '', 'description': '图片路径'},
                 {'name': 'confidence', 'type': 'float', 'default': 0.9, 'description': '匹配精度(0-1)'},
+                {'name': 'color_mode', 'type': 'str', 'default': 'color', 'description': '颜色模式',
+                 'options': [('彩色', 'color'), ('灰度', 'grayscale')]},
+                {'name': 'match_scale', 'type': 'float', 'default': 1.0, 'description': '匹配缩放比例(0.1-1)'},
+                {'name': 'anchor_image', 'type': 'str', 'default': '', 'description': '锚点图片(可选)'},
+                {'name': 'anchor_offset', 'type': 'str', 'default': '', 'description': '相对锚点偏移(dx,dy)'},
             ]
         },
         ActionType.IMAGE_WAIT_CLICK: {
@@ -837,7 +1223,12 @@ class ActionManager:
             'params': [
                 {'name': 'image_path', 'type': 'str', 'default': '', 'description': '图片路径'},
                 {'name': 'confidence', 'type': 'float', 'default': 0.9, 'description': '匹配精度(0-1)'},
+                {'name': 'color_mode', 'type': 'str', 'default': 'color', 'description': '颜色模式',
+                 'options': [('彩色', 'color'), ('灰度', 'grayscale')]},
+                {'name': 'match_scale', 'type': 'float', 'default': 1.0, 'description': '匹配缩放比例(0.1-1)'},
                 {'name': 'timeout', 'type': 'float', 'default': 10.0, 'description': '超时时间(秒)'},
+                {'name': 'anchor_image', 'type': 'str', 'default': '', 'description': '锚点图片(可选)'},
+                {'name': 'anchor_offset', 'type': 'str', 'default': '', 'description': '相对锚点偏移(dx,dy)'},
             ]
         },
         ActionType.IMAGE_CHECK: {
@@ -846,6 +1237,35 @@ class ActionManager:
             'params': [
                 {'name': 'image_path', 'type': 'str', 'default': '', 'description': '图片路径'},
                 {'name': 'confidence', 'type': 'float', 'default': 0.9, 'description': '匹配精度(0-1)'},
+                {'name': 'color_mode', 'type': 'str', 'default': 'color', 'description': '颜色模式',
+                 'options': [('彩色', 'color'), ('灰度', 'grayscale')]},
+                {'name': 'match_scale', 'type': 'float', 'default': 1.0, 'description': '匹配缩放比例(0.1-1)'},
+                {'name': 'anchor_image', 'type': 'str', 'default': '', 'description': '锚点图片(可选)'},
+                {'name': 'anchor_offset', 'type': 'str', 'default': '', 'description': '相对锚点偏移(dx,dy)'},
+            ]
+        },
+        ActionType.IMAGE_FIND_ALL: {
+            'name': '查找全部图片',
+            'category': '图像识别',
+            'params': [
+                {'name': 'image_path', 'type': 'str', 'default': '', 'description': '图片路径'},
+                {'name': 'confidence', 'type': 'float', 'default': 0.9, 'description': '匹配精度(0-1)'},
+                {'name': 'max_results', 'type': 'int', 'default': 20, 'description': '最多结果数(0为不限)'},
+                {'name': 'color_mode', 'type': 'str', 'default': 'color', 'description': '颜色模式',
+                 'options': [('彩色', 'color'), ('灰度', 'grayscale')]},
+                {'name': 'match_scale', 'type': 'float', 'default': 1.0, 'description': '匹配缩放比例(0.1-1)'},
+            ]
+        },
+        ActionType.PIXEL_CHECK: {
+            'name': '检查像素颜色',
+            'category': '图像识别',
+            'params': [
+                {'name': 'variable', 'type': 'str', 'default': 'pixel', 'description': '变量名'},
+                {'name': 'points', 'type': 'points', 'default': '', 'description': '取色点(x,y,#RRGGBB; ...)'},
+                {'name': 'tolerance', 'type': 'int', 'default': 20, 'description': '颜色容差(每通道0-255)'},
+                {'name': 'radius', 'type': 'int', 'default': 0, 'description': '采样半径(取周围平均色)'},
+                {'name': 'match_mode', 'type': 'str', 'default': 'all', 'description': '判定方式',
+                 'options': [('全部匹配', 'all'), ('任一匹配', 'any')]},
             ]
         },
         ActionType.ACTION_GROUP_REF: {
@@ -0,0 +1,363 @@
+"""
+图片匹配基准测试
+
+生成带有模板的合成桌面 (多种分辨率，含噪声、缩放、遮挡、缺失几种情形)，
+通过内存截图后端走与图片动作相同的 ImageMatcher.locate_on_screen 路径计时，
+统计延迟分位数、内存峰值和准确率，结果保存为 JSON 便于比较不同版本。无需显示器。
+
+    python -m core.benchmark --output bench.json
+    python -m core.benchmark --compare bench.json
+    python -m core.benchmark --correlation    # 直接相关与 FFT 相关的耗时分界
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .capture import MemoryCapture, save_image
+from .fft_match import FFTCorrelator
+from .frame_grabber import FrameGrabber
+from .image_matcher import ImageMatcher, MatchOptions
+
+DEFAULT_RESOLUTIONS = ((1280, 720), (1920, 1080), (2560, 1440))
+DEFAULT_VARIANTS = ('clean', 'noise', 'scaled', 'occluded', 'absent')
+DEFAULT_TEMPLATE_SIZE = (80, 48)
+POSITION_TOLERANCE = 3
+SCALED_FACTOR = 1.25
+CORRELATION_TEMPLATES = ((40, 30), (60, 40), (100, 80), (160, 120), (300, 200), (600, 400), (1000, 700))
+CORRELATION_MARGINS = (16, 128, None)
+
+
+def make_desktop(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """合成桌面: 渐变背景、若干带标题栏的窗口、按钮和文字"""
+    rng = np.random.RandomState(seed)
+    screen = np.empty((height, width, 3), dtype=np.uint8)
+    screen[:, :, 0] = np.linspace(120, 200, width, dtype=np.uint8)[None, :]
+    screen[:, :, 1] = np.linspace(90, 160, height, dtype=np.uint8)[:, None]
+    screen[:, :, 2] = 60
+    for _ in range(max(6, width * height // 150000)):
+        w, h = rng.randint(width // 8, width // 3), rng.randint(height // 8, height // 3)
+        x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+        cv2.rectangle(screen, (x, y), (x + w, y + h), (240, 240, 240), -1)
+        cv2.rectangle(screen, (x, y), (x + w, y + 24), tuple(int(c) for c in rng.randint(0, 200, 3)), -1)
+        for _ in range(rng.randint(2, 6)):
+            bx, by = x + rng.randint(0, max(1, w - 60)), y + 30 + rng.randint(0, max(1, h - 50))
+            cv2.rectangle(screen, (bx, by), (bx + 56, by + 20), tuple(int(c) for c in rng.randint(100, 230, 3)), -1)
+            cv2.putText(screen, 'Btn', (bx + 8, by + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (20, 20, 20), 1)
+    return screen
+
+
+def make_template(width: int, height: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    template = cv2.GaussianBlur(rng.randint(0, 255, (height, width, 3)).astype(np.uint8), (3, 3), 0)
+    cv2.putText(template, 'OK', (4, height - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return template
+
+
+def make_case(width: int, height: int, variant: str, template_size: Tuple[int, int] = DEFAULT_TEMPLATE_SIZE,
+              seed: int = 0) -> Tuple[np.ndarray, np.ndarray, Optional[Tuple[int, int]]]:
+    """返回 (截图, 模板, 期望位置)，absent 时期望位置为 None"""
+    rng = np.random.RandomState(seed + 7)
+    screen = make_desktop(width, height, seed)
+    template = make_template(*template_size, seed=seed + 1)
+
+    embedded = template
+    if variant == 'scaled':
+        embedded = cv2.resize(template, None, fx=SCALED_FACTOR, fy=SCALED_FACTOR, interpolation=cv2.INTER_LINEAR)
+    elif variant == 'occluded':
+        embedded = template.copy()
+        t_h, t_w = template.shape[:2]
+        embedded[:t_h // 4, t_w - t_w // 4:] = (30, 30, 30)
+
+    expected = None
+    if variant != 'absent':
+        e_h, e_w = embedded.shape[:2]
+        x, y = rng.randint(0, width - e_w), rng.randint(0, height - e_h)
+        screen[y:y + e_h, x:x + e_w] = embedded
+        expected = (x, y)
+
+    if variant == 'noise':
+        noise = rng.normal(0, 6, screen.shape)
+        screen = np.clip(screen.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return screen, template, expected
+
+
+def percentile_summary(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p90': round(float(np.percentile(values, 90)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'max': round(float(values.max()), 3),
+        'cold': round(float(values[0]), 3),
+    }
+
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0), 1)
+
+
+@contextlib.contextmanager
+def isolated_services(backend):
+    """临时替换截图服务和位置/比例缓存单例，基准不读写用户的 ~/.simpleRPA 数据"""
+    from .match_hints import MatchHintStore
+    from .scale_cache import TemplateScaleCache
+    saved = (FrameGrabber._instance, MatchHintStore._instance, TemplateScaleCache._instance)
+    FrameGrabber._instance = FrameGrabber(tick_interval=0, backend=backend)
+    MatchHintStore._instance = MatchHintStore()
+    TemplateScaleCache._instance = TemplateScaleCache()
+    try:
+        yield FrameGrabber._instance
+    finally:
+        FrameGrabber._instance, MatchHintStore._instance, TemplateScaleCache._instance = saved
+
+
+def run_case(width: int, height: int, variant: str, engine: str = ImageMatcher.ENGINE_PYRAMID,
+             repeats: int = 20, confidence: float = 0.8, use_hints: bool = True,
+             template_size: Tuple[int, int] = DEFAULT_TEMPLATE_SIZE, seed: int = 0,
+             options: Optional[MatchOptions] = None) -> Dict[str, Any]:
+    screen, template, expected = make_case(width, height, variant, template_size, seed)
+    result: Dict[str, Any] = {
+        'resolution': f"{width}x{height}",
+        'engine': engine,
+        'variant': variant,
+        'template': f"{template_size[0]}x{template_size[1]}",
+        'repeats': repeats,
+        'use_hints': use_hints,
+    }
+
+    matcher = ImageMatcher(engine=engine, use_hints=use_hints, multi_scale=variant == 'scaled')
+    timings, errors, found = [], [], 0
+    with tempfile.TemporaryDirectory() as temp_dir, isolated_services(MemoryCapture([screen])):
+        from .match_hints import MatchHintStore
+        hints = MatchHintStore.get_instance()
+        image_path = os.path.join(temp_dir, 'template.png')
+        save_image(template, image_path)
+        try:
+            tracemalloc.start()
+            for _ in range(repeats):
+                start = time.perf_counter()
+                location = matcher.locate_on_screen(template, confidence, None, image_path, options)
+                timings.append(time.perf_counter() - start)
+                if location is not None:
+                    found += 1
+                    if expected is not None:
+                        errors.append(max(abs(location.left - expected[0]), abs(location.top - expected[1])))
+            _, peak = tracemalloc.get_traced_memory()
+            hint_stats = hints.get_stats()
+        except Exception as e:
+            result['error'] = str(e)
+            return result
+        finally:
+            tracemalloc.stop()
+            matcher.set_backend('serial')
+
+    if expected is None:
+        correct = repeats - found
+    else:
+        correct = sum(1 for error in errors if error <= POSITION_TOLERANCE)
+    result['latency_ms'] = percentile_summary(timings)
+    result['memory'] = {'peak_mb': round(peak / (1024.0 * 1024.0), 2), 'max_rss_mb': _max_rss_mb()}
+    result['accuracy'] = {
+        'found_rate': round(found / repeats, 3),
+        'correct_rate': round(correct / repeats, 3),
+        'mean_error_px': round(float(np.mean(errors)), 2) if errors else None,
+    }
+    if use_hints:
+        result['spatial_prior'] = {name: hint_stats[name] for name in
+                                   ('hit_rate', 'rank_hits', 'widened_hits', 'avg_prior_ms', 'avg_full_ms', 'saved_ms')}
+    return result
+
+
+def run_benchmark(resolutions=DEFAULT_RESOLUTIONS, variants=DEFAULT_VARIANTS,
+                  engines=(ImageMatcher.ENGINE_PYRAMID,), repeats: int = 20, confidence: float = 0.8,
+                  use_hints: bool = True, template_size: Tuple[int, int] = DEFAULT_TEMPLATE_SIZE,
+                  seed: int = 0, progress=None) -> Dict[str, Any]:
+    results = []
+    for width, height in resolutions:
+        for engine in engines:
+            for variant in variants:
+                case = run_case(width, height, variant, engine, repeats, confidence, use_hints, template_size, seed)
+                results.append(case)
+                if progress:
+                    progress(case)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'repeats': repeats,
+            'confidence': confidence,
+            'use_hints': use_hints,
+            'template': list(template_size),
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def run_correlation(templates=CORRELATION_TEMPLATES, margins=CORRELATION_MARGINS,
+                    resolution: Tuple[int, int] = (1920, 1080), repeats: int = 5, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    比较 cv2.matchTemplate 与 FFTCorrelator 的耗时和得分差异
+
+    margin 为搜索区域比模板每边多出的像素 (金字塔细化时的情形)，None 表示整屏搜索。
+    """
+    screen = make_desktop(*resolution, seed=seed)
+    rows = []
+    for t_w, t_h in templates:
+        template = make_template(t_w, t_h, seed=seed + 1)
+        for margin in margins:
+            if margin is None:
+                image = screen
+            else:
+                image = np.ascontiguousarray(screen[:t_h + 2 * margin, :t_w + 2 * margin])
+            if image.shape[0] < t_h or image.shape[1] < t_w:
+                continue
+            correlator = FFTCorrelator()
+            timings = {'direct': [], 'fft': []}
+            for _ in range(repeats):
+                start = time.perf_counter()
+                direct = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+                timings['direct'].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                fft = correlator.match_template(image, template)
+                timings['fft'].append(time.perf_counter() - start)
+            rows.append({
+                'template': f"{t_w}x{t_h}",
+                'template_area': t_w * t_h,
+                'search': f"{image.shape[1]}x{image.shape[0]}",
+                'direct_ms': percentile_summary(timings['direct'])['p50'],
+                'fft_ms': percentile_summary(timings['fft'])['p50'],
+                'max_score_diff': float(np.abs(direct - fft).max()),
+            })
+    return rows
+
+
+def correlation_threshold(rows: List[Dict[str, Any]]) -> Optional[int]:
+    """FFT 在所有搜索区域下都不慢于直接相关的最小模板面积，之后的模板也都满足"""
+    areas = sorted({row['template_area'] for row in rows})
+    threshold = None
+    for area in reversed(areas):
+        if all(row['fft_ms'] <= row['direct_ms'] for row in rows if row['template_area'] == area):
+            threshold = area
+        else:
+            break
+    return threshold
+
+
+def _case_key(case: Dict[str, Any]) -> Tuple:
+    return case['resolution'], case['engine'], case['variant'], case['template']
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按 (分辨率, 引擎, 情形, 模板) 对齐两次结果，ratio < 1 表示 current 更快"""
+    previous = {_case_key(case): case for case in baseline.get('results', []) if 'latency_ms' in case}
+    rows = []
+    for case in current.get('results', []):
+        old = previous.get(_case_key(case))
+        if old is None or 'latency_ms' not in case:
+            continue
+        old_p50, new_p50 = old['latency_ms']['p50'], case['latency_ms']['p50']
+        rows.append({
+            'case': '/'.join(_case_key(case)),
+            'baseline_p50': old_p50,
+            'current_p50': new_p50,
+            'ratio': round(new_p50 / old_p50, 3) if old_p50 else None,
+            'correct_delta': round(case['accuracy']['correct_rate'] - old['accuracy']['correct_rate'], 3),
+        })
+    return rows
+
+
+def format_case(case: Dict[str, Any]) -> str:
+    name = f"{case['resolution']:>10} {case['engine']:<9} {case['variant']:<9}"
+    if 'error' in case:
+        return f"{name} 失败: {case['error']}"
+    latency, accuracy = case['latency_ms'], case['accuracy']
+    return (f"{name} p50 {latency['p50']:8.2f}ms  p90 {latency['p90']:8.2f}ms  "
+            f"cold {latency['cold']:8.2f}ms  peak {case['memory']['peak_mb']:6.1f}MB  "
+            f"正确率 {accuracy['correct_rate']:.0%}")
+
+
+def _parse_size(text: str) -> Tuple[int, int]:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="simpleRPA 图片匹配基准测试")
+    parser.add_argument('--resolutions', default=','.join(f"{w}x{h}" for w, h in DEFAULT_RESOLUTIONS))
+    parser.add_argument('--variants', default=','.join(DEFAULT_VARIANTS))
+    parser.add_argument('--engines', default=ImageMatcher.ENGINE_PYRAMID)
+    parser.add_argument('--template', default='x'.join(str(v) for v in DEFAULT_TEMPLATE_SIZE))
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--confidence', type=float, default=0.8)
+    parser.add_argument('--no-hints', action='store_true', help="关闭上次位置优先搜索")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="结果 JSON 保存路径")
+    parser.add_argument('--compare', help="与之前保存的结果 JSON 比较")
+    parser.add_argument('--correlation', action='store_true', help="只测直接相关与 FFT 相关的耗时分界")
+    args = parser.parse_args(argv)
+
+    if args.correlation:
+        resolution = _parse_size(args.resolutions.split(',')[0])
+        rows = run_correlation(resolution=resolution, repeats=max(1, args.repeats // 4), seed=args.seed)
+        for row in rows:
+            print(f"{row['template']:>10} in {row['search']:>10}  direct {row['direct_ms']:8.2f}ms  "
+                  f"fft {row['fft_ms']:8.2f}ms  得分差 {row['max_score_diff']:.1e}")
+        threshold = correlation_threshold(rows)
+        print(f"FFT 分界模板面积: {threshold} (当前 {FFTCorrelator.MIN_TEMPLATE_AREA})")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'correlation': rows, 'threshold': threshold}, f, indent=2, ensure_ascii=False)
+        return 0
+
+    report = run_benchmark(
+        resolutions=[_parse_size(size) for size in args.resolutions.split(',') if size],
+        variants=[variant for variant in args.variants.split(',') if variant],
+        engines=[engine for engine in args.engines.split(',') if engine],
+        repeats=max(1, args.repeats),
+        confidence=args.confidence,
+        use_hints=not args.no_hints,
+        template_size=_parse_size(args.template),
+        seed=args.seed,
+        progress=lambda case: print(format_case(case)),
+    )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for row in compare_results(baseline, report):
+            print(f"{row['case']:<40} {row['baseline_p50']:8.2f}ms -> {row['current_p50']:8.2f}ms "
+                  f"(x{row['ratio']})  正确率变化 {row['correct_delta']:+.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
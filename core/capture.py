@@ -0,0 +1,285 @@
+import os
+import sys
+import threading
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class CaptureBackend:
+    """截图后端接口: capture 返回 BGR 图像，region 为 (x, y, w, h)，None 表示整个主屏幕"""
+
+    name = 'base'
+
+    def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        raise NotImplementedError
+
+    def screen_size(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def monitors(self) -> List[Tuple[int, int, int, int]]:
+        """各显示器在虚拟桌面中的区域 (x, y, w, h)，主屏幕在前；默认只有主屏幕"""
+        width, height = self.screen_size()
+        return [(0, 0, width, height)]
+
+    def close(self):
+        pass
+
+
+class PyAutoGUICapture(CaptureBackend):
+    """通过 pyautogui (PIL) 截图，所有平台可用"""
+
+    name = 'pyautogui'
+
+    def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        import pyautogui
+        screenshot = pyautogui.screenshot(region=region)
+        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+
+    def screen_size(self) -> Tuple[int, int]:
+        import pyautogui
+        width, height = pyautogui.size()
+        return int(width), int(height)
+
+
+class GDICapture(CaptureBackend):
+    """
+    Windows GDI 截图
+
+    BitBlt 直接拷贝到常驻的 32 位 DIB 缓冲区，再由 numpy 切出 BGR 通道，
+    省去 PIL 图像对象和 RGB/BGR 转换。同尺寸的缓冲区在多次截图间复用。
+    """
+
+    name = 'gdi'
+
+    SRCCOPY = 0x00CC0020
+    DIB_RGB_COLORS = 0
+
+    def __init__(self):
+        if sys.platform != 'win32':
+            raise OSError("GDI 截图仅支持 Windows")
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        self._user32 = ctypes.windll.user32
+        self._gdi32 = ctypes.windll.gdi32
+        try:
+            self._user32.SetProcessDPIAware()
+        except Exception:
+            pass
+
+        handle = ctypes.c_void_p
+        self._user32.GetDC.restype = handle
+        self._user32.GetDC.argtypes = [handle]
+        self._user32.ReleaseDC.argtypes = [handle, handle]
+        self._gdi32.CreateCompatibleDC.restype = handle
+        self._gdi32.CreateCompatibleDC.argtypes = [handle]
+        self._gdi32.CreateDIBSection.restype = handle
+        self._gdi32.CreateDIBSection.argtypes = [handle, ctypes.c_void_p, wintypes.UINT,
+                                                 ctypes.POINTER(ctypes.c_void_p), handle, wintypes.DWORD]
+        self._gdi32.SelectObject.restype = handle
+        self._gdi32.SelectObject.argtypes = [handle, handle]
+        self._gdi32.BitBlt.argtypes = [handle, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                       handle, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+        self._gdi32.DeleteObject.argtypes = [handle]
+        self._gdi32.DeleteDC.argtypes = [handle]
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [
+                ('biSize', wintypes.DWORD), ('biWidth', wintypes.LONG), ('biHeight', wintypes.LONG),
+                ('biPlanes', wintypes.WORD), ('biBitCount', wintypes.WORD), ('biCompression', wintypes.DWORD),
+                ('biSizeImage', wintypes.DWORD), ('biXPelsPerMeter', wintypes.LONG),
+                ('biYPelsPerMeter', wintypes.LONG), ('biClrUsed', wintypes.DWORD),
+                ('biClrImportant', wintypes.DWORD),
+            ]
+
+        self._header_type = BITMAPINFOHEADER
+        self._lock = threading.Lock()
+        self._buffer = None
+
+    def screen_size(self) -> Tuple[int, int]:
+        return self._user32.GetSystemMetrics(0), self._user32.GetSystemMetrics(1)
+
+    def monitors(self) -> List[Tuple[int, int, int, int]]:
+        ctypes = self._ctypes
+        from ctypes import wintypes
+
+        rects = []
+        callback_type = ctypes.WINFUNCTYPE(wintypes.BOOL, ctypes.c_void_p, ctypes.c_void_p,
+                                           ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+
+        def collect(monitor, dc, rect, data):
+            r = rect.contents
+            rects.append((r.left, r.top, r.right - r.left, r.bottom - r.top))
+            return True
+
+        self._user32.EnumDisplayMonitors(None, None, callback_type(collect), 0)
+        if not rects:
+            return super().monitors()
+        # 主屏幕的左上角总是 (0, 0)
+        rects.sort(key=lambda r: (r[0], r[1]) != (0, 0))
+        return rects
+
+    def _get_buffer(self, width: int, height: int):
+        if self._buffer is not None and self._buffer[0] == (width, height):
+            return self._buffer
+        self._release_buffer()
+
+        ctypes = self._ctypes
+        header = self._header_type()
+        header.biSize = ctypes.sizeof(header)
+        header.biWidth = width
+        header.biHeight = -height
+        header.biPlanes = 1
+        header.biBitCount = 32
+        bits = ctypes.c_void_p()
+        mem_dc = self._gdi32.CreateCompatibleDC(None)
+        bitmap = self._gdi32.CreateDIBSection(mem_dc, ctypes.byref(header), self.DIB_RGB_COLORS,
+                                              ctypes.byref(bits), None, 0)
+        if not bitmap:
+            self._gdi32.DeleteDC(mem_dc)
+            raise OSError("CreateDIBSection 失败")
+        old_bitmap = self._gdi32.SelectObject(mem_dc, bitmap)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * (width * height * 4)).from_address(bits.value))
+        self._buffer = ((width, height), mem_dc, bitmap, old_bitmap, pixels.reshape(height, width, 4))
+        return self._buffer
+
+    def _release_buffer(self):
+        if self._buffer is None:
+            return
+        _, mem_dc, bitmap, old_bitmap, _ = self._buffer
+        self._buffer = None
+        self._gdi32.SelectObject(mem_dc, old_bitmap)
+        self._gdi32.DeleteObject(bitmap)
+        self._gdi32.DeleteDC(mem_dc)
+
+    def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        if region is None:
+            x, y = 0, 0
+            width, height = self.screen_size()
+        else:
+            x, y, width, height = (int(v) for v in region)
+        if width <= 0 or height <= 0:
+            raise ValueError(f"截图区域无效: {region}")
+
+        with self._lock:
+            _, mem_dc, _, _, pixels = self._get_buffer(width, height)
+            screen_dc = self._user32.GetDC(None)
+            try:
+                if not self._gdi32.BitBlt(mem_dc, 0, 0, width, height, screen_dc, x, y, self.SRCCOPY):
+                    raise OSError("BitBlt 失败")
+            finally:
+                self._user32.ReleaseDC(None, screen_dc)
+            return pixels[:, :, :3].copy()
+
+    def close(self):
+        with self._lock:
+            self._release_buffer()
+
+
+class MemoryCapture(CaptureBackend):
+    """
+    内存截图源
+
+    按顺序返回预先放入的合成或录制画面，队列取完后一直返回最后一帧，
+    loop=True 时循环播放。不需要显示器，用于测试和基准。
+    monitors 可以把画面划分成多个模拟显示器 (x, y, w, h)，画面视为虚拟桌面。
+    """
+
+    name = 'memory'
+
+    def __init__(self, frames: Optional[Iterable[np.ndarray]] = None, loop: bool = False,
+                 monitors: Optional[List[Tuple[int, int, int, int]]] = None):
+        self.loop = loop
+        self._monitors = list(monitors) if monitors else None
+        self._frames = deque()
+        self._current: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self.captures = 0
+        for image in frames or []:
+            self.push(image)
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str], loop: bool = False) -> 'MemoryCapture':
+        frames = []
+        for path in paths:
+            image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"无法读取画面文件: {path}")
+            frames.append(image)
+        return cls(frames, loop=loop)
+
+    def push(self, image: np.ndarray):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        with self._lock:
+            self._frames.append(np.ascontiguousarray(image))
+
+    def _next_image(self) -> np.ndarray:
+        with self._lock:
+            if self._frames:
+                self._current = self._frames.popleft()
+                if self.loop:
+                    self._frames.append(self._current)
+            if self._current is None:
+                raise RuntimeError("内存截图源中没有画面")
+            self.captures += 1
+            return self._current
+
+    def screen_size(self) -> Tuple[int, int]:
+        with self._lock:
+            image = self._current if self._current is not None else (self._frames[0] if self._frames else None)
+        if image is None:
+            return 0, 0
+        return image.shape[1], image.shape[0]
+
+    def monitors(self) -> List[Tuple[int, int, int, int]]:
+        return list(self._monitors) if self._monitors else super().monitors()
+
+    def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        image = self._next_image()
+        if region is None and self._monitors:
+            region = self._monitors[0]
+        if region is None:
+            return image.copy()
+
+        # 与真实屏幕一致: 超出画面的部分填黑，返回尺寸始终等于 region
+        x, y, width, height = (int(v) for v in region)
+        result = np.zeros((height, width, 3), dtype=image.dtype)
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(image.shape[1], x + width), min(image.shape[0], y + height)
+        if right > left and bottom > top:
+            result[top - y:bottom - y, left - x:right - x] = image[top:bottom, left:right]
+        return result
+
+
+CAPTURE_BACKENDS = ('auto', GDICapture.name, PyAutoGUICapture.name, MemoryCapture.name)
+
+
+def create_capture_backend(name: str = 'auto') -> CaptureBackend:
+    """按名称创建截图后端，auto 在 Windows 上优先使用 GDI，失败时回退到 pyautogui"""
+    if name == MemoryCapture.name:
+        return MemoryCapture()
+    if name == PyAutoGUICapture.name:
+        return PyAutoGUICapture()
+    if name not in CAPTURE_BACKENDS:
+        print(f"未知截图后端 {name}，使用自动选择")
+    if name == GDICapture.name or sys.platform == 'win32':
+        try:
+            return GDICapture()
+        except Exception as e:
+            print(f"GDI 截图不可用，改用 pyautogui: {e}")
+    return PyAutoGUICapture()
+
+
+def save_image(image: np.ndarray, path: str) -> bool:
+    """保存 BGR 图像，支持中文路径"""
+    ext = os.path.splitext(path)[1] or '.png'
+    ok, encoded = cv2.imencode(ext, image)
+    if not ok:
+        return False
+    encoded.tofile(path)
+    return True
@@ -0,0 +1,249 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    低成本画面变化检测
+
+    把画面按 block_size 分块取灰度均值，任意一块的变化超过 threshold 即视为变化。
+    分块比整体均值更能发现小按钮的出现或消失。
+    """
+
+    def __init__(self, block_size: int = 16, threshold: float = 4.0):
+        self.block_size = max(1, block_size)
+        self.threshold = threshold
+        self._last: Optional[np.ndarray] = None
+
+    @staticmethod
+    def signature(image: np.ndarray, block_size: int = 16) -> np.ndarray:
+        h, w = image.shape[:2]
+        size = (max(1, w // block_size), max(1, h // block_size))
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.float32)
+
+    def difference(self, image: np.ndarray) -> float:
+        if self._last is None:
+            return float('inf')
+        signature = self.signature(image, self.block_size)
+        if signature.shape != self._last.shape:
+            return float('inf')
+        return float(np.abs(signature - self._last).max())
+
+    def update(self, image: np.ndarray) -> bool:
+        """与上一次记录的画面比较，变化时记录新画面并返回 True"""
+        signature = self.signature(image, self.block_size)
+        if self._last is not None and signature.shape == self._last.shape:
+            if float(np.abs(signature - self._last).max()) <= self.threshold:
+                return False
+        self._last = signature
+        return True
+
+    def reset(self):
+        self._last = None
+
+
+class AdaptiveInterval:
+    """画面刚变化时缩短轮询间隔，画面静止时逐步放宽到 max_interval"""
+
+    def __init__(self, min_interval: float = 0.1, max_interval: float = 0.5, growth: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.growth = max(1.0, growth)
+        self.value = min_interval
+
+    def on_change(self) -> float:
+        self.value = self.min_interval
+        return self.value
+
+    def on_static(self) -> float:
+        self.value = min(self.max_interval, self.value * self.growth)
+        return self.value
+
+
+def wait_until_stable(grab: Callable[[], np.ndarray], threshold: float = 4.0, stable_time: float = 0.3,
+                      timeout: float = 10.0, should_stop: Optional[Callable[[], bool]] = None,
+                      interval: float = 0.03, block_size: int = 16) -> bool:
+    """
+    反复截图直到画面稳定
+
+    每次截图只比较分块灰度均值 (FrameChangeDetector.signature)，与上一帧的最大差异不超过 threshold
+    且持续 stable_time 秒即视为稳定，返回 True；超时或 should_stop 返回 True 时返回 False。
+    """
+    start = time.monotonic()
+    last = None
+    stable_since = start
+    while True:
+        if should_stop and should_stop():
+            return False
+        now = time.monotonic()
+        signature = FrameChangeDetector.signature(grab(), block_size)
+        if last is None or signature.shape != last.shape or float(np.abs(signature - last).max()) > threshold:
+            stable_since = now
+        elif now - stable_since >= stable_time:
+            return True
+        last = signature
+        if now - start >= timeout:
+            return False
+        time.sleep(interval)
+
+
+class RegionWatcher:
+    """
+    区域变化监视器
+
+    在独立的采样线程中以 sample_rate 次/秒截取区域，只比较分块灰度均值 (FrameChangeDetector.signature)。
+    mode='change' 时与开始监视时的画面相比任意一块变化超过 threshold 即触发；
+    mode='stable' 时等到画面先变化、再连续 stable_time 秒不变才触发 (等动画、加载结束)。
+    触发后采样线程退出，wait 在事件上阻塞，不受轮询间隔限制。
+    """
+
+    CHANGE = 'change'
+    STABLE = 'stable'
+    MODES = (CHANGE, STABLE)
+
+    def __init__(self, grab: Callable[[], np.ndarray], mode: str = CHANGE, threshold: float = 4.0,
+                 stable_time: float = 0.3, sample_rate: float = 30.0, block_size: int = 16):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的监视模式: {mode}")
+        self.grab = grab
+        self.mode = mode
+        self.threshold = threshold
+        self.stable_time = max(0.0, stable_time)
+        self.interval = 1.0 / max(1.0, float(sample_rate))
+        self.block_size = max(1, block_size)
+        self.samples = 0
+        self.triggered_at: Optional[float] = None
+        self._error: Optional[BaseException] = None
+        self._done = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'RegionWatcher':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='RegionWatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def _sample(self) -> np.ndarray:
+        signature = FrameChangeDetector.signature(self.grab(), self.block_size)
+        self.samples += 1
+        return signature
+
+    def _changed(self, signature: np.ndarray, reference: np.ndarray) -> bool:
+        return signature.shape != reference.shape or float(np.abs(signature - reference).max()) > self.threshold
+
+    def _run(self):
+        try:
+            baseline = last = self._sample()
+            changed_at = None
+            while not self._stop.wait(self.interval):
+                signature = self._sample()
+                now = time.monotonic()
+                if self.mode == self.CHANGE:
+                    if self._changed(signature, baseline):
+                        self.triggered_at = now
+                        break
+                elif self._changed(signature, last):
+                    changed_at = now
+                elif changed_at is not None and now - changed_at >= self.stable_time:
+                    self.triggered_at = now
+                    break
+                last = signature
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: float = 10.0, should_stop: Optional[Callable[[], bool]] = None,
+             poll: float = 0.05) -> bool:
+        """阻塞到触发 (True)、超时或 should_stop 返回 True (False)；采样线程出错时抛出异常"""
+        self.start()
+        deadline = time.monotonic() + max(0.0, timeout)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._done.is_set() and self.triggered_at is not None
+                if self._done.wait(min(poll, remaining)) or self._done.is_set():
+                    break
+                if should_stop and should_stop():
+                    return False
+        finally:
+            self.stop()
+        if self._error is not None:
+            raise self._error
+        return self.triggered_at is not None
+
+
+def wait_for_region_change(grab: Callable[[], np.ndarray], mode: str = RegionWatcher.CHANGE,
+                           threshold: float = 4.0, stable_time: float = 0.3, timeout: float = 10.0,
+                           should_stop: Optional[Callable[[], bool]] = None, sample_rate: float = 30.0,
+                           block_size: int = 16) -> bool:
+    """在采样线程中监视区域，区域变化 (或变化后停止) 时立即返回 True，超时或停止返回 False"""
+    watcher = RegionWatcher(grab, mode, threshold, stable_time, sample_rate, block_size)
+    return watcher.wait(timeout, should_stop)
+
+
+def stable_wait_code_lines(region: Optional[Tuple[int, int, int, int]], threshold: float, stable_ms: int,
+                           timeout: float) -> List[str]:
+    """生成独立脚本中的等待画面稳定代码: PIL 按 16x16 分块取均值后比较"""
+    valid = region and len(region) == 4 and region[2] > 0 and region[3] > 0
+    region_arg = f"region={tuple(region)}" if valid else ""
+    return [
+        "import numpy as np",
+        "stable_start = stable_since = time.time()",
+        "stable_last = None",
+        f"while time.time() - stable_start < {timeout}:",
+        f"    stable_now = np.asarray(pyautogui.screenshot({region_arg}).convert('L').reduce(16), dtype=np.float32)",
+        f"    if stable_last is None or stable_now.shape != stable_last.shape or "
+        f"np.abs(stable_now - stable_last).max() > {threshold}:",
+        "        stable_since = time.time()",
+        f"    elif time.time() - stable_since >= {stable_ms / 1000.0}:",
+        "        break",
+        "    stable_last = stable_now",
+        "    time.sleep(0.03)",
+    ]
+
+
+def region_change_code_lines(region: Optional[Tuple[int, int, int, int]], mode: str, threshold: float,
+                             stable_ms: int, timeout: float, sample_rate: float) -> List[str]:
+    """生成独立脚本中的等待区域变化代码: 按采样频率轮询，PIL 按 16x16 分块取均值后比较"""
+    valid = region and len(region) == 4 and region[2] > 0 and region[3] > 0
+    region_arg = f"region={tuple(region)}" if valid else ""
+    grab = f"np.asarray(pyautogui.screenshot({region_arg}).convert('L').reduce(16), dtype=np.float32)"
+    interval = round(1.0 / max(1.0, float(sample_rate)), 4)
+    lines = [
+        "import numpy as np",
+        "watch_start = time.time()",
+        f"watch_base = watch_last = {grab}",
+        "watch_changed_at = None",
+        f"while time.time() - watch_start < {timeout}:",
+        f"    time.sleep({interval})",
+        f"    watch_now = {grab}",
+    ]
+    if mode == RegionWatcher.STABLE:
+        lines.extend([
+            f"    if watch_now.shape != watch_last.shape or np.abs(watch_now - watch_last).max() > {threshold}:",
+            "        watch_changed_at = time.time()",
+            f"    elif watch_changed_at is not None and time.time() - watch_changed_at >= {stable_ms / 1000.0}:",
+            "        break",
+            "    watch_last = watch_now",
+        ])
+    else:
+        lines.extend([
+            f"    if watch_now.shape != watch_base.shape or np.abs(watch_now - watch_base).max() > {threshold}:",
+            "        break",
+        ])
+    return lines
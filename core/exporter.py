@@ -5,6 +5,9 @@ import tempfile
 from typing import List, Optional, Set, Dict, Any
 from datetime import datetime
 from .actions import Action, ActionType
+from .match_code import escape_path, find_all_lines, helper_lines, locate_expression
+from .pixel_probe import parse_probes, probe_settings, to_code_lines
+from .change_detector import region_change_code_lines, stable_wait_code_lines
 from .action_group import (
     LocalActionGroupManager, GlobalActionGroupManager, ActionGroup,
     encode_image_to_base64
@@ -66,13 +69,13 @@ class Exporter:
     
     def _collect_embedded_images(self, actions: List[Action]):
         for action in actions:
-            if action.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK]:
-                image_path = action.params.get('image_path', '')
-                if image_path and os.path.exists(image_path):
-                    if image_path not in self._embedded_images:
-                        base64_data = encode_image_to_base64(image_path)
-                        if base64_data:
-                            self._embedded_images[image_path] = base64_data
+            if action.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL]:
+                for image_path in (action.params.get('image_path', ''), action.params.get('anchor_image', '')):
+                    if image_path and os.path.exists(image_path):
+                        if image_path not in self._embedded_images:
+                            base64_data = encode_image_to_base64(image_path)
+                            if base64_data:
+                                self._embedded_images[image_path] = base64_data
     
     def export_to_python(self, actions: List[Action], filepath: str) -> bool:
         try:
@@ -145,6 +148,8 @@ class Exporter:
             lines.append("")
             lines.append("")
         
+        lines.extend(helper_lines(self._all_actions(actions)))
+        
         if self._used_groups:
             lines.append("# Action Group Definitions")
             lines.append("ACTION_GROUPS = {}")
@@ -299,6 +304,24 @@ class Exporter:
         
         return '\n'.join(lines)
     
+    def _all_actions(self, actions: List[Action]) -> List[Action]:
+        all_actions = list(actions)
+        for group_name in self._used_groups:
+            group = self._local_group_manager.get_group(group_name) if self._local_group_manager else None
+            if not group:
+                group = self._global_group_manager.get_group(group_name)
+            if group:
+                all_actions.extend(group.actions)
+        return all_actions
+    
+    def _locate_code(self, action: Action, path_expr: str) -> str:
+        anchor_path = action.params.get('anchor_image', '')
+        anchor_expr = None
+        if anchor_path in self._embedded_images:
+            anchor_name = os.path.basename(anchor_path).replace('.', '_').replace(' ', '_').replace('-', '_')
+            anchor_expr = f"get_embedded_image('{anchor_name}')"
+        return locate_expression(action, path_expr, anchor_expr)
+    
     def _action_to_code(self, action: Action) -> str:
         indent = "    "
         code_lines = []
@@ -378,26 +401,25 @@ class Exporter:
         
         elif action.action_type == ActionType.IMAGE_CLICK:
             image_path = action.params.get('image_path', '')
-            confidence = action.params.get('confidence', 0.9)
             
             if image_path in self._embedded_images:
                 image_name = os.path.basename(image_path).replace('.', '_').replace(' ', '_').replace('-', '_')
                 code_lines.append(f"image_path = get_embedded_image('{image_name}')")
                 code_lines.append("if image_path:")
-                code_lines.append(f"    location = pyautogui.locateOnScreen(image_path, confidence={confidence})")
+                code_lines.append(f"    location = {self._locate_code(action, 'image_path')}")
                 code_lines.append("    if location:")
                 code_lines.append("        center = pyautogui.center(location)")
                 code_lines.append("        pyautogui.click(center.x, center.y)")
             else:
                 escaped_path = image_path.replace('\\', '\\\\')
-                code_lines.append(f"location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+                path_expr = f"r'{escaped_path}'"
+                code_lines.append(f"location = {self._locate_code(action, path_expr)}")
                 code_lines.append("if location:")
                 code_lines.append("    center = pyautogui.center(location)")
                 code_lines.append("    pyautogui.click(center.x, center.y)")
         
         elif action.action_type == ActionType.IMAGE_WAIT_CLICK:
             image_path = action.params.get('image_path', '')
-            confidence = action.params.get('confidence', 0.9)
             timeout = action.params.get('timeout', 10)
             
             if image_path in self._embedded_images:
@@ -408,14 +430,15 @@ class Exporter:
                 code_lines.append(f"    start_time = time.time()")
                 code_lines.append(f"    while location is None and (time.time() - start_time) < {timeout}:")
                 code_lines.append("        time.sleep(0.5)")
-                code_lines.append(f"        location = pyautogui.locateOnScreen(image_path, confidence={confidence})")
+                code_lines.append(f"        location = {self._locate_code(action, 'image_path')}")
             else:
                 escaped_path = image_path.replace('\\', '\\\\')
-                code_lines.append(f"location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+                path_expr = f"r'{escaped_path}'"
+                code_lines.append(f"location = {self._locate_code(action, path_expr)}")
                 code_lines.append(f"start_time = time.time()")
                 code_lines.append(f"while location is None and (time.time() - start_time) < {timeout}:")
                 code_lines.append("    time.sleep(0.5)")
-                code_lines.append(f"    location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+                code_lines.append(f"    location = {self._locate_code(action, path_expr)}")
             
             code_lines.append("if location:")
             code_lines.append("    center = pyautogui.center(location)")
@@ -423,7 +446,6 @@ class Exporter:
         
         elif action.action_type == ActionType.IMAGE_CHECK:
             image_path = action.params.get('image_path', '')
-            confidence = action.params.get('confidence', 0.9)
             marker = action.condition_marker
             var_name = marker[1:] if marker else 'image_found'
             
@@ -432,13 +454,48 @@ class Exporter:
                 code_lines.append(f"image_path = get_embedded_image('{image_name}')")
                 code_lines.append(f"{var_name} = False")
                 code_lines.append("if image_path:")
-                code_lines.append(f"    location = pyautogui.locateOnScreen(image_path, confidence={confidence})")
+                code_lines.append(f"    location = {self._locate_code(action, 'image_path')}")
                 code_lines.append(f"    {var_name} = location is not None")
             else:
                 escaped_path = image_path.replace('\\', '\\\\')
-                code_lines.append(f"location = pyautogui.locateOnScreen(r'{escaped_path}', confidence={confidence})")
+                path_expr = f"r'{escaped_path}'"
+                code_lines.append(f"location = {self._locate_code(action, path_expr)}")
                 code_lines.append(f"{var_name} = location is not None")
         
+        elif action.action_type == ActionType.IMAGE_FIND_ALL:
+            image_path = action.params.get('image_path', '')
+            marker = action.condition_marker
+            var_name = marker[1:] if marker else 'images'
+            
+            if image_path in self._embedded_images:
+                image_name = os.path.basename(image_path).replace('.', '_').replace(' ', '_').replace('-', '_')
+                code_lines.append(f"image_path = get_embedded_image('{image_name}')")
+                code_lines.extend(find_all_lines(action, 'image_path', var_name, " if image_path else []"))
+            else:
+                code_lines.extend(find_all_lines(action, f"r'{escape_path(image_path)}'", var_name))
+        
+        elif action.action_type == ActionType.PIXEL_CHECK:
+            marker = action.condition_marker
+            var_name = marker[1:] if marker else 'pixel'
+            try:
+                probes = parse_probes(action.params.get('points', ''))
+                tolerance, radius = probe_settings(action.params)
+            except ValueError:
+                probes, tolerance, radius = [], 20, 0
+            code_lines.extend(to_code_lines(probes, tolerance, radius, action.params.get('match_mode', 'all'), var_name))
+        
+        elif action.action_type == ActionType.WAIT_STABLE:
+            code_lines.extend(stable_wait_code_lines(action.params.get('region'), action.params.get('threshold', 4.0),
+                                                     action.params.get('stable_ms', 300),
+                                                     action.params.get('timeout', 10.0)))
+        
+        elif action.action_type == ActionType.WAIT_REGION_CHANGE:
+            code_lines.extend(region_change_code_lines(action.params.get('region'), action.params.get('mode', 'change'),
+                                                       action.params.get('threshold', 4.0),
+                                                       action.params.get('stable_ms', 300),
+                                                       action.params.get('timeout', 10.0),
+                                                       action.params.get('sample_rate', 30)))
+        
         elif action.action_type == ActionType.ACTION_GROUP_REF:
             group_name = action.params.get('group_name', '')
             code_lines.append(f"# 执行动作组: {group_name}")
@@ -530,7 +587,7 @@ class Exporter:
             for action_data in data.get('actions', []):
                 action = Action.from_dict(action_data)
                 
-                if action.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK]:
+                if action.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL]:
                     original_path = action.params.get('image_path', '')
                     image_name = os.path.basename(original_path)
                     if image_name in image_path_map:
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FFTCorrelator:
+    """
+    基于 FFT 的 TM_CCOEFF_NORMED 匹配
+
+    分子是各通道 (截图, 去均值模板) 的互相关，在频域相乘后一次逆变换得到；
+    分母由积分图算出每个窗口的方差，与 cv2.matchTemplate 的归一化和平坦窗口/平坦模板处理一致，
+    得分可以直接和原有 confidence 阈值比较。
+    直接相关的代价约为 模板面积 x 结果面积，模板越大越慢 (例如把整块对话框当状态标记)，
+    FFT 的代价只与搜索区域面积有关，模板面积超过 min_template_area 后改用 FFT。
+    同一模板在同一 FFT 尺寸下的频谱会缓存 (按总字节数限制)，候选区域尺寸相同时只变换一次。
+    缓存按模板内容的摘要索引: 灰度、缩放模板每次调用都是新数组，按 id 索引既命中不了又会堆积无用条目。
+    """
+
+    # 由 python -m core.benchmark --correlation 测得的分界: 约 100x80 起 FFT 不慢于直接相关
+    MIN_TEMPLATE_AREA = 100 * 80
+
+    def __init__(self, min_template_area: int = MIN_TEMPLATE_AREA, cache_mb: float = 64):
+        self.min_template_area = min_template_area
+        self.cache_bytes = int(cache_mb * 1024 * 1024)
+        self._cached_bytes = 0
+        self._spectra: 'OrderedDict[tuple, Tuple[List[np.ndarray], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.spectrum_hits = 0
+
+    def should_use(self, image_shape: Tuple[int, ...], template_shape: Tuple[int, ...]) -> bool:
+        t_h, t_w = template_shape[:2]
+        if t_h > image_shape[0] or t_w > image_shape[1]:
+            return False
+        return t_h * t_w >= self.min_template_area
+
+    @staticmethod
+    def template_spectra(template: np.ndarray, size: Tuple[int, int], out: Optional[np.ndarray] = None):
+        """去均值模板各通道的 CCS 频谱和平方和；传入 out (C x 频谱尺寸) 时直接写入其中"""
+        t_h, t_w = template.shape[:2]
+        planes = template.reshape(t_h, t_w, -1).astype(np.float32)
+        planes = planes - planes.reshape(-1, planes.shape[2]).mean(axis=0)
+        t_norm = float(np.square(planes, dtype=np.float64).sum())
+        padded = np.zeros(size, dtype=np.float32)
+        spectra = out if out is not None else [None] * planes.shape[2]
+        for channel in range(planes.shape[2]):
+            padded[:t_h, :t_w] = planes[:, :, channel]
+            spectra[channel] = cv2.dft(padded)
+        return spectra, t_norm
+
+    @staticmethod
+    def template_key(template: np.ndarray, size: Tuple[int, int]) -> tuple:
+        """模板内容摘要 + 形状 + FFT 尺寸，内容相同的模板 (包括每次新建的派生模板) 共用一份频谱"""
+        digest = hashlib.blake2b(np.ascontiguousarray(template).data, digest_size=16).digest()
+        return digest, template.shape, template.dtype.str, size[0], size[1]
+
+    def _template_spectra(self, template: np.ndarray, size: Tuple[int, int]) -> Tuple[List[np.ndarray], float]:
+        key = self.template_key(template, size)
+        with self._lock:
+            entry = self._spectra.get(key)
+            if entry is not None:
+                self._spectra.move_to_end(key)
+                self.spectrum_hits += 1
+                return entry
+
+        spectra, t_norm = self.template_spectra(template, size)
+
+        with self._lock:
+            if key not in self._spectra:
+                self._spectra[key] = (spectra, t_norm)
+                self._cached_bytes += sum(spectrum.nbytes for spectrum in spectra)
+            while self._cached_bytes > self.cache_bytes and len(self._spectra) > 1:
+                _, (evicted, _) = self._spectra.popitem(last=False)
+                self._cached_bytes -= sum(spectrum.nbytes for spectrum in evicted)
+        return spectra, t_norm
+
+    @staticmethod
+    def image_spectra(image: np.ndarray, size: Tuple[int, int]) -> List[np.ndarray]:
+        """各通道减去均值后的 CCS 频谱；模板已去均值，减去常数不影响分子，只降低 float32 的量级误差"""
+        s_h, s_w = image.shape[:2]
+        planes = image.reshape(s_h, s_w, -1)
+        padded = np.zeros(size, dtype=np.float32)
+        spectra = []
+        for channel in range(planes.shape[2]):
+            plane = planes[:, :, channel]
+            padded[:s_h, :s_w] = plane
+            padded[:s_h, :s_w] -= plane.mean()
+            spectra.append(cv2.dft(padded))
+        return spectra
+
+    @staticmethod
+    def integrals(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """各通道的和积分图 (H+1, W+1, C)，以及所有通道平方和的积分图 (H+1, W+1)"""
+        sums, squares = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        sums = sums.reshape(sums.shape[0], sums.shape[1], -1)
+        if squares.ndim == 3:
+            squares = squares.sum(axis=2)
+        return sums, squares
+
+    @staticmethod
+    def _window_sums(integral: np.ndarray, t_h: int, t_w: int) -> np.ndarray:
+        return cv2.add(cv2.subtract(integral[t_h:, t_w:], integral[:-t_h, t_w:]),
+                       cv2.subtract(integral[:-t_h, :-t_w], integral[t_h:, :-t_w]))
+
+    @classmethod
+    def window_scale(cls, integrals: Tuple[np.ndarray, np.ndarray], t_h: int, t_w: int) -> np.ndarray:
+        """每个 t_h x t_w 窗口去均值后平方和的平方根倒数 (float32)，平坦窗口为 0"""
+        sums, squares = integrals
+        window = cls._window_sums(sums, t_h, t_w).reshape(sums.shape[0] - t_h, sums.shape[1] - t_w, -1)
+        variance = cls._window_sums(squares, t_h, t_w)
+        variance -= np.einsum('ijk,ijk->ij', window, window) / float(t_h * t_w)
+        std = cv2.sqrt(np.maximum(variance, 0.0)).astype(np.float32)
+        return np.divide(1.0, std, out=np.zeros_like(std), where=std > 0)
+
+    @staticmethod
+    def normalize(numerator: np.ndarray, scale: np.ndarray, t_norm: float) -> np.ndarray:
+        # 与 OpenCV 相同: 平坦 (各通道方差为 0) 的模板处处得分为 1，平坦窗口得分为 0，
+        # 超出 ±1.125 的视为数值误差置 0，其余截断到 [-1, 1]
+        if np.sqrt(t_norm) < np.finfo(np.float64).eps:
+            return np.ones_like(numerator)
+        result = cv2.multiply(numerator, scale, scale=1.0 / np.sqrt(t_norm))
+        result[np.abs(result) >= 1.125] = 0.0
+        return np.clip(result, -1.0, 1.0, out=result)
+
+    @staticmethod
+    def correlate_spectra(image_spectra: List[np.ndarray], template_spectra, rows: int, cols: int) -> np.ndarray:
+        total = None
+        for image_spectrum, template_spectrum in zip(image_spectra, template_spectra):
+            product = cv2.mulSpectrums(image_spectrum, template_spectrum, 0, conjB=True)
+            total = product if total is None else cv2.add(total, product)
+        return cv2.idft(total, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)[:rows, :cols]
+
+    def match_template(self, image: np.ndarray, template: np.ndarray) -> np.ndarray:
+        """与 cv2.matchTemplate(image, template, TM_CCOEFF_NORMED) 相同形状和含义的得分图"""
+        s_h, s_w = image.shape[:2]
+        t_h, t_w = template.shape[:2]
+        size = (cv2.getOptimalDFTSize(s_h), cv2.getOptimalDFTSize(s_w))
+        spectra, t_norm = self._template_spectra(template, size)
+        with self._lock:
+            self.calls += 1
+        numerator = self.correlate_spectra(self.image_spectra(image, size), spectra, s_h - t_h + 1, s_w - t_w + 1)
+        return self.normalize(numerator, self.window_scale(self.integrals(image), t_h, t_w), t_norm)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'spectrum_hits': self.spectrum_hits,
+                'cached_spectra': len(self._spectra),
+                'cached_mb': round(self._cached_bytes / (1024.0 * 1024.0), 1),
+            }
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Frame:
+    """一帧只读的 BGR 屏幕图像，left/top 为其在屏幕坐标系中的位置"""
+    image: np.ndarray
+    left: int
+    top: int
+    timestamp: float
+    full_screen: bool = False
+
+    @property
+    def width(self) -> int:
+        return self.image.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.image.shape[0]
+
+    @property
+    def region(self) -> Tuple[int, int, int, int]:
+        return (self.left, self.top, self.width, self.height)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.timestamp
+
+    def contains(self, region: Tuple[int, int, int, int]) -> bool:
+        x, y, w, h = region
+        return (x >= self.left and y >= self.top and
+                x + w <= self.left + self.width and y + h <= self.top + self.height)
+
+    def crop(self, region: Tuple[int, int, int, int]) -> Optional['Frame']:
+        if not self.contains(region):
+            return None
+        x, y, w, h = region
+        dx, dy = x - self.left, y - self.top
+        return Frame(self.image[dy:dy + h, dx:dx + w], x, y, self.timestamp)
+
+
+class FrameGrabber:
+    """
+    共享屏幕截图服务
+
+    同一个 tick 内的多次 grab 复用同一帧（动作、预览层、并发的多个 Player 共享），
+    调用方可以通过 max_age 要求更新的帧，max_age=0 表示必须重新截图。
+    帧按所在显示器分别缓存：某个显示器上的截图和失效不会挤掉或清除其他显示器的帧，
+    跨越多个显示器的区域单独缓存。显示器布局由截图后端提供，每 MONITOR_REFRESH 秒刷新一次。
+    """
+
+    DEFAULT_TICK = 0.05
+    MAX_CACHED_FRAMES = 4
+    MONITOR_REFRESH = 5.0
+    SPANNING = -1
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, tick_interval: float = DEFAULT_TICK, backend=None):
+        from .capture import PyAutoGUICapture
+        self.tick_interval = max(0.0, tick_interval)
+        self.backend = backend if backend is not None else PyAutoGUICapture()
+        self._frames: Dict[int, Deque[Frame]] = {}
+        self._monitors: Optional[List[Tuple[int, int, int, int]]] = None
+        self._monitors_time = 0.0
+        self._lock = threading.Lock()
+        self.captures = 0
+        self.reuses = 0
+        self.monitor_captures: Dict[int, int] = {}
+
+    @classmethod
+    def get_instance(cls) -> 'FrameGrabber':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    from utils.config import Config
+                    from .capture import create_capture_backend
+                    config = Config.get_instance()
+                    cls._instance = cls(tick_interval=config.frame_tick_ms / 1000.0,
+                                        backend=create_capture_backend(config.capture_backend))
+        return cls._instance
+
+    def set_backend(self, backend):
+        """切换截图后端，已缓存的帧和显示器布局全部作废"""
+        with self._lock:
+            old_backend, self.backend = self.backend, backend
+            self._frames.clear()
+            self._monitors = None
+        if old_backend is not backend:
+            old_backend.close()
+
+    def _capture(self, region: Optional[Tuple[int, int, int, int]]) -> np.ndarray:
+        return self.backend.capture(region)
+
+    def monitors(self) -> List[Tuple[int, int, int, int]]:
+        """各显示器区域 (x, y, w, h)，主屏幕在前；后端无法提供时返回空列表 (视为单屏)"""
+        with self._lock:
+            return list(self._get_monitors())
+
+    def _get_monitors(self) -> List[Tuple[int, int, int, int]]:
+        now = time.monotonic()
+        if self._monitors is None or now - self._monitors_time > self.MONITOR_REFRESH:
+            try:
+                monitors = [tuple(int(v) for v in m) for m in self.backend.monitors()]
+            except Exception:
+                monitors = []
+            if monitors != self._monitors and self._monitors is not None:
+                self._frames.clear()
+            self._monitors = monitors
+            self._monitors_time = now
+        return self._monitors
+
+    @staticmethod
+    def _intersect(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+        left, top = max(a[0], b[0]), max(a[1], b[1])
+        right, bottom = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+        if right <= left or bottom <= top:
+            return None
+        return (left, top, right - left, bottom - top)
+
+    def _monitor_key(self, region: Optional[Tuple[int, int, int, int]]) -> int:
+        """完全位于某个显示器内的区域归属该显示器，否则归入 SPANNING"""
+        monitors = self._get_monitors()
+        if region is None or len(monitors) <= 1:
+            return 0
+        for index, monitor in enumerate(monitors):
+            if self._intersect(region, monitor) == region:
+                return index
+        return self.SPANNING
+
+    def monitors_for(self, region: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[int, int, int, int]]:
+        """与 region 重叠的各显示器上的部分；region 为 None 时返回全部显示器"""
+        with self._lock:
+            monitors = self._get_monitors()
+        if region is None:
+            return list(monitors)
+        parts = [self._intersect(region, monitor) for monitor in monitors]
+        return [part for part in parts if part is not None]
+
+    def clip_region(self, region: Optional[Tuple[int, int, int, int]]) -> Optional[Tuple[int, int, int, int]]:
+        """把 region 裁剪到与之重叠的显示器范围内 (外接矩形)，不在任何显示器上时原样返回"""
+        if region is None:
+            return None
+        parts = self.monitors_for(region)
+        if not parts:
+            return region
+        left, top = min(p[0] for p in parts), min(p[1] for p in parts)
+        right, bottom = max(p[0] + p[2] for p in parts), max(p[1] + p[3] for p in parts)
+        return (left, top, right - left, bottom - top)
+
+    def _find_cached(self, key: int, region: Optional[Tuple[int, int, int, int]], max_age: float) -> Optional[Frame]:
+        now = time.monotonic()
+        for frame in reversed(self._frames.get(key, ())):
+            if now - frame.timestamp > max_age:
+                continue
+            if region is None:
+                if frame.full_screen:
+                    return frame
+            elif frame.contains(region):
+                return frame.crop(region)
+        return None
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None,
+             max_age: Optional[float] = None) -> Frame:
+        if region is not None:
+            region = tuple(int(v) for v in region)
+        if max_age is None:
+            max_age = self.tick_interval
+
+        with self._lock:
+            key = self._monitor_key(region)
+            if max_age > 0:
+                frame = self._find_cached(key, region, max_age)
+                if frame is not None:
+                    self.reuses += 1
+                    return frame
+
+            image = self._capture(region)
+            image.flags.writeable = False
+            left, top = (region[0], region[1]) if region else (0, 0)
+            frame = Frame(image, left, top, time.monotonic(), full_screen=region is None)
+            if key not in self._frames:
+                self._frames[key] = deque(maxlen=self.MAX_CACHED_FRAMES)
+            self._frames[key].append(frame)
+            self.captures += 1
+            self.monitor_captures[key] = self.monitor_captures.get(key, 0) + 1
+            return frame
+
+    def grab_monitors(self, region: Optional[Tuple[int, int, int, int]] = None,
+                      max_age: Optional[float] = None) -> List[Frame]:
+        """只截取与 region 重叠的显示器 (region 为 None 时为全部显示器)，每个显示器一帧"""
+        parts = self.monitors_for(region)
+        if len(parts) <= 1:
+            return [self.grab(region, max_age)]
+        with self._lock:
+            primary = self._get_monitors()[0]
+        return [self.grab(None if region is None and part == primary else part, max_age) for part in parts]
+
+    def invalidate(self, region: Optional[Tuple[int, int, int, int]] = None):
+        """作废缓存的帧；传入 region 时只作废与之重叠的显示器和跨屏区域的帧"""
+        with self._lock:
+            if region is None:
+                self._frames.clear()
+                return
+            monitors = self._get_monitors()
+            if len(monitors) <= 1:
+                self._frames.clear()
+                return
+            for index, monitor in enumerate(monitors):
+                if self._intersect(tuple(region), monitor) is not None:
+                    self._frames.pop(index, None)
+            self._frames.pop(self.SPANNING, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.captures + self.reuses
+            return {
+                'captures': self.captures,
+                'reuses': self.reuses,
+                'reuse_rate': self.reuses / total if total else 0.0,
+                'tick_interval': self.tick_interval,
+                'backend': self.backend.name,
+                'monitors': len(self._monitors or ()) or 1,
+                'monitor_captures': dict(self.monitor_captures),
+            }
@@ -0,0 +1,860 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class MatchBox(NamedTuple):
+    left: int
+    top: int
+    width: int
+    height: int
+    score: float = 0.0
+
+
+class MatchOptions(NamedTuple):
+    """图片动作的匹配方式: 是否转灰度，以及匹配前把截图和模板缩放的比例"""
+    grayscale: bool = False
+    scale: float = 1.0
+
+    COLOR_MODES = ('color', 'grayscale')
+    MIN_SCALE = 0.1
+
+    @classmethod
+    def from_params(cls, params: dict) -> 'MatchOptions':
+        try:
+            scale = float(params.get('match_scale', 1.0) or 1.0)
+        except (TypeError, ValueError):
+            scale = 1.0
+        return cls(params.get('color_mode', 'color') == 'grayscale', min(1.0, max(cls.MIN_SCALE, scale)))
+
+    @property
+    def is_default(self) -> bool:
+        return not self.grayscale and self.scale >= 1.0
+
+    def prepare(self, image: np.ndarray) -> np.ndarray:
+        if self.grayscale and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.scale < 1.0:
+            h, w = image.shape[:2]
+            size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return image
+
+
+class ImageMatcher:
+    """
+    图片匹配引擎
+
+    pyramid: 先在缩小的金字塔层上找出候选位置，再只在候选附近做全分辨率匹配；
+    pyautogui: 保持原有的 pyautogui.locateOnScreen 全分辨率匹配。
+    两种引擎都使用 TM_CCOEFF_NORMED 得分，confidence 阈值含义不变；
+    模板较大时相关计算自动改用 FFT (见 FFTCorrelator)，得分与 matchTemplate 一致。
+    传入 MatchOptions 时先把截图和模板转灰度/缩小再匹配，结果坐标换算回原始分辨率。
+    开启 multi_scale 后，模板在 scales 中的各个比例下搜索一次，命中的比例按显示配置缓存，
+    之后只做单一比例匹配，用于兼容 125%/150% 等系统缩放。
+    同一帧匹配 4 个及以上模板且未启用并行后端时，粗匹配通过打包的模板图集 (TemplateAtlas) 一次完成。
+    锚点模式 (locate_anchored) 先定位锚点模板，子模板只在锚点 + 记录偏移附近的小窗口内匹配。
+    开启 result_cache 后，同一模板在内容未变化的同一截图区域上直接返回上次结果 (见 MatchResultCache)。
+    track_scores 期间记录指定模板 (含缩放/灰度后的派生模板) 的最高得分，包括低于阈值的，供匹配遥测使用。
+    """
+
+    ENGINE_PYRAMID = 'pyramid'
+    ENGINE_PYAUTOGUI = 'pyautogui'
+    ENGINES = (ENGINE_PYRAMID, ENGINE_PYAUTOGUI)
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    MAX_ATLASES = 4
+    ATLAS_MIN_TEMPLATES = 4
+
+    HINT_MARGIN = 24
+    WIDEN_MARGIN = 96
+    ANCHOR_MARGIN = 16
+    DEFAULT_SCALES = (1.0, 1.25, 1.5, 1.75, 2.0, 0.8, 0.67)
+
+    def __init__(self, engine: str = ENGINE_PYRAMID, max_levels: int = 3,
+                 min_template_size: int = 12, candidate_count: int = 8, use_hints: bool = True,
+                 multi_scale: bool = False, scales: Optional[List[float]] = None,
+                 match_backend: str = 'serial', match_workers: int = 0, prefilter: bool = False,
+                 fft: bool = True, atlas: bool = True, result_cache: bool = False,
+                 result_ttl: Optional[float] = None):
+        self.engine = engine if engine in self.ENGINES else self.ENGINE_PYRAMID
+        self.use_hints = use_hints
+        self.multi_scale = multi_scale
+        self.scales = self._normalize_scales(scales)
+        self.max_levels = max(0, max_levels)
+        self.min_template_size = max(4, min_template_size)
+        self.candidate_count = max(1, candidate_count)
+        self._prepared = None
+        # 线程模式的并行匹配会在多个线程中同时调用 search_in_frame，_prepared / _last_anchor 需要加锁
+        self._state_lock = threading.Lock()
+        self._backend = None
+        self.prefilter = None
+        self.fft = None
+        self.atlas = atlas
+        self._atlases: 'OrderedDict[tuple, object]' = OrderedDict()
+        self._atlas_lock = threading.Lock()
+        self._last_anchor = None
+        self._display_key: Optional[Tuple[float, str]] = None
+        self._score_lock = threading.Lock()
+        self._tracked: Dict[int, Dict[int, float]] = {}
+        self._aliases: Dict[int, int] = {}
+        self.set_backend(match_backend, match_workers)
+        self.set_prefilter(prefilter)
+        self.set_fft(fft)
+        self.result_cache = None
+        self.set_result_cache(result_cache, result_ttl)
+
+    @classmethod
+    def get_instance(cls) -> 'ImageMatcher':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    from utils.config import Config
+                    config = Config.get_instance()
+                    cls._instance = cls(engine=config.image_match_engine, use_hints=config.image_match_hints,
+                                        multi_scale=config.image_multi_scale, scales=config.image_match_scales,
+                                        match_backend=config.match_backend, match_workers=config.match_workers,
+                                        prefilter=config.image_prefilter, fft=config.image_fft,
+                                        atlas=config.template_atlas, result_cache=config.match_result_cache,
+                                        result_ttl=config.match_result_ttl)
+        return cls._instance
+
+    def set_engine(self, engine: str):
+        if engine in self.ENGINES:
+            self.engine = engine
+
+    def set_backend(self, mode: str, max_workers: int = 0):
+        """设置多模板匹配的并行方式: serial / thread / process"""
+        from .parallel_matcher import ParallelMatchBackend
+        if self._backend is not None:
+            self._backend.shutdown()
+        backend = ParallelMatchBackend(mode, max_workers)
+        self._backend = backend if backend.enabled else None
+
+    def set_prefilter(self, enabled: bool):
+        """开启后先用颜色分块预筛排除不可能的区域，只在剩余区域做相关匹配"""
+        from .prefilter import ColorTilePrefilter
+        self.prefilter = ColorTilePrefilter() if enabled else None
+
+    def set_fft(self, enabled: bool):
+        from .fft_match import FFTCorrelator
+        self.fft = FFTCorrelator() if enabled else None
+
+    def worker_settings(self) -> tuple:
+        """并行匹配子进程需要沿用的匹配设置"""
+        return self.engine, self.prefilter is not None, self.fft is not None, self.atlas
+
+    def set_result_cache(self, enabled: bool, ttl: Optional[float] = None):
+        from .result_cache import MatchResultCache
+        if not enabled:
+            self.result_cache = None
+        elif self.result_cache is None or (ttl is not None and ttl != self.result_cache.ttl):
+            self.result_cache = MatchResultCache(ttl=MatchResultCache.DEFAULT_TTL if ttl is None else ttl)
+
+    @contextmanager
+    def track_scores(self, templates: List[np.ndarray]):
+        """在 with 块内记录 templates 匹配时的最高得分，返回 {id(模板): 最高得分}，未匹配过的模板不在其中"""
+        scores: Dict[int, float] = {}
+        keys = [id(template) for template in templates]
+        with self._score_lock:
+            for key in keys:
+                self._tracked[key] = scores
+        try:
+            yield scores
+        finally:
+            with self._score_lock:
+                for key in keys:
+                    if self._tracked.get(key) is scores:
+                        del self._tracked[key]
+                self._aliases = {k: v for k, v in self._aliases.items() if v in self._tracked}
+
+    def _alias(self, derived: np.ndarray, template: np.ndarray):
+        """派生模板 (缩放、灰度) 的得分记到原模板上"""
+        if not self._tracked or derived is template:
+            return
+        with self._score_lock:
+            key = self._aliases.get(id(template), id(template))
+            if key in self._tracked:
+                self._aliases[id(derived)] = key
+
+    def _note_score(self, template: np.ndarray, score: float):
+        if not self._tracked:
+            return
+        with self._score_lock:
+            key = self._aliases.get(id(template), id(template))
+            scores = self._tracked.get(key)
+            if scores is not None and score > scores.get(key, -1.0):
+                scores[key] = float(score)
+
+    def correlate(self, image: np.ndarray, template: np.ndarray) -> np.ndarray:
+        """TM_CCOEFF_NORMED 得分图，大模板走 FFT"""
+        fft = self.fft
+        if fft is not None and fft.should_use(image.shape, template.shape):
+            return fft.match_template(image, template)
+        return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+
+    def set_multi_scale(self, enabled: bool, scales: Optional[List[float]] = None):
+        self.multi_scale = enabled
+        if scales is not None:
+            self.scales = self._normalize_scales(scales)
+
+    @classmethod
+    def _normalize_scales(cls, scales: Optional[List[float]]) -> Tuple[float, ...]:
+        result = []
+        for scale in scales or cls.DEFAULT_SCALES:
+            try:
+                scale = float(scale)
+            except (TypeError, ValueError):
+                continue
+            if scale > 0 and scale not in result:
+                result.append(scale)
+        return tuple(result) or (1.0,)
+
+    @staticmethod
+    def scale_template(template: np.ndarray, scale: float) -> np.ndarray:
+        if scale == 1.0:
+            return template
+        h, w = template.shape[:2]
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        return cv2.resize(template, size, interpolation=interpolation)
+
+    def _pyramid_levels(self, screen: np.ndarray, template: np.ndarray) -> int:
+        levels = 0
+        t_h, t_w = template.shape[:2]
+        s_h, s_w = screen.shape[:2]
+        while levels < self.max_levels:
+            scale = 2 ** (levels + 1)
+            if min(t_h, t_w) // scale < self.min_template_size:
+                break
+            if min(s_h, s_w) // scale < 2 * self.min_template_size:
+                break
+            levels += 1
+        return levels
+
+    def _coarse_candidates(self, result: np.ndarray, t_w: int, t_h: int) -> List[Tuple[int, int]]:
+        candidates = []
+        result = result.copy()
+        for _ in range(self.candidate_count):
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if max_val <= 0:
+                break
+            candidates.append(max_loc)
+            x, y = max_loc
+            result[max(0, y - t_h // 2):y + t_h // 2 + 1, max(0, x - t_w // 2):x + t_w // 2 + 1] = -1.0
+        return candidates
+
+    def search(self, screen: np.ndarray, template: np.ndarray) -> Optional[Tuple[int, int, float]]:
+        s_h, s_w = screen.shape[:2]
+        t_h, t_w = template.shape[:2]
+        if t_h > s_h or t_w > s_w or t_h == 0 or t_w == 0:
+            return None
+
+        levels = self._pyramid_levels(screen, template)
+        if levels == 0:
+            result = self.correlate(screen, template)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            return max_loc[0], max_loc[1], float(max_val)
+
+        small_screen = screen
+        small_template = template
+        for _ in range(levels):
+            small_screen = cv2.pyrDown(small_screen)
+            small_template = cv2.pyrDown(small_template)
+
+        coarse = self.correlate(small_screen, small_template)
+        return self._refine(screen, template, levels, coarse, small_template.shape[:2])
+
+    def _refine(self, screen: np.ndarray, template: np.ndarray, levels: int, coarse: np.ndarray,
+                small_shape: Tuple[int, int]) -> Optional[Tuple[int, int, float]]:
+        """在粗匹配得分最高的几个位置附近做全分辨率匹配"""
+        s_h, s_w = screen.shape[:2]
+        t_h, t_w = template.shape[:2]
+        candidates = self._coarse_candidates(coarse, small_shape[1], small_shape[0])
+
+        scale = 2 ** levels
+        margin = scale * 2
+        best = None
+        for cx, cy in candidates:
+            x0 = max(0, cx * scale - margin)
+            y0 = max(0, cy * scale - margin)
+            x1 = min(s_w, cx * scale + t_w + margin)
+            y1 = min(s_h, cy * scale + t_h + margin)
+            if x1 - x0 < t_w or y1 - y0 < t_h:
+                continue
+            result = self.correlate(screen[y0:y1, x0:x1], template)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if best is None or max_val > best[2]:
+                best = (x0 + max_loc[0], y0 + max_loc[1], float(max_val))
+        return best
+
+    def search_many(self, screen: np.ndarray, templates: List[np.ndarray]) -> List[Optional[Tuple[int, int, float]]]:
+        """多个模板在同一帧上搜索，粗匹配通过打包的模板图集一次完成"""
+        levels = [self._pyramid_levels(screen, template)
+                  if template.shape[0] <= screen.shape[0] and template.shape[1] <= screen.shape[1] else 0
+                  for template in templates]
+        atlas = self._get_atlas(templates, screen.shape, levels)
+        coarse = atlas.coarse_scores(screen)
+        results = []
+        for index, template in enumerate(templates):
+            if index in coarse:
+                level, scores, small_shape = coarse[index]
+                results.append(self._refine(screen, template, level, scores, small_shape))
+            else:
+                results.append(self.search(screen, template))
+        return results
+
+    def _get_atlas(self, templates: List[np.ndarray], image_shape: Tuple[int, ...], levels: List[int]):
+        from .template_atlas import TemplateAtlas
+        key = (tuple(image_shape),) + tuple(id(template) for template in templates)
+        with self._atlas_lock:
+            atlas = self._atlases.get(key)
+            if atlas is not None and atlas.matches(templates, image_shape):
+                self._atlases.move_to_end(key)
+                return atlas
+        atlas = TemplateAtlas(templates, image_shape, levels)
+        with self._atlas_lock:
+            self._atlases[key] = atlas
+            while len(self._atlases) > self.MAX_ATLASES:
+                self._atlases.popitem(last=False)
+        return atlas
+
+    def _search_prefiltered(self, screen: np.ndarray, template: np.ndarray) -> Optional[Tuple[int, int, float]]:
+        regions = self.prefilter.candidate_regions(screen, template)
+        if regions is None:
+            return self.search(screen, template)
+        best = None
+        for x, y, w, h in regions:
+            found = self.search(screen[y:y + h, x:x + w], template)
+            if found is not None and (best is None or found[2] > best[2]):
+                best = (x + found[0], y + found[1], found[2])
+        return best
+
+    def _prepare_screen(self, screen: np.ndarray, options: MatchOptions) -> np.ndarray:
+        # 批量匹配时多个模板共用同一帧，只做一次转换
+        with self._state_lock:
+            prepared = self._prepared
+            if prepared is not None and prepared[0] is screen and prepared[1] == options:
+                return prepared[2]
+            image = options.prepare(screen)
+            self._prepared = (screen, options, image)
+            return image
+
+    def match(self, screen: np.ndarray, template: np.ndarray, confidence: float,
+              options: Optional[MatchOptions] = None) -> Optional[MatchBox]:
+        if options is not None and not options.is_default:
+            prepared = options.prepare(template)
+            self._alias(prepared, template)
+            found = self.match(self._prepare_screen(screen, options), prepared, confidence)
+            if found is None:
+                return None
+            return MatchBox(int(round(found.left / options.scale)), int(round(found.top / options.scale)),
+                            template.shape[1], template.shape[0], found.score)
+
+        if self.engine == self.ENGINE_PYAUTOGUI:
+            import pyautogui
+            try:
+                location = pyautogui.locate(template, screen, confidence=confidence)
+            except pyautogui.ImageNotFoundException:
+                return None
+            if not location:
+                return None
+            return MatchBox(location.left, location.top, location.width, location.height)
+
+        found = self._search_prefiltered(screen, template) if self.prefilter else self.search(screen, template)
+        if found is not None:
+            self._note_score(template, found[2])
+        if found is None or found[2] < confidence:
+            return None
+        x, y, score = found
+        return MatchBox(x, y, template.shape[1], template.shape[0], score)
+
+    @staticmethod
+    def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, overlap: float = 0.3) -> List[int]:
+        """按得分从高到低保留框，丢弃与已保留框 IoU 超过 overlap 的框，返回保留的下标"""
+        x1, y1 = boxes[:, 0], boxes[:, 1]
+        x2, y2 = boxes[:, 0] + boxes[:, 2], boxes[:, 1] + boxes[:, 3]
+        areas = boxes[:, 2] * boxes[:, 3]
+        order = np.argsort(-scores, kind='stable')
+        keep = []
+        while order.size:
+            i = order[0]
+            keep.append(int(i))
+            rest = order[1:]
+            w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+            h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+            inter = w * h
+            iou = inter / (areas[i] + areas[rest] - inter)
+            order = rest[iou <= overlap]
+        return keep
+
+    def find_all(self, screen: np.ndarray, template: np.ndarray, confidence: float,
+                 max_results: int = 0, options: Optional[MatchOptions] = None) -> List[MatchBox]:
+        """
+        一次匹配找出模板的所有出现位置
+
+        得分图按 confidence 取阈值后做非极大值抑制，结果按从上到下、从左到右排序。
+        max_results 为 0 表示不限制数量（按得分保留前 max_results 个）。
+        """
+        original = template
+        t_h, t_w = template.shape[:2]
+        scale = 1.0
+        if options is not None and not options.is_default:
+            scale = options.scale
+            screen = self._prepare_screen(screen, options)
+            template = options.prepare(template)
+        if template.shape[0] > screen.shape[0] or template.shape[1] > screen.shape[1]:
+            return []
+
+        result = self.correlate(screen, template)
+        self._note_score(original, float(result.max()))
+        # 只保留局部极大值，阈值较低时候选点也不会成片出现
+        kernel = np.ones((max(1, template.shape[0] // 2) | 1, max(1, template.shape[1] // 2) | 1), np.uint8)
+        peaks = (result >= confidence) & (result >= cv2.dilate(result, kernel))
+        ys, xs = np.nonzero(peaks)
+        if xs.size == 0:
+            return []
+        scores = result[ys, xs]
+        boxes = np.stack([xs, ys, np.full_like(xs, template.shape[1]), np.full_like(xs, template.shape[0])],
+                         axis=1).astype(np.float32)
+        keep = self.non_max_suppression(boxes, scores)
+        if max_results > 0:
+            keep = keep[:max_results]
+
+        matches = [MatchBox(int(round(xs[i] / scale)), int(round(ys[i] / scale)), t_w, t_h, float(scores[i]))
+                   for i in keep]
+        matches.sort(key=lambda m: (m.top, m.left))
+        return matches
+
+    def locate_all_on_screen(self, template: np.ndarray, confidence: float,
+                             region: Optional[Tuple[int, int, int, int]] = None, max_results: int = 0,
+                             options: Optional[MatchOptions] = None) -> List[MatchBox]:
+        matches = []
+        for frame in self.grab_frames([template], region):
+            found = self.find_all(frame.image, template, confidence, max_results, options)
+            matches.extend(m._replace(left=m.left + frame.left, top=m.top + frame.top) for m in found)
+        if max_results and len(matches) > max_results:
+            matches = sorted(matches, key=lambda m: -m.score)[:max_results]
+        matches.sort(key=lambda m: (m.top, m.left))
+        return matches
+
+    @staticmethod
+    def grab_frame(region: Optional[Tuple[int, int, int, int]] = None):
+        from .frame_grabber import FrameGrabber
+        return FrameGrabber.get_instance().grab(region)
+
+    @classmethod
+    def grab_frames(cls, templates: List[np.ndarray], region: Optional[Tuple[int, int, int, int]] = None):
+        """
+        截取搜索所需的帧：区域先裁剪到与之重叠的显示器范围，只截这一块；
+        未指定区域且有多个显示器时每个显示器各截一帧 (各自缓存)，否则与 grab_frame 相同。
+        """
+        from .frame_grabber import FrameGrabber
+        grabber = FrameGrabber.get_instance()
+        region = cls.fit_region(templates, grabber.clip_region(region))
+        if region is None and len(grabber.monitors()) > 1:
+            frames = grabber.grab_monitors(None)
+            return [frame for frame in frames
+                    if all(t.shape[0] <= frame.height and t.shape[1] <= frame.width for t in templates)] or frames[:1]
+        return [cls.grab_frame(region)]
+
+    @staticmethod
+    def fit_region(templates: List[np.ndarray],
+                   region: Optional[Tuple[int, int, int, int]]) -> Optional[Tuple[int, int, int, int]]:
+        if region and any(t.shape[1] > region[2] or t.shape[0] > region[3] for t in templates):
+            return None
+        return region
+
+    def _match_near_hint(self, image: np.ndarray, template: np.ndarray, confidence: float,
+                         hint: Tuple[int, int], options: Optional[MatchOptions] = None) -> Optional[MatchBox]:
+        return self._match_in_area(image, template, confidence, hint, hint, self.HINT_MARGIN, options)
+
+    def _match_in_area(self, image: np.ndarray, template: np.ndarray, confidence: float,
+                       top_left: Tuple[int, int], bottom_right: Tuple[int, int], margin: int,
+                       options: Optional[MatchOptions] = None) -> Optional[MatchBox]:
+        """在模板左上角落于 [top_left, bottom_right] 外扩 margin 的范围内匹配"""
+        s_h, s_w = image.shape[:2]
+        t_h, t_w = template.shape[:2]
+        x0 = max(0, top_left[0] - margin)
+        y0 = max(0, top_left[1] - margin)
+        x1 = min(s_w, bottom_right[0] + t_w + margin)
+        y1 = min(s_h, bottom_right[1] + t_h + margin)
+        if x1 - x0 < t_w or y1 - y0 < t_h:
+            return None
+        location = self.match(image[y0:y1, x0:x1], template, confidence, options)
+        if location:
+            location = location._replace(left=location.left + x0, top=location.top + y0)
+        return location
+
+    def locate_in_frame(self, frame, template: np.ndarray, confidence: float,
+                        image_path: Optional[str] = None, options: Optional[MatchOptions] = None,
+                        record: bool = True) -> Optional[MatchBox]:
+        """
+        在一帧截图中匹配模板；开启结果缓存时，同一区域画面未变化则直接返回上次的结果
+
+        record=False 时只读取结果缓存、历史位置和比例缓存，不写入 (用于预览等不属于运行的匹配)。
+        """
+        cache = self.result_cache
+        if cache is None:
+            return self.search_in_frame(frame, template, confidence, image_path, options, record)
+        variant = (self.engine, self.multi_scale)
+        hit, location = cache.lookup(frame, template, confidence, options, variant)
+        if hit:
+            if location is not None and location.score:
+                self._note_score(template, location.score)
+            return location
+        location = self.search_in_frame(frame, template, confidence, image_path, options, record)
+        if record:
+            cache.store(frame, template, confidence, location, options, variant)
+        return location
+
+    def search_in_frame(self, frame, template: np.ndarray, confidence: float,
+                        image_path: Optional[str] = None, options: Optional[MatchOptions] = None,
+                        record: bool = True) -> Optional[MatchBox]:
+        """
+        在一帧截图中匹配模板 (不经过结果缓存)
+
+        传入 image_path 时按历史命中概率依次在这些位置附近搜索，未命中再扩大范围，最后回退到整帧搜索；
+        开启 multi_scale 时按缓存的比例缩放模板，没有缓存或缓存的比例未命中则依次尝试 scales。
+        """
+        if not (self.multi_scale and image_path):
+            return self._locate_template(frame, template, confidence, image_path, options, record)
+
+        scale = self.cached_scale(image_path, frame)
+        if scale is not None:
+            scaled = self.scale_template(template, scale)
+            self._alias(scaled, template)
+            location = self._locate_template(frame, scaled, confidence, image_path, options, record)
+            if location is not None:
+                return location
+        return self._search_scales(frame, template, confidence, image_path, options, record, skip=scale)
+
+    def scale_key(self, image_path: str, frame=None) -> Optional[str]:
+        """模板在当前显示配置下的比例缓存键；传入 frame 时同一帧内只查询一次显示配置"""
+        from .scale_cache import TemplateScaleCache
+        scale_cache = TemplateScaleCache.get_instance()
+        if frame is None:
+            return scale_cache.make_key(image_path)
+        with self._state_lock:
+            cached = self._display_key
+        if cached is not None and cached[0] == frame.timestamp:
+            display = cached[1]
+        else:
+            display = scale_cache.display_key()
+            with self._state_lock:
+                self._display_key = (frame.timestamp, display)
+        return scale_cache.make_key(image_path, display)
+
+    def cached_scale(self, image_path: str, frame=None) -> Optional[float]:
+        """当前显示配置下缓存的缩放比例，还没有缓存时返回 None"""
+        from .scale_cache import TemplateScaleCache
+        key = self.scale_key(image_path, frame)
+        return TemplateScaleCache.get_instance().get(key) if key else None
+
+    def rescan_scales(self, frame, template: np.ndarray, confidence: float, image_path: str,
+                      options: Optional[MatchOptions], skip: Optional[float] = None) -> Optional[MatchBox]:
+        """
+        按缓存的比例 skip 未找到时调用: 依次尝试其余比例，命中时更新缓存
+
+        DPI 改变而分辨率未变、或记录已过期时，只用缓存的比例会再也找不到模板。
+        """
+        return self._search_scales(frame, template, confidence, image_path, options, skip=skip)
+
+    def _search_scales(self, frame, template: np.ndarray, confidence: float,
+                       image_path: str, options: Optional[MatchOptions], record: bool = True,
+                       skip: Optional[float] = None) -> Optional[MatchBox]:
+        best = None
+        for scale in self.scales:
+            if scale == skip:
+                continue
+            scaled = self.scale_template(template, scale)
+            self._alias(scaled, template)
+            if scaled.shape[0] > frame.height or scaled.shape[1] > frame.width or min(scaled.shape[:2]) < 4:
+                continue
+            location = self._locate_template(frame, scaled, confidence, None, options)
+            if location and (best is None or location.score > best[0].score):
+                best = (location, scale)
+                if location.score >= 0.99:
+                    break
+        if best is None or not record:
+            return best[0] if best else None
+        from .scale_cache import TemplateScaleCache
+        key = self.scale_key(image_path, frame)
+        if key:
+            TemplateScaleCache.get_instance().set(key, best[1])
+        return best[0]
+
+    def lookup_hint(self, image_path: Optional[str], frame):
+        """返回 (hint_store, key, hints)，hints 为按概率排序的历史位置；未启用位置记录时为 (None, None, [])"""
+        if not (image_path and self.use_hints):
+            return None, None, []
+        from .match_hints import MatchHintStore
+        store = MatchHintStore.get_instance()
+        key = store.make_key(image_path, (frame.width, frame.height))
+        if key is None:
+            return None, None, []
+        return store, key, store.lookup(key)
+
+    @staticmethod
+    def record_hint(store, key: Optional[str], hints: List[Tuple[int, int]],
+                    location: Optional[MatchBox], rank: Optional[int], elapsed: Optional[float] = None):
+        if store is None or key is None:
+            return
+        if hints and rank is None:
+            store.record_miss(elapsed)
+        if location:
+            store.record(key, (location.left, location.top), rank, elapsed)
+
+    def search_with_hint(self, image: np.ndarray, template: np.ndarray, confidence: float,
+                         hints: List[Tuple[int, int]], options: Optional[MatchOptions]):
+        """
+        按顺序在各历史位置附近搜索，都未命中时在覆盖全部历史位置的扩大区域内搜索，最后整图搜索
+
+        返回 (结果, 命中序号, 耗时)：序号为命中的历史位置下标，扩大区域命中为 MatchHintStore.WIDENED，
+        整图搜索为 None。
+        """
+        start = time.perf_counter()
+        location, rank = self._search_hints(image, template, confidence, hints, options)
+        if location is None:
+            location = self.match(image, template, confidence, options)
+        return location, rank, time.perf_counter() - start
+
+    def _search_hints(self, image: np.ndarray, template: np.ndarray, confidence: float,
+                      hints: List[Tuple[int, int]], options: Optional[MatchOptions]) -> Tuple[Optional[MatchBox], Optional[int]]:
+        for rank, hint in enumerate(hints or ()):
+            location = self._match_near_hint(image, template, confidence, hint, options)
+            if location is not None:
+                return location, rank
+        if hints:
+            from .match_hints import MatchHintStore
+            xs, ys = [hint[0] for hint in hints], [hint[1] for hint in hints]
+            span = ((max(xs) - min(xs) + 2 * self.WIDEN_MARGIN + template.shape[1]) *
+                    (max(ys) - min(ys) + 2 * self.WIDEN_MARGIN + template.shape[0]))
+            # 扩大后已接近整帧时直接整图搜索
+            if span * 2 < image.shape[0] * image.shape[1]:
+                location = self._match_in_area(image, template, confidence, (min(xs), min(ys)),
+                                               (max(xs), max(ys)), self.WIDEN_MARGIN, options)
+                if location is not None:
+                    return location, MatchHintStore.WIDENED
+        return None, None
+
+    @staticmethod
+    def to_screen(frame, location: Optional[MatchBox]) -> Optional[MatchBox]:
+        if location and (frame.left or frame.top):
+            location = location._replace(left=location.left + frame.left, top=location.top + frame.top)
+        return location
+
+    def _locate_template(self, frame, template: np.ndarray, confidence: float,
+                         image_path: Optional[str], options: Optional[MatchOptions],
+                         record: bool = True) -> Optional[MatchBox]:
+        store, key, hints = self.lookup_hint(image_path, frame)
+        location, rank, elapsed = self.search_with_hint(frame.image, template, confidence, hints, options)
+        if record:
+            self.record_hint(store, key, hints, location, rank, elapsed)
+        return self.to_screen(frame, location)
+
+    def locate_on_screen(self, template: np.ndarray, confidence: float,
+                         region: Optional[Tuple[int, int, int, int]] = None,
+                         image_path: Optional[str] = None,
+                         options: Optional[MatchOptions] = None) -> Optional[MatchBox]:
+        return self.locate_many([template], [confidence], region,
+                                [image_path] if image_path else None,
+                                [options] if options else None)[0]
+
+    @staticmethod
+    def parse_offset(value) -> Optional[Tuple[int, int]]:
+        """解析 "dx,dy" 形式的锚点偏移，空值返回 None，格式错误抛出 ValueError"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, str):
+            parts = [part.strip() for part in value.split(',')]
+        else:
+            parts = list(value)
+        if len(parts) != 2:
+            raise ValueError(f"锚点偏移格式错误: {value}，应为 dx,dy")
+        try:
+            return int(parts[0]), int(parts[1])
+        except (TypeError, ValueError):
+            raise ValueError(f"锚点偏移格式错误: {value}，应为 dx,dy")
+
+    def _locate_anchor(self, frame, anchor: np.ndarray, confidence: float, anchor_path: Optional[str],
+                       options: Optional[MatchOptions]) -> Optional[MatchBox]:
+        # 同一次截图 (含其裁剪) 内多个子模板共用一次锚点定位
+        key = (id(anchor), confidence, options, frame.timestamp)
+        with self._state_lock:
+            cached = self._last_anchor
+        if cached is not None and cached[0] == key and cached[1] is anchor:
+            location = cached[2]
+            if location is None or (frame.left <= location.left and frame.top <= location.top and
+                                    location.left + location.width <= frame.left + frame.width and
+                                    location.top + location.height <= frame.top + frame.height):
+                return location
+        location = self.locate_in_frame(frame, anchor, confidence, anchor_path, options)
+        with self._state_lock:
+            self._last_anchor = (key, anchor, location)
+        return location
+
+    def locate_anchored(self, frame, anchor: np.ndarray, template: np.ndarray, confidence: float,
+                        offset: Tuple[int, int], anchor_path: Optional[str] = None,
+                        image_path: Optional[str] = None, options: Optional[MatchOptions] = None,
+                        margin: int = ANCHOR_MARGIN) -> Optional[MatchBox]:
+        """
+        先定位锚点，再在锚点左上角 + offset 外扩 margin 的窗口内匹配子模板
+
+        锚点找到而子模板不在窗口内时返回 None (不再整帧搜索，避免命中其他对话框里的同名按钮)；
+        锚点本身没找到时按普通方式整帧搜索子模板。锚点按多比例缓存缩放时，偏移和子模板按相同比例缩放。
+        """
+        found = self._locate_anchor(frame, anchor, confidence, anchor_path, options)
+        if found is None:
+            return self.locate_in_frame(frame, template, confidence, image_path, options)
+        ratio = found.width / float(anchor.shape[1])
+        if abs(ratio - 1.0) > 0.02:
+            scaled = self.scale_template(template, ratio)
+            self._alias(scaled, template)
+            template = scaled
+            offset = (int(round(offset[0] * ratio)), int(round(offset[1] * ratio)))
+        expected = (found.left - frame.left + offset[0], found.top - frame.top + offset[1])
+        location = self._match_in_area(frame.image, template, confidence, expected, expected, margin, options)
+        return self.to_screen(frame, location)
+
+    def locate_anchored_on_screen(self, anchor: np.ndarray, template: np.ndarray, confidence: float,
+                                  offset: Tuple[int, int], region: Optional[Tuple[int, int, int, int]] = None,
+                                  anchor_path: Optional[str] = None, image_path: Optional[str] = None,
+                                  options: Optional[MatchOptions] = None) -> Optional[MatchBox]:
+        frames = self.grab_frames([anchor, template], region)
+        if len(frames) > 1:
+            frames = [frame for frame in frames
+                      if self._locate_anchor(frame, anchor, confidence, anchor_path, options)] or frames[:1]
+        return self.locate_anchored(frames[0], anchor, template, confidence, offset, anchor_path, image_path, options)
+
+    def measure_offset(self, anchor: np.ndarray, child: Tuple[int, int], confidence: float,
+                       anchor_path: Optional[str] = None,
+                       options: Optional[MatchOptions] = None) -> Optional[Tuple[int, int]]:
+        """截取整屏定位锚点，返回屏幕坐标 child 相对锚点左上角的偏移；锚点不在屏幕上时返回 None"""
+        for frame in self.grab_frames([anchor], None):
+            found = self.locate_in_frame(frame, anchor, confidence, anchor_path, options)
+            if found is not None:
+                return child[0] - found.left, child[1] - found.top
+        return None
+
+    def locate_many(self, templates: List[np.ndarray], confidences: List[float],
+                    region: Optional[Tuple[int, int, int, int]] = None,
+                    image_paths: Optional[List[Optional[str]]] = None,
+                    options: Optional[List[Optional[MatchOptions]]] = None) -> List[Optional[MatchBox]]:
+        """在同一帧截图上依次匹配多个模板，返回屏幕坐标下的结果列表；多个显示器时取各显示器中得分最高的结果"""
+        if not templates:
+            return []
+        frames = self.grab_frames(templates, region)
+        if image_paths is None:
+            image_paths = [None] * len(templates)
+        if options is None:
+            options = [None] * len(templates)
+        if len(frames) == 1:
+            return self._locate_many_in_frame(frames[0], templates, confidences, image_paths, options)
+
+        results: List[Optional[MatchBox]] = [None] * len(templates)
+        for frame in frames:
+            fits = [i for i, t in enumerate(templates) if t.shape[0] <= frame.height and t.shape[1] <= frame.width]
+            found = self._locate_many_in_frame(frame, [templates[i] for i in fits], [confidences[i] for i in fits],
+                                               [image_paths[i] for i in fits], [options[i] for i in fits])
+            for i, location in zip(fits, found):
+                if location and (results[i] is None or location.score > results[i].score):
+                    results[i] = location
+        return results
+
+    def _locate_many_in_frame(self, frame, templates: List[np.ndarray], confidences: List[float],
+                              image_paths: List[Optional[str]], options: list) -> List[Optional[MatchBox]]:
+        cache = self.result_cache
+        if cache is None or not templates:
+            return self._search_many_in_frame(frame, templates, confidences, image_paths, options)
+        variant = (self.engine, self.multi_scale)
+        results: List[Optional[MatchBox]] = [None] * len(templates)
+        pending = []
+        for index, (template, confidence, option) in enumerate(zip(templates, confidences, options)):
+            hit, location = cache.lookup(frame, template, confidence, option, variant)
+            if hit:
+                if location is not None and location.score:
+                    self._note_score(template, location.score)
+                results[index] = location
+            else:
+                pending.append(index)
+        found = self._search_many_in_frame(frame, [templates[i] for i in pending], [confidences[i] for i in pending],
+                                           [image_paths[i] for i in pending], [options[i] for i in pending])
+        for index, location in zip(pending, found):
+            cache.store(frame, templates[index], confidences[index], location, options[index], variant)
+            results[index] = location
+        return results
+
+    def _search_many_in_frame(self, frame, templates: List[np.ndarray], confidences: List[float],
+                              image_paths: List[Optional[str]], options: list) -> List[Optional[MatchBox]]:
+        if not templates:
+            return []
+        backend = self._backend
+        if backend is not None and len(templates) >= backend.MIN_TEMPLATES:
+            return backend.locate_many(self, frame, templates, confidences, image_paths, options)
+        if self.atlas and self.engine == self.ENGINE_PYRAMID and len(templates) >= self.ATLAS_MIN_TEMPLATES:
+            return self._locate_many_atlas(frame, templates, confidences, image_paths, options)
+        return [self.search_in_frame(frame, template, confidence, image_path, option)
+                for template, confidence, image_path, option in zip(templates, confidences, image_paths, options)]
+
+    def _locate_many_atlas(self, frame, templates: List[np.ndarray], confidences: List[float],
+                           image_paths: List[Optional[str]], options: list) -> List[Optional[MatchBox]]:
+        """先逐个在历史位置附近搜索，剩下需要整帧搜索的模板打包成图集一次粗匹配"""
+        results: List[Optional[MatchBox]] = [None] * len(templates)
+        pending = []
+        scaled_from = {}
+        for index, (template, confidence, image_path, option) in enumerate(
+                zip(templates, confidences, image_paths, options)):
+            if option is not None and not option.is_default:
+                results[index] = self.search_in_frame(frame, template, confidence, image_path, option)
+                continue
+            if self.multi_scale and image_path:
+                scale = self.cached_scale(image_path, frame)
+                if scale is None:
+                    results[index] = self.search_in_frame(frame, template, confidence, image_path, option)
+                    continue
+                scaled = self.scale_template(template, scale)
+                self._alias(scaled, template)
+                scaled_from[index] = (template, scale)
+                template = scaled
+            store, key, hints = self.lookup_hint(image_path, frame)
+            start = time.perf_counter()
+            location, rank = self._search_hints(frame.image, template, confidence, hints, option)
+            elapsed = time.perf_counter() - start
+            if location is not None:
+                self.record_hint(store, key, hints, location, rank, elapsed)
+                results[index] = self.to_screen(frame, location)
+            else:
+                pending.append((index, template, confidence, store, key, hints, elapsed))
+
+        if len(pending) < self.ATLAS_MIN_TEMPLATES:
+            for index, template, confidence, store, key, hints, elapsed in pending:
+                start = time.perf_counter()
+                location = self.match(frame.image, template, confidence)
+                self.record_hint(store, key, hints, location, None, elapsed + time.perf_counter() - start)
+                results[index] = self.to_screen(frame, location)
+        elif pending:
+            start = time.perf_counter()
+            found = self.search_many(frame.image, [item[1] for item in pending])
+            share = (time.perf_counter() - start) / len(pending)
+            for (index, template, confidence, store, key, hints, elapsed), best in zip(pending, found):
+                location = None
+                if best is not None:
+                    self._note_score(template, best[2])
+                if best is not None and best[2] >= confidence:
+                    location = MatchBox(best[0], best[1], template.shape[1], template.shape[0], best[2])
+                self.record_hint(store, key, hints, location, None, elapsed + share)
+                results[index] = self.to_screen(frame, location)
+
+        for index, (template, scale) in scaled_from.items():
+            if results[index] is None:
+                results[index] = self.rescan_scales(frame, template, confidences[index], image_paths[index],
+                                                    options[index], scale)
+        return results
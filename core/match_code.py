@@ -0,0 +1,166 @@
+from typing import Iterable, List, Optional, Tuple
+
+from .actions import Action, ActionType
+from .image_matcher import ImageMatcher, MatchOptions
+
+
+LOCATE_TYPES = (ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK)
+
+SCALED_HELPER = [
+    "def locate_on_screen_scaled(image_path, confidence, scale, grayscale=False, region=None):",
+    '    """Locate an image on a downscaled (optionally grayscale) screenshot."""',
+    "    import cv2",
+    "    import numpy as np",
+    "    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR",
+    "    template = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), flag)",
+    "    screen = cv2.cvtColor(np.array(pyautogui.screenshot(region=region)), cv2.COLOR_RGB2GRAY if grayscale else cv2.COLOR_RGB2BGR)",
+    "    small_screen = cv2.resize(screen, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)",
+    "    small_template = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)",
+    "    if small_template.shape[0] > small_screen.shape[0] or small_template.shape[1] > small_screen.shape[1]:",
+    "        return None",
+    "    result = cv2.matchTemplate(small_screen, small_template, cv2.TM_CCOEFF_NORMED)",
+    "    _, max_val, _, max_loc = cv2.minMaxLoc(result)",
+    "    if max_val < confidence:",
+    "        return None",
+    "    left, top = (region[0], region[1]) if region else (0, 0)",
+    "    return (left + round(max_loc[0] / scale), top + round(max_loc[1] / scale), template.shape[1], template.shape[0])",
+    "",
+    "",
+]
+
+ANCHORED_HELPER = [
+    "def locate_near_anchor(anchor_path, image_path, confidence, dx, dy, width, height, margin, scale=1.0, grayscale=False):",
+    '    """Locate an image only next to its anchor; search the whole screen when the anchor is not visible."""',
+    "    def locate(path, region=None):",
+    "        if scale < 1.0:",
+    "            return locate_on_screen_scaled(path, confidence, scale, grayscale, region)",
+    "        try:",
+    "            return pyautogui.locateOnScreen(path, confidence=confidence, grayscale=grayscale, region=region)",
+    "        except pyautogui.ImageNotFoundException:",
+    "            return None",
+    "    anchor = locate(anchor_path) if anchor_path else None",
+    "    if not anchor:",
+    "        return locate(image_path)",
+    "    region = (anchor[0] + dx - margin, anchor[1] + dy - margin, width + 2 * margin, height + 2 * margin)",
+    "    return locate(image_path, region)",
+    "",
+    "",
+]
+
+
+FIND_ALL_HELPER = [
+    "def locate_all_on_screen(image_path, confidence, max_results=0, scale=1.0, grayscale=False):",
+    '    """Locate every occurrence of an image using thresholding and non-maximum suppression."""',
+    "    import cv2",
+    "    import numpy as np",
+    "    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR",
+    "    template = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), flag)",
+    "    screen = cv2.cvtColor(np.array(pyautogui.screenshot()), cv2.COLOR_RGB2GRAY if grayscale else cv2.COLOR_RGB2BGR)",
+    "    t_h, t_w = template.shape[:2]",
+    "    if scale < 1.0:",
+    "        screen = cv2.resize(screen, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)",
+    "        template = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)",
+    "    if template.shape[0] > screen.shape[0] or template.shape[1] > screen.shape[1]:",
+    "        return []",
+    "    result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)",
+    "    kernel = np.ones((max(1, template.shape[0] // 2) | 1, max(1, template.shape[1] // 2) | 1), np.uint8)",
+    "    ys, xs = np.nonzero((result >= confidence) & (result >= cv2.dilate(result, kernel)))",
+    "    order = sorted(range(len(xs)), key=lambda i: -result[ys[i], xs[i]])",
+    "    w, h = template.shape[1], template.shape[0]",
+    "    kept = []",
+    "    for i in order:",
+    "        x, y = int(xs[i]), int(ys[i])",
+    "        overlaps = False",
+    "        for kx, ky in kept:",
+    "            inter = max(0, min(x, kx) + w - max(x, kx)) * max(0, min(y, ky) + h - max(y, ky))",
+    "            if inter / (2 * w * h - inter) > 0.3:",
+    "                overlaps = True",
+    "                break",
+    "        if not overlaps:",
+    "            kept.append((x, y))",
+    "            if max_results and len(kept) >= max_results:",
+    "                break",
+    "    boxes = [(round(x / scale), round(y / scale), t_w, t_h) for x, y in kept]",
+    "    return sorted(boxes, key=lambda box: (box[1], box[0]))",
+    "",
+    "",
+]
+
+
+def escape_path(path: str) -> str:
+    return path.replace('\\', '\\\\')
+
+
+def anchor_params(action: Action) -> Optional[Tuple[str, Tuple[int, int], Tuple[int, int]]]:
+    """返回 (锚点图片路径, 相对锚点的偏移, 子图片尺寸)；未设置锚点或图片无法读取时返回 None"""
+    try:
+        anchor = action._anchor()
+        if anchor is None:
+            return None
+        template = action._load_template(action.params.get('image_path', ''))
+    except Exception:
+        return None
+    return anchor[1], anchor[2], (template.shape[1], template.shape[0])
+
+
+def helper_lines(actions: Iterable[Action]) -> List[str]:
+    """导出脚本中这些动作需要的辅助函数定义"""
+    scaled = anchored = find_all = False
+    for action in actions:
+        find_all = find_all or action.action_type == ActionType.IMAGE_FIND_ALL
+        if action.action_type not in LOCATE_TYPES:
+            continue
+        scaled = scaled or MatchOptions.from_params(action.params).scale < 1.0
+        anchored = anchored or anchor_params(action) is not None
+    lines = []
+    if scaled:
+        lines.extend(SCALED_HELPER)
+    if anchored:
+        lines.extend(ANCHORED_HELPER)
+    if find_all:
+        lines.extend(FIND_ALL_HELPER)
+    return lines
+
+
+def locate_expression(action: Action, path_expr: str, anchor_expr: Optional[str] = None) -> str:
+    """
+    定位一张图片的表达式，结果为 (left, top, width, height) 或 None
+
+    按 color_mode / match_scale 选择 pyautogui 灰度匹配或 locate_on_screen_scaled；
+    设置了锚点时改用 locate_near_anchor，只在锚点 + 偏移附近查找。anchor_expr 默认为锚点图片的路径字面量。
+    """
+    confidence = action.params.get('confidence', 0.9)
+    options = MatchOptions.from_params(action.params)
+    anchor = anchor_params(action)
+    if anchor is not None:
+        anchor_path, (dx, dy), (width, height) = anchor
+        if anchor_expr is None:
+            anchor_expr = f"r'{escape_path(anchor_path)}'"
+        return (f"locate_near_anchor({anchor_expr}, {path_expr}, {confidence}, {dx}, {dy}, {width}, {height}, "
+                f"{ImageMatcher.ANCHOR_MARGIN}, scale={options.scale}, grayscale={options.grayscale})")
+    if options.scale < 1.0:
+        return f"locate_on_screen_scaled({path_expr}, {confidence}, {options.scale}, grayscale={options.grayscale})"
+    if options.grayscale:
+        return f"pyautogui.locateOnScreen({path_expr}, confidence={confidence}, grayscale=True)"
+    return f"pyautogui.locateOnScreen({path_expr}, confidence={confidence})"
+
+
+def find_all_lines(action: Action, path_expr: str, var_name: str, fallback: str = "") -> List[str]:
+    """
+    查找全部图片的代码，与运行时设置的变量一致
+
+    {var}_list 为按从上到下、从左到右排序的 (left, top, width, height)，另设 {var}_count、{var}
+    以及每个结果的 {var}_{序号}_x/_y/_width/_height (写入模块全局变量，导出函数中也能引用)。
+    """
+    confidence = action.params.get('confidence', 0.9)
+    max_results = action.params.get('max_results', 20)
+    options = MatchOptions.from_params(action.params)
+    return [
+        f"{var_name}_list = locate_all_on_screen({path_expr}, {confidence}, {max_results}, "
+        f"scale={options.scale}, grayscale={options.grayscale}){fallback}",
+        f"{var_name}_count = len({var_name}_list)",
+        f"{var_name} = {var_name}_count > 0",
+        f"for {var_name}_index, {var_name}_box in enumerate({var_name}_list, 1):",
+        f"    for {var_name}_field, {var_name}_value in zip(('x', 'y', 'width', 'height'), {var_name}_box):",
+        f"        globals()[f'{var_name}_{{{var_name}_index}}_{{{var_name}_field}}'] = {var_name}_value",
+    ]
@@ -0,0 +1,240 @@
+import atexit
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class MatchHintStore:
+    """
+    每个模板的历史命中位置 (空间先验)
+
+    键由模板文件 (路径, 修改时间, 大小) 和搜索区域尺寸组成，
+    位置保存为相对搜索区域左上角 (绑定窗口时即窗口) 的偏移，窗口移动后依然有效。
+    相近的命中位置合并为一个区域并累计次数，每个模板最多保留 MAX_REGIONS 个，
+    lookup 按命中概率从高到低返回，次数相同时最近命中的在前。
+    模板文件被修改后，同一路径下旧签名的记录全部丢弃。
+    数据持久化到 ~/.simpleRPA/match_hints.json，新进程也能直接使用：
+    record 只标记有改动，由后台定时器在 SAVE_INTERVAL 后写盘，运行结束和进程退出时也会保存，
+    匹配路径上不做文件读写。
+    """
+
+    MAX_ENTRIES = 2000
+    MAX_REGIONS = 4
+    CLUSTER_RADIUS = 8
+    MAX_COUNT = 64
+    WIDENED = -1
+    SAVE_INTERVAL = 5.0
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._priors: Dict[str, List[List[int]]] = {}
+        self._files: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self.invalidated = 0
+        self.rank_hits: List[int] = []
+        self.widened_hits = 0
+        self._prior_time = 0.0
+        self._full_time = 0.0
+        self._full_searches = 0
+        if path:
+            self.load()
+
+    @classmethod
+    def get_instance(cls) -> 'MatchHintStore':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    config_dir = os.path.join(os.path.expanduser('~'), '.simpleRPA')
+                    os.makedirs(config_dir, exist_ok=True)
+                    cls._instance = cls(os.path.join(config_dir, 'match_hints.json'))
+                    atexit.register(cls._instance.save)
+        return cls._instance
+
+    @staticmethod
+    def make_key(image_path: str, area_size: Tuple[int, int]) -> Optional[str]:
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{area_size[0]}x{area_size[1]}"
+
+    @staticmethod
+    def _file_signature(key: str) -> Tuple[str, str]:
+        parts = key.split('|')
+        return parts[0], '|'.join(parts[1:3])
+
+    def _check_file(self, key: str):
+        path, signature = self._file_signature(key)
+        previous = self._files.get(path)
+        if previous == signature:
+            return
+        if previous is not None:
+            stale = [k for k in self._priors if self._file_signature(k) == (path, previous)]
+            for k in stale:
+                del self._priors[k]
+            if stale:
+                self.invalidated += len(stale)
+                self._mark_dirty()
+        self._files[path] = signature
+
+    def lookup(self, key: str) -> List[Tuple[int, int]]:
+        """按命中概率排序的历史位置，没有记录时返回空列表"""
+        with self._lock:
+            self.lookups += 1
+            self._check_file(key)
+            return [(region[0], region[1]) for region in self._priors.get(key, ())]
+
+    def probabilities(self, key: str) -> List[Tuple[Tuple[int, int], float]]:
+        with self._lock:
+            regions = self._priors.get(key, ())
+            total = float(sum(region[2] for region in regions)) or 1.0
+            return [((region[0], region[1]), region[2] / total) for region in regions]
+
+    def record(self, key: str, offset: Tuple[int, int], rank: Optional[int] = None,
+               elapsed: Optional[float] = None):
+        """
+        记录一次命中
+
+        rank 为命中的历史位置序号，WIDENED 表示在扩大后的区域内命中，
+        None 表示整图搜索得到；elapsed 为本次搜索耗时，用于统计节省的时间。
+        """
+        x, y = int(offset[0]), int(offset[1])
+        with self._lock:
+            self._check_file(key)
+            regions = self._priors.pop(key, [])
+            self._priors[key] = regions
+            self._count_search(rank, elapsed)
+
+            match = None
+            for region in regions:
+                if abs(region[0] - x) <= self.CLUSTER_RADIUS and abs(region[1] - y) <= self.CLUSTER_RADIUS:
+                    match = region
+                    break
+            if match is None:
+                if len(regions) >= self.MAX_REGIONS:
+                    regions.pop()
+                match = [x, y, 0]
+            else:
+                regions.remove(match)
+            match[0], match[1] = x, y
+            match[2] += 1
+            regions.insert(0, match)
+            if match[2] > self.MAX_COUNT:
+                # 计数封顶后整体减半，位置分布变化时先验能跟上
+                for region in regions:
+                    region[2] = max(1, region[2] // 2)
+            regions.sort(key=lambda region: -region[2])
+
+            while len(self._priors) > self.MAX_ENTRIES:
+                del self._priors[next(iter(self._priors))]
+            self._mark_dirty()
+
+    def _count_search(self, rank: Optional[int], elapsed: Optional[float]):
+        if rank is None:
+            if elapsed is not None:
+                self._full_time += elapsed
+                self._full_searches += 1
+            return
+        self.hits += 1
+        if elapsed is not None:
+            self._prior_time += elapsed
+        if rank == self.WIDENED:
+            self.widened_hits += 1
+        else:
+            while len(self.rank_hits) <= rank:
+                self.rank_hits.append(0)
+            self.rank_hits[rank] += 1
+
+    def record_miss(self, elapsed: Optional[float] = None):
+        """有历史位置但都未命中 (整图搜索结束后调用)"""
+        with self._lock:
+            self.misses += 1
+            if elapsed is not None:
+                self._full_time += elapsed
+                self._full_searches += 1
+
+    def forget(self, key: str):
+        with self._lock:
+            if self._priors.pop(key, None) is not None:
+                self._mark_dirty()
+
+    def _mark_dirty(self):
+        """标记有改动并安排一次后台保存 (调用时需持有 _lock)"""
+        self._dirty = True
+        if self._path and self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_INTERVAL, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def load(self) -> bool:
+        if not self._path or not os.path.exists(self._path):
+            return False
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            priors = {key: [[int(v) for v in region[:3]] for region in regions][:self.MAX_REGIONS]
+                      for key, regions in data.get('priors', {}).items()}
+            # 兼容只记录上次位置的旧格式
+            for key, value in data.get('hints', {}).items():
+                priors.setdefault(key, [[int(value[0]), int(value[1]), 1]])
+            with self._lock:
+                self._priors = priors
+                self._files = dict(self._file_signature(key) for key in priors)
+            return True
+        except Exception as e:
+            print(f"加载匹配位置记录失败: {e}")
+            return False
+
+    def save(self) -> bool:
+        if not self._path:
+            return False
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return True
+            data = {'version': 2, 'priors': {key: [list(region) for region in regions]
+                                             for key, regions in self._priors.items()}}
+            self._dirty = False
+        try:
+            with open(self._path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            return True
+        except Exception as e:
+            print(f"保存匹配位置记录失败: {e}")
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._priors.clear()
+            self._files.clear()
+            self._mark_dirty()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.hits + self.misses
+            avg_prior = self._prior_time / self.hits if self.hits else 0.0
+            avg_full = self._full_time / self._full_searches if self._full_searches else 0.0
+            return {
+                'entries': len(self._priors),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / attempts if attempts else 0.0,
+                'rank_hits': list(self.rank_hits),
+                'widened_hits': self.widened_hits,
+                'invalidated': self.invalidated,
+                'avg_prior_ms': round(avg_prior * 1000.0, 3),
+                'avg_full_ms': round(avg_full * 1000.0, 3),
+                'saved_ms': round(max(0.0, avg_full - avg_prior) * self.hits * 1000.0, 1) if avg_full else 0.0,
+            }
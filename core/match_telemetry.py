@@ -0,0 +1,282 @@
+import csv
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+class TemplateMetrics:
+    """单个模板的累计匹配数据: 次数、结果、重试、耗时和最高得分的直方图"""
+
+    def __init__(self):
+        self.count = 0
+        self.outcomes: Dict[str, int] = {outcome: 0 for outcome in MatchTelemetry.OUTCOMES}
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.scored = 0
+        self.score_sum = 0.0
+        self.min_score: Optional[float] = None
+        self.max_score: Optional[float] = None
+        self.near_misses = 0
+        self.threshold: Optional[float] = None
+        self.last_outcome: Optional[str] = None
+        self.last_time = 0.0
+        self.latency_histogram = [0] * (len(MatchTelemetry.LATENCY_BUCKETS_MS) + 1)
+        self.score_histogram = [0] * MatchTelemetry.SCORE_BINS
+
+    def add(self, duration: float, score: Optional[float], threshold: float, retries: int, outcome: str):
+        self.count += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.retries += retries
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.threshold = threshold
+        self.last_outcome = outcome
+        self.last_time = time.time()
+        self.latency_histogram[bisect_left(MatchTelemetry.LATENCY_BUCKETS_MS, duration * 1000.0)] += 1
+        if score is None:
+            return
+        self.scored += 1
+        self.score_sum += score
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        bins = MatchTelemetry.SCORE_BINS
+        self.score_histogram[min(bins - 1, max(0, int(score * bins)))] += 1
+        if outcome != MatchTelemetry.HIT and score >= threshold - MatchTelemetry.NEAR_MISS:
+            self.near_misses += 1
+
+    def percentile_ms(self, fraction: float) -> float:
+        """由耗时直方图估算分位数，返回所在区间的上界 (最后一档返回最大耗时)"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.latency_histogram):
+            seen += bucket
+            if seen >= target and bucket:
+                if index < len(MatchTelemetry.LATENCY_BUCKETS_MS):
+                    return min(float(MatchTelemetry.LATENCY_BUCKETS_MS[index]), self.max_time * 1000.0)
+                break
+        return self.max_time * 1000.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        hits = self.outcomes.get(MatchTelemetry.HIT, 0)
+        return {
+            'count': self.count,
+            'hits': hits,
+            'hit_rate': hits / self.count if self.count else 0.0,
+            'outcomes': dict(self.outcomes),
+            'retries': self.retries,
+            'avg_retries': self.retries / self.count if self.count else 0.0,
+            'total_ms': self.total_time * 1000.0,
+            'avg_ms': self.total_time * 1000.0 / self.count if self.count else 0.0,
+            'p50_ms': self.percentile_ms(0.5),
+            'p95_ms': self.percentile_ms(0.95),
+            'max_ms': self.max_time * 1000.0,
+            'avg_score': self.score_sum / self.scored if self.scored else None,
+            'min_score': self.min_score,
+            'max_score': self.max_score,
+            'near_misses': self.near_misses,
+            'threshold': self.threshold,
+            'last_outcome': self.last_outcome,
+            'last_time': self.last_time,
+            'latency_histogram': list(self.latency_histogram),
+            'score_histogram': list(self.score_histogram),
+        }
+
+
+class MatchProbe:
+    """一次图片动作内的匹配记录: 累计各次尝试的匹配耗时，outcome 由动作在结束前设置"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.duration = 0.0
+        self.outcome: Optional[str] = None
+        self.score: Optional[float] = None
+
+    @contextmanager
+    def attempt(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.duration += time.perf_counter() - start
+            self.attempts += 1
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+
+class MatchTelemetry:
+    """
+    模板匹配遥测
+
+    每个图片动作结束时按模板 (图片路径) 记录匹配耗时、最高得分 (包括低于阈值的)、阈值、重试次数和结果，
+    累计成耗时/得分直方图和命中率，运行结束后可用 get_stats 查询，或导出为 JSON / CSV。
+    得分在阈值下方 NEAR_MISS 以内的未命中计为险些命中，用于发现阈值设置过高或不稳定的模板。
+    数据只保存在内存中，进程退出即清空。
+    """
+
+    HIT = 'hit'
+    MISS = 'miss'
+    TIMEOUT = 'timeout'
+    STOPPED = 'stopped'
+    ERROR = 'error'
+    OUTCOMES = (HIT, MISS, TIMEOUT, STOPPED, ERROR)
+
+    LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+    SCORE_BINS = 20
+    NEAR_MISS = 0.05
+
+    CSV_FIELDS = ('template', 'count', 'hits', 'hit_rate', 'retries', 'avg_retries', 'total_ms', 'avg_ms',
+                  'p50_ms', 'p95_ms', 'max_ms', 'avg_score', 'min_score', 'max_score', 'near_misses',
+                  'threshold', 'last_outcome') + OUTCOMES + ('latency_histogram', 'score_histogram')
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._templates: Dict[str, TemplateMetrics] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    @classmethod
+    def get_instance(cls) -> 'MatchTelemetry':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    from utils.config import Config
+                    cls._instance = cls(Config.get_instance().match_telemetry)
+        return cls._instance
+
+    def record(self, template: str, duration: float, score: Optional[float], threshold: float,
+               retries: int = 0, outcome: str = HIT):
+        if not self.enabled:
+            return
+        if outcome not in self.OUTCOMES:
+            raise ValueError(f"未知的匹配结果: {outcome}")
+        key = template or '<未命名>'
+        with self._lock:
+            metrics = self._templates.get(key)
+            if metrics is None:
+                metrics = self._templates[key] = TemplateMetrics()
+            metrics.add(max(0.0, duration), None if score is None else float(score), float(threshold),
+                        max(0, int(retries)), outcome)
+
+    @contextmanager
+    def measure(self, template_name: str, template, threshold: float):
+        """
+        记录一次图片动作的匹配
+
+        动作内的每次匹配放在 probe.attempt() 中计时，匹配过程中模板的最高得分由 ImageMatcher.track_scores 收集。
+        动作未设置 probe.outcome 就结束时记为 stopped，抛出异常时记为 error。
+        """
+        probe = MatchProbe()
+        if not self.enabled:
+            yield probe
+            return
+        from .image_matcher import ImageMatcher
+        failed = False
+        try:
+            with ImageMatcher.get_instance().track_scores([template]) as scores:
+                try:
+                    yield probe
+                finally:
+                    probe.score = scores.get(id(template))
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            outcome = probe.outcome or (self.ERROR if failed else self.STOPPED)
+            self.record(template_name, probe.duration, probe.score, threshold, probe.retries, outcome)
+
+    def get_template_stats(self, template: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            metrics = self._templates.get(template)
+            return metrics.to_dict() if metrics else None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各模板的统计，按累计耗时从高到低排列"""
+        with self._lock:
+            items = [(name, metrics.to_dict()) for name, metrics in self._templates.items()]
+        items.sort(key=lambda item: -item[1]['total_ms'])
+        return dict(items)
+
+    def get_summary(self) -> Dict[str, Any]:
+        stats = self.get_stats()
+        count = sum(s['count'] for s in stats.values())
+        hits = sum(s['hits'] for s in stats.values())
+        return {
+            'templates': len(stats),
+            'matches': count,
+            'hit_rate': hits / count if count else 0.0,
+            'total_ms': sum(s['total_ms'] for s in stats.values()),
+            'never_hit': [name for name, s in stats.items() if s['hits'] == 0],
+            'near_misses': sum(s['near_misses'] for s in stats.values()),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+        self.started = time.time()
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'version': 1,
+            'started': self.started,
+            'exported': time.time(),
+            'latency_buckets_ms': list(self.LATENCY_BUCKETS_MS),
+            'score_bins': self.SCORE_BINS,
+            'summary': self.get_summary(),
+            'templates': self.get_stats(),
+        }
+
+    def export_json(self, path: str) -> bool:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            print(f"导出匹配遥测失败: {e}")
+            return False
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        rows = []
+        for name, stats in self.get_stats().items():
+            row = {field: stats.get(field) for field in self.CSV_FIELDS if field in stats}
+            row['template'] = name
+            row.update(stats['outcomes'])
+            row['latency_histogram'] = ';'.join(str(v) for v in stats['latency_histogram'])
+            row['score_histogram'] = ';'.join(str(v) for v in stats['score_histogram'])
+            rows.append(row)
+        return rows
+
+    def export_csv(self, path: str) -> bool:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # utf-8-sig 让 Excel 正确显示中文路径
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.CSV_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.to_rows())
+            return True
+        except Exception as e:
+            print(f"导出匹配遥测失败: {e}")
+            return False
+
+    def export(self, path: str) -> bool:
+        """按扩展名导出: .csv 为 CSV，其他为 JSON"""
+        if os.path.splitext(path)[1].lower() == '.csv':
+            return self.export_csv(path)
+        return self.export_json(path)
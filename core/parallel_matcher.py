@@ -0,0 +1,136 @@
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+_worker_matchers = {}
+
+
+def _worker_matcher(settings: tuple):
+    """子进程中按调用方的 (引擎, 预筛, FFT, 图集) 设置创建匹配器，保证与串行模式走同一套流程"""
+    from .image_matcher import ImageMatcher
+    matcher = _worker_matchers.get(settings)
+    if matcher is None:
+        engine, prefilter, fft, atlas = settings
+        matcher = _worker_matchers[settings] = ImageMatcher(engine=engine, use_hints=False, prefilter=prefilter,
+                                                            fft=fft, atlas=atlas)
+    return matcher
+
+
+def _match_in_shared_frame(shm_name: str, shape: Tuple[int, ...], dtype: str, template: np.ndarray,
+                           confidence: float, hints, options, settings: tuple):
+    """
+    进程池中执行: 挂载共享内存中的帧，在其上匹配一个模板
+
+    返回 ((结果, 命中序号, 耗时), 最高得分)，最高得分包括低于阈值的，供调用方进程的匹配遥测使用。
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        matcher = _worker_matcher(settings)
+        with matcher.track_scores([template]) as scores:
+            result = matcher.search_with_hint(image, template, confidence, hints, options)
+        del image
+        return result, scores.get(id(template))
+    finally:
+        shm.close()
+
+
+class ParallelMatchBackend:
+    """
+    多模板并行匹配
+
+    thread: 线程池，OpenCV 匹配时释放 GIL，帧直接共享引用；
+    process: 进程池，帧只复制一次到共享内存，子进程按名称挂载，不做 pickle。
+    位置记录、多比例缓存和匹配得分仍在调用方进程中读写。
+    """
+
+    MODE_SERIAL = 'serial'
+    MODE_THREAD = 'thread'
+    MODE_PROCESS = 'process'
+    MODES = (MODE_SERIAL, MODE_THREAD, MODE_PROCESS)
+
+    MIN_TEMPLATES = 4
+
+    def __init__(self, mode: str = MODE_THREAD, max_workers: int = 0):
+        self.mode = mode if mode in self.MODES else self.MODE_SERIAL
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != self.MODE_SERIAL and self.max_workers > 1
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == self.MODE_PROCESS:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='image-match')
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def locate_many(self, matcher, frame, templates: List[np.ndarray], confidences: List[float],
+                    image_paths: List[Optional[str]], options: list) -> list:
+        if self.mode == self.MODE_PROCESS:
+            return self._locate_many_process(matcher, frame, templates, confidences, image_paths, options)
+
+        executor = self._get_executor()
+        futures = [executor.submit(matcher.search_in_frame, frame, template, confidence, image_path, option)
+                   for template, confidence, image_path, option in zip(templates, confidences, image_paths, options)]
+        return [future.result() for future in futures]
+
+    def _locate_many_process(self, matcher, frame, templates: List[np.ndarray], confidences: List[float],
+                             image_paths: List[Optional[str]], options: list) -> list:
+        image = frame.image
+        shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        try:
+            shared = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+            shared[...] = image
+            del shared
+
+            executor = self._get_executor()
+            results: list = [None] * len(templates)
+            jobs = []
+            for index, (template, confidence, image_path, option) in enumerate(
+                    zip(templates, confidences, image_paths, options)):
+                searched, scale = template, None
+                if matcher.multi_scale and image_path:
+                    scale = matcher.cached_scale(image_path, frame)
+                    if scale is None:
+                        # 尚未确定比例的模板需要依次尝试多个比例，留在本进程处理
+                        results[index] = matcher.search_in_frame(frame, template, confidence, image_path, option)
+                        continue
+                    searched = matcher.scale_template(template, scale)
+                store, key, hints = matcher.lookup_hint(image_path, frame)
+                future = executor.submit(_match_in_shared_frame, shm.name, image.shape, image.dtype.str,
+                                         searched, confidence, hints, option, matcher.worker_settings())
+                jobs.append((index, template, scale, future, store, key, hints))
+
+            for index, template, scale, future, store, key, hints in jobs:
+                (location, rank, elapsed), score = future.result()
+                if score is not None:
+                    matcher._note_score(template, score)
+                matcher.record_hint(store, key, hints, location, rank, elapsed)
+                if location is None and scale is not None:
+                    # 缓存的比例未命中，在本进程重新尝试其余比例
+                    results[index] = matcher.rescan_scales(frame, template, confidences[index],
+                                                           image_paths[index], options[index], scale)
+                else:
+                    results[index] = matcher.to_screen(frame, location)
+            return results
+        finally:
+            shm.close()
+            shm.unlink()
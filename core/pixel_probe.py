@@ -0,0 +1,169 @@
+import re
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class PixelProbe(NamedTuple):
+    """一个取色点: 屏幕坐标和目标颜色 (RGB)"""
+    x: int
+    y: int
+    color: Tuple[int, int, int]
+
+
+class ProbeResult(NamedTuple):
+    matched: List[bool]
+    colors: List[Tuple[int, int, int]]
+
+    @property
+    def count(self) -> int:
+        return sum(self.matched)
+
+    def passed(self, mode: str = 'all') -> bool:
+        if not self.matched:
+            return False
+        return any(self.matched) if mode == 'any' else all(self.matched)
+
+
+MATCH_MODES = ('all', 'any')
+
+_HEX_COLOR = re.compile(r'^#?([0-9a-fA-F]{6})$')
+
+
+def parse_color(value: Any) -> Tuple[int, int, int]:
+    """解析 '#RRGGBB'、'RRGGBB' 或 (r, g, b)"""
+    if isinstance(value, str):
+        match = _HEX_COLOR.match(value.strip())
+        if not match:
+            raise ValueError(f"颜色格式错误: {value}")
+        hex_value = match.group(1)
+        return tuple(int(hex_value[i:i + 2], 16) for i in (0, 2, 4))
+    r, g, b = (int(v) for v in value)
+    return r, g, b
+
+
+def color_to_hex(color: Tuple[int, int, int]) -> str:
+    return '#{:02X}{:02X}{:02X}'.format(*color)
+
+
+def parse_probes(value: Any) -> List[PixelProbe]:
+    """
+    解析取色点列表
+
+    文本格式为 "x,y,#RRGGBB; x,y,#RRGGBB"，也接受 [[x, y, color], ...] 或
+    [{'x': .., 'y': .., 'color': ..}, ...]。
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        items = [part.strip() for part in re.split(r'[;\n]', value) if part.strip()]
+        probes = []
+        for item in items:
+            fields = [field.strip() for field in item.split(',')]
+            if len(fields) == 3:
+                color = parse_color(fields[2])
+            elif len(fields) == 5:
+                color = parse_color(fields[2:])
+            else:
+                raise ValueError(f"取色点格式错误: {item}")
+            probes.append(PixelProbe(int(fields[0]), int(fields[1]), color))
+        return probes
+
+    probes = []
+    for item in value:
+        if isinstance(item, dict):
+            probes.append(PixelProbe(int(item['x']), int(item['y']), parse_color(item['color'])))
+        else:
+            probes.append(PixelProbe(int(item[0]), int(item[1]), parse_color(item[2])))
+    return probes
+
+
+def probe_settings(params: dict) -> Tuple[int, int]:
+    """取色动作的 (颜色容差, 采样半径)：容差截断到 0-255，半径不小于 0，不是整数时抛出 ValueError"""
+    try:
+        tolerance = int(params.get('tolerance', 20))
+        radius = int(params.get('radius', 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"颜色容差和采样半径必须是整数: {params.get('tolerance')}, {params.get('radius')}")
+    return min(255, max(0, tolerance)), max(0, radius)
+
+
+def format_probes(probes: List[PixelProbe]) -> str:
+    return '; '.join(f"{probe.x},{probe.y},{color_to_hex(probe.color)}" for probe in probes)
+
+
+def probe_region(probes: List[PixelProbe], radius: int = 0) -> Tuple[int, int, int, int]:
+    """
+    覆盖所有取色点 (含采样半径) 的最小区域 (x, y, w, h)
+
+    副屏在主屏左侧/上方时坐标可以为负，这里不做裁剪，交给截图后端 / FrameGrabber 处理。
+    """
+    xs = [probe.x for probe in probes]
+    ys = [probe.y for probe in probes]
+    left = min(xs) - radius
+    top = min(ys) - radius
+    return left, top, max(xs) + radius + 1 - left, max(ys) + radius + 1 - top
+
+
+def sample_colors(image: np.ndarray, xs: np.ndarray, ys: np.ndarray, radius: int = 0) -> np.ndarray:
+    """
+    在 BGR 图像上一次性采样多个点，返回 (N, 3) 的 RGB 颜色
+
+    radius > 0 时取 (2r+1)x(2r+1) 方块的平均色，越界部分按边缘截断。
+    """
+    height, width = image.shape[:2]
+    if radius > 0:
+        offsets = np.arange(-radius, radius + 1)
+        patch_ys = np.clip(ys[:, None, None] + offsets[None, :, None], 0, height - 1)
+        patch_xs = np.clip(xs[:, None, None] + offsets[None, None, :], 0, width - 1)
+        samples = image[patch_ys, patch_xs].reshape(len(xs), -1, image.shape[2]).mean(axis=1)
+        samples = np.rint(samples).astype(np.int16)
+    else:
+        samples = image[np.clip(ys, 0, height - 1), np.clip(xs, 0, width - 1)].astype(np.int16)
+    return samples[:, 2::-1]
+
+
+def evaluate_probes(image: np.ndarray, origin: Tuple[int, int], probes: List[PixelProbe],
+                    tolerance: int = 20, radius: int = 0) -> ProbeResult:
+    """image 为以 origin 为左上角的截图，各通道差值都不超过 tolerance 视为匹配"""
+    if not probes:
+        return ProbeResult([], [])
+    points = np.array([(probe.x, probe.y) for probe in probes], dtype=np.int64)
+    targets = np.array([probe.color for probe in probes], dtype=np.int16)
+    samples = sample_colors(image, points[:, 0] - origin[0], points[:, 1] - origin[1], radius)
+    matched = np.abs(samples - targets).max(axis=1) <= tolerance
+    return ProbeResult([bool(m) for m in matched], [tuple(int(c) for c in color) for color in samples])
+
+
+def check_pixels(probes: List[PixelProbe], tolerance: int = 20, radius: int = 0,
+                 offset: Optional[Tuple[int, int]] = None, max_age: Optional[float] = None) -> ProbeResult:
+    """只截取覆盖全部取色点的一块区域 (同一 tick 内有整屏帧时直接复用)，再统一比较"""
+    from .frame_grabber import FrameGrabber
+    if offset:
+        probes = [PixelProbe(probe.x + offset[0], probe.y + offset[1], probe.color) for probe in probes]
+    if not probes:
+        return ProbeResult([], [])
+    region = probe_region(probes, radius)
+    frame = FrameGrabber.get_instance().grab(region, max_age=max_age)
+    return evaluate_probes(frame.image, (frame.left, frame.top), probes, tolerance, radius)
+
+
+def to_code_lines(probes: List[PixelProbe], tolerance: int, radius: int, mode: str, var_name: str) -> List[str]:
+    """生成独立脚本中的取色代码: 一次区域截图后逐点比较"""
+    if not probes:
+        return [f"{var_name} = False", f"{var_name}_count = 0"]
+    left, top, width, height = probe_region(probes, radius)
+    lines = [f"pixel_screen = pyautogui.screenshot(region=({left}, {top}, {width}, {height}))"]
+    for index, probe in enumerate(probes, 1):
+        dx, dy = probe.x - left, probe.y - top
+        if radius > 0:
+            sample = (f"pixel_screen.crop(({dx - radius}, {dy - radius}, {dx + radius + 1}, {dy + radius + 1}))"
+                      f".reduce({2 * radius + 1}).getpixel((0, 0))[:3]")
+        else:
+            sample = f"pixel_screen.getpixel(({dx}, {dy}))[:3]"
+        lines.append(f"{var_name}_{index} = all(abs(a - b) <= {tolerance} for a, b in zip({sample}, {probe.color}))")
+    flags = ', '.join(f"{var_name}_{index}" for index in range(1, len(probes) + 1))
+    lines.append(f"{var_name}_count = sum([{flags}])")
+    combine = 'any' if mode == 'any' else 'all'
+    lines.append(f"{var_name} = {combine}([{flags}])")
+    return lines
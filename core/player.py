@@ -1,8 +1,10 @@
+import os
 import time
 import threading
 from typing import List, Callable, Optional, Tuple
 from enum import Enum
-from .actions import Action, ActionType
+from .actions import Action, ActionType, ImageCheckBatch
+from .frame_grabber import FrameGrabber
 
 
 class PlayerState(Enum):
@@ -44,6 +46,26 @@ class WindowOffsetProvider:
             self._last_error = str(e)
             return None, self._last_error
     
+    def get_search_region(self, padding: int = 0) -> Optional[Tuple[int, int, int, int]]:
+        if not self._hwnd or not self._window_utils:
+            return None
+        
+        try:
+            rect = self._window_utils.get_client_rect_screen(self._hwnd)
+        except Exception:
+            return None
+        if not rect:
+            return None
+        
+        left, top, right, bottom = rect
+        left -= padding
+        top -= padding
+        right += padding
+        bottom += padding
+        if right <= left or bottom <= top:
+            return None
+        return (left, top, right - left, bottom - top)
+    
     def validate_window(self) -> Tuple[bool, str]:
         if not self._hwnd:
             return True, ""
@@ -72,6 +94,7 @@ class Player:
         self.current_repeat: int = 0
         self.infinite_loop: bool = False
         self.timeout_seconds: float = 0
+        self.image_search_padding: int = 0
         self._local_group_manager = local_group_manager
         
         self._thread: Optional[threading.Thread] = None
@@ -84,6 +107,7 @@ class Player:
         self._window_offset_provider: Optional[WindowOffsetProvider] = None
         self._window_hwnd: int = 0
         self._window_utils = None
+        self._image_check_batch: Optional[ImageCheckBatch] = None
         
         self._callbacks = {
             'on_action_start': [],
@@ -149,6 +173,9 @@ class Player:
     def set_timeout(self, seconds: float):
         self.timeout_seconds = max(0, seconds)
     
+    def set_image_search_padding(self, padding: int):
+        self.image_search_padding = max(0, padding)
+    
     def set_window_offset(self, offset: Optional[Tuple[int, int]]):
         self._window_offset = offset
     
@@ -178,6 +205,43 @@ class Player:
         
         return offset, None
     
+    def _get_image_search_region(self, action: Action) -> Optional[Tuple[int, int, int, int]]:
+        if not self._window_offset_provider:
+            return None
+        
+        if action.action_type not in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK,
+                                      ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL,
+                                      ActionType.WAIT_STABLE, ActionType.WAIT_REGION_CHANGE,
+                                      ActionType.ACTION_GROUP_REF]:
+            return None
+        
+        return self._window_offset_provider.get_search_region(self.image_search_padding)
+    
+    def _get_image_check_batch(self, index: int, search_region: Optional[Tuple[int, int, int, int]]) -> Optional[ImageCheckBatch]:
+        action = self.actions[index]
+        if action.action_type != ActionType.IMAGE_CHECK or action.repeat_count > 1:
+            self._image_check_batch = None
+            return None
+        
+        if self._image_check_batch is not None and action in self._image_check_batch:
+            return self._image_check_batch
+        
+        window_title = action.window_title or self._window_title
+        run = [action]
+        for next_action in self.actions[index + 1:]:
+            if next_action.action_type != ActionType.IMAGE_CHECK or next_action.repeat_count > 1:
+                break
+            if next_action.delay_before > 0 or run[-1].delay_after > 0:
+                break
+            if next_action.background_mode != action.background_mode:
+                break
+            if (next_action.window_title or self._window_title) != window_title:
+                break
+            run.append(next_action)
+        
+        self._image_check_batch = ImageCheckBatch(run, search_region) if len(run) > 1 else None
+        return self._image_check_batch
+    
     def _validate_window_before_action(self, action: Action) -> Tuple[bool, Optional[str]]:
         if not self._window_offset_provider:
             return True, None
@@ -254,7 +318,7 @@ class Player:
         self._pause_event.set()
         self._start_time = time.time()
         
-        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread = threading.Thread(target=self._run_session, daemon=True)
         self._thread.start()
         
         self._emit('on_state_changed', self.state)
@@ -389,6 +453,35 @@ class Player:
     def tab_key(self) -> str:
         return self._tab_key
     
+    def _run_session(self):
+        try:
+            self._run()
+        finally:
+            self._save_match_hints()
+            self._export_telemetry()
+    
+    @staticmethod
+    def _save_match_hints():
+        """运行结束时把本次记录的匹配位置写盘 (匹配过程中只在后台定时保存)"""
+        from .match_hints import MatchHintStore
+        store = MatchHintStore._instance
+        if store is not None:
+            store.save()
+    
+    def _export_telemetry(self):
+        """配置了 match_telemetry_export 时，每次运行结束把匹配遥测导出到该文件 (.csv 或 .json)"""
+        try:
+            from utils.config import Config
+            path = Config.get_instance().match_telemetry_export
+            if not path:
+                return
+            from .match_telemetry import MatchTelemetry
+            telemetry = MatchTelemetry.get_instance()
+            if telemetry.enabled:
+                telemetry.export(os.path.expanduser(path))
+        except Exception as e:
+            print(f"[匹配遥测] 导出失败: {e}")
+    
     def _run(self):
         completed_actions = 0
         repeat_count = 0
@@ -412,6 +505,7 @@ class Player:
                 break
             
             self.current_repeat = repeat_count
+            self._image_check_batch = None
             self._emit('on_repeat_changed', repeat_count + 1)
             
             for i, action in enumerate(self.actions):
@@ -465,6 +559,7 @@ class Player:
                     current_offset = self._window_offset
                 
                 self._activate_window_before_action(action)
+                search_region = self._get_image_search_region(action)
                 
                 adjusted_delay_before = action.delay_before / self.speed if self.speed > 0 else action.delay_before
                 adjusted_delay_after = action.delay_after / self.speed if self.speed > 0 else action.delay_after
@@ -515,8 +610,12 @@ class Player:
                     if action.background_mode and not action.window_title:
                         action.window_title = self._window_title
                 
+                image_batch = self._get_image_check_batch(i, search_region)
+                if image_batch is not None:
+                    action._image_check_batch = image_batch
+                
                 try:
-                    success = action.execute(window_offset=current_offset, should_stop=lambda: self._stop_flag, local_group_manager=self._local_group_manager)
+                    success = action.execute(window_offset=current_offset, should_stop=lambda: self._stop_flag, local_group_manager=self._local_group_manager, search_region=search_region)
                     self._emit('on_action_end', action, i, success)
                 except Exception as e:
                     self._emit('on_error', action, i, str(e))
@@ -530,6 +629,11 @@ class Player:
                         delattr(action, '_on_nested_sub_action_start')
                     if hasattr(action, '_on_nested_sub_action_end'):
                         delattr(action, '_on_nested_sub_action_end')
+                    if hasattr(action, '_image_check_batch'):
+                        delattr(action, '_image_check_batch')
+                    if action.action_type not in [ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL, ActionType.PIXEL_CHECK,
+                                                  ActionType.WAIT_STABLE, ActionType.WAIT_REGION_CHANGE]:
+                        FrameGrabber.get_instance().invalidate()
                 
                 completed_actions += 1
                 self._emit('on_progress', -1, i, repeat_count)
@@ -541,6 +645,7 @@ class Player:
         
         self.state = PlayerState.IDLE
         self._emit('on_state_changed', self.state)
+        self._image_check_batch = None
         self._emit('on_finished', True)
     
     def get_state(self) -> PlayerState:
@@ -575,6 +680,7 @@ class Player:
             current_offset = window_offset or self._window_offset
         
         self._activate_window_before_action(action)
+        search_region = self._get_image_search_region(action)
         
         adjusted_delay_before = action.delay_before / self.speed if self.speed > 0 else action.delay_before
         adjusted_delay_after = action.delay_after / self.speed if self.speed > 0 else action.delay_after
@@ -585,7 +691,7 @@ class Player:
         self._emit('on_action_start', action, index)
         
         try:
-            success = action.execute(window_offset=current_offset, should_stop=lambda: self._stop_flag, local_group_manager=self._local_group_manager)
+            success = action.execute(window_offset=current_offset, should_stop=lambda: self._stop_flag, local_group_manager=self._local_group_manager, search_region=search_region)
             self._emit('on_action_end', action, index, success)
             
             if adjusted_delay_after > 0:
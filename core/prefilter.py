@@ -0,0 +1,114 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class ColorTilePrefilter:
+    """
+    相关匹配前的颜色分块预筛
+
+    取模板中占比较高的几种主色，用积分图统计截图中接近各主色的像素数。
+    左上角落在同一个 T x T tile 内的所有窗口，其主色像素数不超过它们的并集
+    ((w+T-1)x(h+T-1) 的区域) 内的数量，这个上界达不到模板主色像素数的 min_ratio
+    时整块跳过；只有通过的区域交给 matchTemplate。
+    模板没有明显主色 (纹理/噪声类) 或通过区域过大时返回 None，由调用方全图搜索。
+    主色按固定容差比较，不像 TM_CCOEFF_NORMED 那样不受亮度/增益影响：
+    悬停高亮、主题切换等整体变亮或变暗的目标可能被跳过，因此默认关闭 (配置项 image_prefilter)。
+    """
+
+    def __init__(self, tile_size: int = 16, tolerance: int = 40, min_ratio: float = 0.5,
+                 max_colors: int = 3, min_share: float = 0.08, max_coverage: float = 0.5,
+                 min_screen_ratio: int = 16):
+        self.tile_size = max(4, tile_size)
+        self.tolerance = tolerance
+        self.min_ratio = min_ratio
+        self.max_colors = max_colors
+        self.min_share = min_share
+        self.max_coverage = max_coverage
+        self.min_screen_ratio = min_screen_ratio
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.applied = 0
+        self.skipped_area = 0.0
+
+    def signature(self, template: np.ndarray) -> List[Tuple[np.ndarray, int]]:
+        """模板主色及其像素数 [(颜色, 数量), ...]，没有足够集中的颜色时返回空列表"""
+        pixels = template.reshape(-1, 1 if template.ndim == 2 else template.shape[2])
+        bins = (pixels >> 6).astype(np.int32)
+        codes = bins[:, 0]
+        for channel in range(1, bins.shape[1]):
+            codes = codes * 4 + bins[:, channel]
+        counts = np.bincount(codes)
+        order = np.argsort(-counts)[:self.max_colors]
+
+        colors = []
+        for code in order:
+            if counts[code] < self.min_share * len(codes):
+                break
+            color = pixels[codes == code].mean(axis=0)
+            near = np.abs(pixels.astype(np.int16) - color).max(axis=1) <= self.tolerance
+            colors.append((color, int(near.sum())))
+        return colors
+
+    def _color_integral(self, screen: np.ndarray, color: np.ndarray) -> np.ndarray:
+        lower = np.clip(color - self.tolerance, 0, 255)
+        upper = np.clip(color + self.tolerance, 0, 255)
+        mask = cv2.inRange(screen, lower, upper)
+        return cv2.integral(mask >> 7, sdepth=cv2.CV_32S)
+
+    def candidate_regions(self, screen: np.ndarray,
+                          template: np.ndarray) -> Optional[List[Tuple[int, int, int, int]]]:
+        """返回需要精确匹配的区域 [(x, y, w, h)]；空列表表示整帧都不可能匹配，None 表示不适用"""
+        s_h, s_w = screen.shape[:2]
+        t_h, t_w = template.shape[:2]
+        if t_h > s_h or t_w > s_w or s_h * s_w < self.min_screen_ratio * t_h * t_w:
+            return None
+        if screen.ndim != template.ndim:
+            return None
+        with self._lock:
+            self.checks += 1
+
+        colors = self.signature(template)
+        if not colors:
+            return None
+
+        # 每个起点 tile 对应的窗口覆盖该 tile 内所有起点的模板范围
+        tile = self.tile_size
+        y0 = np.arange(0, s_h - t_h + 1, tile)[:, None]
+        x0 = np.arange(0, s_w - t_w + 1, tile)[None, :]
+        y1 = np.minimum(y0 + tile - 1 + t_h, s_h)
+        x1 = np.minimum(x0 + tile - 1 + t_w, s_w)
+        passed = None
+        for color, count in colors:
+            integral = self._color_integral(screen, color)
+            upper = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+            ok = upper >= self.min_ratio * count
+            passed = ok if passed is None else passed & ok
+
+        regions = []
+        area = 0
+        count, _, stats, _ = cv2.connectedComponentsWithStats(passed.astype(np.uint8), connectivity=8)
+        for label in range(1, count):
+            tx, ty, tw, th = stats[label, :4]
+            left, top = tx * tile, ty * tile
+            right = min(s_w, (tx + tw) * tile - 1 + t_w)
+            bottom = min(s_h, (ty + th) * tile - 1 + t_h)
+            regions.append((int(left), int(top), int(right - left), int(bottom - top)))
+            area += (right - left) * (bottom - top)
+
+        if area > self.max_coverage * s_w * s_h:
+            return None
+        with self._lock:
+            self.applied += 1
+            self.skipped_area += 1.0 - area / float(s_w * s_h)
+        return regions
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'checks': self.checks,
+                'applied': self.applied,
+                'avg_skipped': self.skipped_area / self.applied if self.applied else 0.0,
+            }
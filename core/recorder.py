@@ -228,7 +228,8 @@ class Recorder:
     
     def _capture_click_region(self, x: int, y: int) -> Optional[str]:
         try:
-            import pyautogui
+            from .capture import save_image
+            from .frame_grabber import FrameGrabber
             
             size = self.config.image_capture_size
             region = (
@@ -238,7 +239,7 @@ class Recorder:
                 size
             )
             
-            screenshot = pyautogui.screenshot(region=region)
+            frame = FrameGrabber.get_instance().grab(region, max_age=0)
             
             images_dir = os.path.join(os.path.expanduser('~'), '.simpleRPA', 'images')
             os.makedirs(images_dir, exist_ok=True)
@@ -246,7 +247,8 @@ class Recorder:
             filename = f"click_{int(time.time() * 1000)}.png"
             filepath = os.path.join(images_dir, filename)
             
-            screenshot.save(filepath)
+            if not save_image(frame.image, filepath):
+                return None
             
             return filepath
         except Exception as e:
@@ -0,0 +1,108 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class MatchResultCache:
+    """
+    匹配结果缓存
+
+    以 (模板, 置信度, 匹配选项, 截图区域, 截图内容哈希) 为键记住最近的匹配结果，包括未找到。
+    循环中同一区域的画面没有变化时直接返回上次的结果，不再做相关匹配。
+    条目数不超过 max_entries (LRU 淘汰)，超过 ttl 秒的条目作废。
+    画面哈希为逐行 CRC32 (1080p 约 3ms)，按截图对象缓存，同一帧上的多个模板只计算一次。
+    """
+
+    DEFAULT_MAX_ENTRIES = 512
+    DEFAULT_TTL = 30.0
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = max(0.0, float(ttl))
+        self._entries: 'OrderedDict[tuple, Tuple[np.ndarray, Any, float]]' = OrderedDict()
+        self._last_hash: Optional[Tuple[np.ndarray, int]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.hash_time = 0.0
+        self.hashes = 0
+
+    @staticmethod
+    def image_hash(image: np.ndarray) -> int:
+        if image.flags['C_CONTIGUOUS']:
+            return zlib.crc32(image.data)
+        # 截图的裁剪视图逐行计算，避免整块拷贝
+        crc = 0
+        for row in image:
+            crc = zlib.crc32(np.ascontiguousarray(row).data, crc)
+        return crc
+
+    def _frame_hash(self, image: np.ndarray) -> int:
+        last = self._last_hash
+        if last is not None and last[0] is image:
+            return last[1]
+        start = time.perf_counter()
+        value = self.image_hash(image)
+        with self._lock:
+            self.hash_time += time.perf_counter() - start
+            self.hashes += 1
+        self._last_hash = (image, value)
+        return value
+
+    def _key(self, frame, template: np.ndarray, confidence: float, options, variant) -> tuple:
+        return (id(template), float(confidence), options, variant, frame.region,
+                self._frame_hash(frame.image))
+
+    def lookup(self, frame, template: np.ndarray, confidence: float, options=None, variant=None) -> Tuple[bool, Any]:
+        """返回 (是否命中, 缓存的结果)；结果可以是 None (上次未找到)"""
+        key = self._key(frame, template, confidence, options, variant)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is template:
+                if now - entry[2] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+        return False, None
+
+    def store(self, frame, template: np.ndarray, confidence: float, location, options=None, variant=None):
+        key = self._key(frame, template, confidence, options, variant)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (template, location, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            # 顺带清掉最旧的过期条目
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if now - oldest[2] <= self.ttl:
+                    break
+                self._entries.popitem(last=False)
+                self.expired += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._last_hash = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'expired': self.expired,
+                'avg_hash_ms': self.hash_time * 1000.0 / self.hashes if self.hashes else 0.0,
+            }
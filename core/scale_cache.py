@@ -0,0 +1,125 @@
+import atexit
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+
+class TemplateScaleCache:
+    """
+    记录每个模板在当前显示配置下匹配成功的缩放比例
+
+    键由模板文件 (路径, 修改时间, 大小) 和显示配置 (分辨率、DPI) 组成，
+    换显示器或调整系统缩放后自动重新搜索。数据持久化到 ~/.simpleRPA/template_scales.json。
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._scales: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    @classmethod
+    def get_instance(cls) -> 'TemplateScaleCache':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    config_dir = os.path.join(os.path.expanduser('~'), '.simpleRPA')
+                    os.makedirs(config_dir, exist_ok=True)
+                    cls._instance = cls(os.path.join(config_dir, 'template_scales.json'))
+                    atexit.register(cls._instance.save)
+        return cls._instance
+
+    @staticmethod
+    def display_key() -> str:
+        try:
+            import pyautogui
+            width, height = pyautogui.size()
+        except Exception:
+            width, height = 0, 0
+        dpi = 96
+        if sys.platform == 'win32':
+            try:
+                import ctypes
+                dpi = ctypes.windll.user32.GetDpiForSystem()
+            except Exception:
+                pass
+        return f"{width}x{height}@{dpi}"
+
+    def make_key(self, image_path: str, display: Optional[str] = None) -> Optional[str]:
+        """display 为调用方已经取得的 display_key()，不传时现查"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{display or self.display_key()}"
+
+    def get(self, key: str) -> Optional[float]:
+        with self._lock:
+            scale = self._scales.get(key)
+            if scale is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return scale
+
+    def set(self, key: str, scale: float):
+        with self._lock:
+            if self._scales.get(key) == scale:
+                return
+            self._scales[key] = scale
+            self._dirty = True
+        # 缩放比例只在首次搜索时写入，直接落盘
+        self.save()
+
+    def clear(self):
+        with self._lock:
+            self._scales.clear()
+            self._dirty = True
+
+    def load(self) -> bool:
+        if not self._path or not os.path.exists(self._path):
+            return False
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self._lock:
+                self._scales = {key: float(value) for key, value in data.get('scales', {}).items()}
+            return True
+        except Exception as e:
+            print(f"加载模板缩放记录失败: {e}")
+            return False
+
+    def save(self) -> bool:
+        if not self._path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return True
+            data = {'scales': dict(self._scales)}
+            self._dirty = False
+        try:
+            with open(self._path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            return True
+        except Exception as e:
+            print(f"保存模板缩放记录失败: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._scales),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,98 @@
+from typing import Dict, List, NamedTuple, Tuple
+
+import cv2
+import numpy as np
+
+from .fft_match import FFTCorrelator
+
+
+class AtlasGroup(NamedTuple):
+    level: int
+    size: Tuple[int, int]
+    indices: List[int]
+    shapes: List[Tuple[int, int]]
+    spectra: np.ndarray
+    norms: List[float]
+
+
+class TemplateAtlas:
+    """
+    多模板打包匹配
+
+    按金字塔层把模板分组，同组模板缩小后的 CCS 频谱写入一块连续的
+    (模板数, 通道, 频谱高, 频谱宽) float32 数组。每帧每层只做一次金字塔缩小、
+    一次频谱变换和一次积分图，之后每个模板只需频域相乘和一次逆变换，
+    同尺寸模板还共用窗口方差；得到的粗匹配得分与 matchTemplate 一致，
+    再交给 ImageMatcher 在候选位置做全分辨率细化。
+    图集绑定帧尺寸和模板对象，尺寸不变时跨帧复用，只有模板集合变化才重新打包。
+    """
+
+    def __init__(self, templates: List[np.ndarray], image_shape: Tuple[int, ...], levels: List[int]):
+        self.templates = list(templates)
+        self.image_shape = tuple(image_shape)
+        channels = image_shape[2] if len(image_shape) == 3 else 1
+
+        by_level: Dict[int, List[int]] = {}
+        for index, (template, level) in enumerate(zip(self.templates, levels)):
+            if level > 0 and template.ndim == len(image_shape) and (template.ndim == 2 or template.shape[2] == channels):
+                by_level.setdefault(level, []).append(index)
+
+        self.groups: List[AtlasGroup] = []
+        for level in sorted(by_level):
+            indices = by_level[level]
+            small_h, small_w = self.level_shape(image_shape[:2], level)
+            size = (cv2.getOptimalDFTSize(small_h), cv2.getOptimalDFTSize(small_w))
+            spectra = np.empty((len(indices), channels) + size, dtype=np.float32)
+            shapes, norms = [], []
+            for slot, index in enumerate(indices):
+                small = self.templates[index]
+                for _ in range(level):
+                    small = cv2.pyrDown(small)
+                _, norm = FFTCorrelator.template_spectra(small, size, out=spectra[slot])
+                shapes.append(small.shape[:2])
+                norms.append(norm)
+            self.groups.append(AtlasGroup(level, size, indices, shapes, spectra, norms))
+
+    @staticmethod
+    def level_shape(shape: Tuple[int, int], level: int) -> Tuple[int, int]:
+        height, width = shape
+        for _ in range(level):
+            height, width = (height + 1) // 2, (width + 1) // 2
+        return height, width
+
+    @property
+    def packed_count(self) -> int:
+        return sum(len(group.indices) for group in self.groups)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(group.spectra.nbytes for group in self.groups)
+
+    def matches(self, templates: List[np.ndarray], image_shape: Tuple[int, ...]) -> bool:
+        return (tuple(image_shape) == self.image_shape and len(templates) == len(self.templates)
+                and all(a is b for a, b in zip(templates, self.templates)))
+
+    def coarse_scores(self, image: np.ndarray) -> Dict[int, Tuple[int, np.ndarray, Tuple[int, int]]]:
+        """返回 {模板下标: (层数, 粗匹配得分图, 缩小后的模板尺寸)}，未打包的模板不在其中"""
+        if tuple(image.shape) != self.image_shape:
+            raise ValueError("图集与截图尺寸不一致")
+        results = {}
+        pyramid = [image]
+        for group in self.groups:
+            while len(pyramid) <= group.level:
+                pyramid.append(cv2.pyrDown(pyramid[-1]))
+            small = pyramid[group.level]
+            spectra = FFTCorrelator.image_spectra(small, group.size)
+            integrals = FFTCorrelator.integrals(small)
+            scales: Dict[Tuple[int, int], np.ndarray] = {}
+            for slot, index in enumerate(group.indices):
+                t_h, t_w = group.shapes[slot]
+                numerator = FFTCorrelator.correlate_spectra(spectra, group.spectra[slot],
+                                                            small.shape[0] - t_h + 1, small.shape[1] - t_w + 1)
+                scale = scales.get((t_h, t_w))
+                if scale is None:
+                    scale = scales[(t_h, t_w)] = FFTCorrelator.window_scale(integrals, t_h, t_w)
+                results[index] = (group.level, FFTCorrelator.normalize(numerator, scale, group.norms[slot]),
+                                  (t_h, t_w))
+        return results
+
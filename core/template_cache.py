@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class TemplateCache:
+    """
+    进程级模板图片缓存
+
+    以 (路径, 修改时间, 文件大小) 为键缓存解码后的 BGR 数组，
+    按 LRU 顺序淘汰，总内存不超过 max_bytes。
+    缓存的数组为只读，调用方需要修改时应自行 copy()。
+    """
+
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._max_bytes = max(0, int(max_bytes))
+        self._entries: 'OrderedDict[Tuple[str, int, int], np.ndarray]' = OrderedDict()
+        self._path_keys: Dict[str, Tuple[str, int, int]] = {}
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def get_instance(cls) -> 'TemplateCache':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def _make_key(image_path: str) -> Optional[Tuple[str, int, int]]:
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _decode(image_path: str) -> Optional[np.ndarray]:
+        # cv2.imread 无法处理 Windows 下的中文路径，改为先读字节再解码
+        try:
+            data = np.fromfile(image_path, dtype=np.uint8)
+        except (OSError, ValueError):
+            return None
+        if data.size == 0:
+            return None
+        image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        image.flags.writeable = False
+        return image
+
+    def get(self, image_path: str) -> Optional[np.ndarray]:
+        key = self._make_key(image_path)
+        if key is None:
+            return None
+
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        image = self._decode(image_path)
+        if image is None:
+            return None
+
+        with self._lock:
+            stale_key = self._path_keys.get(key[0])
+            if stale_key is not None and stale_key != key:
+                self._remove(stale_key)
+            if key not in self._entries:
+                self._entries[key] = image
+                self._path_keys[key[0]] = key
+                self._current_bytes += image.nbytes
+                self._evict()
+        return image
+
+    def _remove(self, key: Tuple[str, int, int]):
+        image = self._entries.pop(key, None)
+        if image is not None:
+            self._current_bytes -= image.nbytes
+        if self._path_keys.get(key[0]) == key:
+            del self._path_keys[key[0]]
+
+    def _evict(self):
+        # 至少保留最近使用的一项，避免单张超大模板被反复解码
+        while self._current_bytes > self._max_bytes and len(self._entries) > 1:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, image_path: str):
+        with self._lock:
+            key = self._path_keys.get(os.path.abspath(image_path))
+            if key is not None:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._path_keys.clear()
+            self._current_bytes = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self._max_bytes = max(0, int(max_bytes))
+            self._evict()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._current_bytes,
+                'max_bytes': self._max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -41,6 +41,10 @@ ACTION_ICONS = {
     ActionType.IMAGE_CLICK: FluentIcon.PHOTO,
     ActionType.IMAGE_WAIT_CLICK: FluentIcon.PHOTO,
     ActionType.IMAGE_CHECK: FluentIcon.PHOTO,
+    ActionType.IMAGE_FIND_ALL: FluentIcon.PHOTO,
+    ActionType.PIXEL_CHECK: FluentIcon.PALETTE,
+    ActionType.WAIT_STABLE: FluentIcon.STOP_WATCH,
+    ActionType.WAIT_REGION_CHANGE: FluentIcon.STOP_WATCH,
     ActionType.ACTION_GROUP_REF: FluentIcon.FOLDER,
 }
 
@@ -1079,6 +1083,9 @@ class DashboardPage(QWidget):
         lines.append("")
         lines.append("")
         
+        from core.match_code import helper_lines
+        lines.extend(helper_lines(action for item in self._scripts if item.enabled for action in item.actions or []))
+        
         lines.append("def launch_application(command):")
         lines.append('    """启动应用程序"""')
         lines.append("    import subprocess")
@@ -1255,10 +1262,11 @@ class DashboardPage(QWidget):
             lines.append(f"    pyautogui.click(x={x}, y={y})")
         
         elif action.action_type == ActionType.IMAGE_CLICK:
+            from core.match_code import escape_path, locate_expression
             image_path = action.params.get('image_path', '')
-            confidence = action.params.get('confidence', 0.9)
+            path_expr = f"r'{escape_path(image_path)}'"
             lines.append(f"try:")
-            lines.append(f"    location = pyautogui.locateOnScreen('{image_path}', confidence={confidence})")
+            lines.append(f"    location = {locate_expression(action, path_expr)}")
             lines.append("    if location:")
             lines.append("        center = pyautogui.center(location)")
             lines.append("        pyautogui.click(center)")
@@ -1268,13 +1276,14 @@ class DashboardPage(QWidget):
             lines.append("    print(f'图片点击失败: {e}')")
         
         elif action.action_type == ActionType.IMAGE_WAIT_CLICK:
+            from core.match_code import escape_path, locate_expression
             image_path = action.params.get('image_path', '')
-            confidence = action.params.get('confidence', 0.9)
+            path_expr = f"r'{escape_path(image_path)}'"
             timeout = action.params.get('timeout', 30)
             lines.append(f"location = None")
             lines.append(f"for _ in range({int(timeout * 2)}):")
             lines.append(f"    try:")
-            lines.append(f"        location = pyautogui.locateOnScreen('{image_path}', confidence={confidence})")
+            lines.append(f"        location = {locate_expression(action, path_expr)}")
             lines.append("        if location:")
             lines.append("            break")
             lines.append("    except:")
@@ -1287,10 +1296,11 @@ class DashboardPage(QWidget):
             lines.append(f"    print('等待图片超时: {os.path.basename(image_path)}')")
         
         elif action.action_type == ActionType.IMAGE_CHECK:
+            from core.match_code import escape_path, locate_expression
             image_path = action.params.get('image_path', '')
-            confidence = action.params.get('confidence', 0.9)
+            path_expr = f"r'{escape_path(image_path)}'"
             lines.append(f"try:")
-            lines.append(f"    location = pyautogui.locateOnScreen('{image_path}', confidence={confidence})")
+            lines.append(f"    location = {locate_expression(action, path_expr)}")
             lines.append("    if location:")
             lines.append("        print('图片检查: 找到')")
             lines.append("    else:")
@@ -1298,6 +1308,42 @@ class DashboardPage(QWidget):
             lines.append("except Exception as e:")
             lines.append("    print(f'图片检查失败: {e}')")
         
+        elif action.action_type == ActionType.IMAGE_FIND_ALL:
+            from core.match_code import escape_path, find_all_lines
+            var_name = action.condition_marker[1:] or 'images'
+            lines.append(f"try:")
+            for line in find_all_lines(action, f"r'{escape_path(action.params.get('image_path', ''))}'", var_name):
+                lines.append(f"    {line}")
+            lines.append(f"    print(f'查找全部图片: 找到 {{{var_name}_count}} 个')")
+            lines.append("except Exception as e:")
+            lines.append("    print(f'查找全部图片失败: {e}')")
+        
+        elif action.action_type == ActionType.PIXEL_CHECK:
+            from core.pixel_probe import parse_probes, probe_settings, to_code_lines
+            var_name = action.condition_marker[1:] or 'pixel'
+            try:
+                probes = parse_probes(action.params.get('points', ''))
+                tolerance, radius = probe_settings(action.params)
+            except ValueError:
+                probes, tolerance, radius = [], 20, 0
+            lines.append("try:")
+            for line in to_code_lines(probes, tolerance, radius, action.params.get('match_mode', 'all'), var_name):
+                lines.append(f"    {line}")
+            lines.append(f"    print(f'检查像素颜色: {{{var_name}_count}} 个点匹配')")
+            lines.append("except Exception as e:")
+            lines.append("    print(f'检查像素颜色失败: {e}')")
+        
+        elif action.action_type == ActionType.WAIT_STABLE:
+            from core.change_detector import stable_wait_code_lines
+            lines.extend(stable_wait_code_lines(action.params.get('region'), action.params.get('threshold', 4.0),
+                                                action.params.get('stable_ms', 300), action.params.get('timeout', 10.0)))
+        
+        elif action.action_type == ActionType.WAIT_REGION_CHANGE:
+            from core.change_detector import region_change_code_lines
+            lines.extend(region_change_code_lines(action.params.get('region'), action.params.get('mode', 'change'),
+                                                  action.params.get('threshold', 4.0), action.params.get('stable_ms', 300),
+                                                  action.params.get('timeout', 10.0), action.params.get('sample_rate', 30)))
+        
         if action.delay_after > 0:
             lines.append(f"time.sleep({action.delay_after})")
         
@@ -1424,6 +1470,7 @@ class DashboardPage(QWidget):
         self._player.set_actions(actions)
         self._player.set_speed(self._speed_spin.value())
         self._player.set_repeat_count(item.repeat_count)
+        self._player.set_image_search_padding(self._config.image_search_padding)
         
         self._player.add_callback('on_action_start', lambda a, i: self._action_start_signal.emit(a, i))
         self._player.add_callback('on_action_end', lambda a, i, s: self._action_end_signal.emit(a, i, s))
@@ -641,7 +641,7 @@ class MainWindow(FluentWindow):
             actions = []
             for action_data in actions_data:
                 action = Action.from_dict(action_data)
-                if action.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK]:
+                if action.action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL]:
                     original_path = action.params.get('image_path', '')
                     image_name = os.path.basename(original_path)
                     if image_name in image_path_map:
@@ -825,6 +825,7 @@ class MainWindow(FluentWindow):
         player.set_repeat_count(self._repeat_spin.value())
         player.set_infinite_loop(self._infinite_cb.isChecked())
         player.set_timeout(self._timeout_spin.value())
+        player.set_image_search_padding(self._config.image_search_padding)
         
         window_offset = self._window_selector.get_window_offset()
         player.set_window_offset(window_offset)
@@ -841,7 +842,7 @@ class MainWindow(FluentWindow):
                 action.use_relative_coords = True
             if action.background_mode and window_title:
                 action.window_title = window_title
-            if action.action_type in [ActionType.ACTION_GROUP_REF, ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK] and window_title:
+            if action.action_type in [ActionType.ACTION_GROUP_REF, ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL] and window_title:
                 action.window_title = window_title
         
         self._run_btn.setEnabled(False)
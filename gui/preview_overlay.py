@@ -1,12 +1,16 @@
 from PyQt5.QtWidgets import QWidget, QApplication, QDesktopWidget
-from PyQt5.QtCore import Qt, QTimer, QRect, QPoint
+from PyQt5.QtCore import Qt, QTimer, QRect, QPoint, pyqtSignal
 from PyQt5.QtGui import QPainter, QColor, QPen, QBrush, QFont, QGuiApplication, QScreen
 from typing import Optional, Tuple, List
 import os
+import threading
 
 
 class PreviewOverlay(QWidget):
     _instance = None
+    _image_match_ready = pyqtSignal(int, object)
+    
+    IMAGE_REFRESH_TICKS = 5
     
     @classmethod
     def get_instance(cls, duration: int = 2000):
@@ -47,6 +51,12 @@ class PreviewOverlay(QWidget):
         self._blink_state = True
         self._blink_count = 0
         
+        self._image_generation = 0
+        self._image_result = None
+        self._image_detector = None
+        self._image_worker_busy = False
+        self._image_match_ready.connect(self._on_image_match_ready)
+        
         self._setup_geometry()
     
     def _setup_geometry(self):
@@ -82,9 +92,15 @@ class PreviewOverlay(QWidget):
         self._preview_data = {'x': x, 'y': y, 'clicks': clicks}
         self._start_preview()
     
-    def show_image_match(self, image_path: str, confidence: float = 0.9):
+    def show_image_match(self, image_path: str, confidence: float = 0.9, options=None):
+        from core.change_detector import FrameChangeDetector
         self._preview_type = 'image'
-        self._preview_data = {'image_path': image_path, 'confidence': confidence}
+        self._preview_data = {'image_path': image_path, 'confidence': confidence, 'options': options}
+        self._image_generation += 1
+        self._image_result = None
+        self._image_detector = FrameChangeDetector()
+        self._image_worker_busy = False
+        self._start_image_match(force=True)
         self._start_preview()
     
     def show_text_preview(self, text: str, title: str = "文本预览"):
@@ -118,6 +134,9 @@ class PreviewOverlay(QWidget):
         self._blink_count += 1
         self.update()
         
+        if self._preview_type == 'image' and self._blink_count % self.IMAGE_REFRESH_TICKS == 0:
+            self._start_image_match(force=False)
+        
         if self._blink_count >= self._duration // 200:
             self._timer.stop()
             self.hide()
@@ -276,33 +295,129 @@ class PreviewOverlay(QWidget):
         painter.fillRect(text_rect, QColor(0, 0, 0, 180))
         painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, text)
     
+    def _start_image_match(self, force: bool):
+        if self._image_worker_busy:
+            return
+        self._image_worker_busy = True
+        masks = self._image_overlay_rects(self._image_result)
+        overlay_rect = (self.rect().center().x(), self.rect().center().y())
+        thread = threading.Thread(
+            target=self._image_match_worker,
+            args=(self._image_generation, dict(self._preview_data), self._image_detector, force, masks, overlay_rect),
+            daemon=True
+        )
+        thread.start()
+    
+    def _image_match_worker(self, generation: int, data: dict, detector, force: bool,
+                            masks: List[Tuple[int, int, int, int]], overlay_center: Tuple[int, int]):
+        result = None
+        try:
+            from core.template_cache import TemplateCache
+            from core.frame_grabber import FrameGrabber
+            
+            template_key = TemplateCache._make_key(data.get('image_path', ''))
+            frame = FrameGrabber.get_instance().grab()
+            changed = detector.update(self._mask_rects(frame.image, masks))
+            if force or changed or template_key != data.get('_template_key'):
+                result = self._compute_image_match(data, frame)
+                result['template_key'] = template_key
+                detector.reset()
+                detector.update(self._mask_rects(frame.image, self._image_overlay_rects(result, overlay_center)))
+        except Exception as e:
+            result = {'location': None, 'actual_confidence': None, 'error': str(e)}
+        self._image_match_ready.emit(generation, result)
+    
+    @staticmethod
+    def _mask_rects(image, rects: List[Tuple[int, int, int, int]]):
+        # 预览层自身画出的框会出现在截图里，比较画面变化时先遮掉
+        if not rects:
+            return image
+        image = image.copy()
+        for x, y, w, h in rects:
+            image[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = 0
+        return image
+    
+    @staticmethod
+    def _compute_image_match(data: dict, frame) -> dict:
+        import cv2
+        from core.template_cache import TemplateCache
+        from core.image_matcher import ImageMatcher, MatchOptions
+        
+        image_path = data.get('image_path', '')
+        confidence = data.get('confidence', 0.9)
+        options = data.get('options') or MatchOptions()
+        template = TemplateCache.get_instance().get(image_path)
+        if template is None:
+            raise Exception(f"图片文件无法读取: {os.path.basename(image_path)}")
+        
+        # 预览只读: 不写入历史位置、结果缓存和比例缓存，避免影响正式运行
+        location = ImageMatcher.get_instance().locate_in_frame(frame, template, confidence, image_path, options,
+                                                               record=False)
+        
+        actual_confidence = confidence
+        if location and location.score:
+            actual_confidence = round(location.score, 3)
+        else:
+            screen = frame.image
+            if location:
+                crop = frame.crop((location.left - 5, location.top - 5, location.width + 10, location.height + 10))
+                screen = crop.image if crop is not None else screen
+            try:
+                result = ImageMatcher.get_instance().correlate(options.prepare(screen), options.prepare(template))
+                _, max_val, _, _ = cv2.minMaxLoc(result)
+                actual_confidence = round(max_val, 3)
+            except Exception:
+                pass
+        return {'location': location, 'actual_confidence': actual_confidence, 'error': None}
+    
+    def _on_image_match_ready(self, generation: int, result):
+        self._image_worker_busy = False
+        if generation != self._image_generation or result is None:
+            return
+        self._image_result = result
+        self._preview_data['_template_key'] = result.get('template_key')
+        self.update()
+    
+    @staticmethod
+    def _image_info_rect(location) -> QRect:
+        info_y = location.top - 80
+        if info_y < 10:
+            info_y = location.top + location.height + 10
+        return QRect(location.left, info_y, 180, 75)
+    
+    def _image_overlay_rects(self, result, overlay_center: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int, int, int]]:
+        if not result:
+            return []
+        location = result.get('location')
+        if location:
+            info = self._image_info_rect(location)
+            return [(location.left - 4, location.top - 4, location.width + 8, location.height + 8),
+                    (info.x(), info.y(), info.width(), info.height())]
+        if overlay_center is None:
+            overlay_center = (self.rect().center().x(), self.rect().center().y())
+        return [(overlay_center[0] - 210, overlay_center[1] - 50, 420, 100)]
+    
     def _draw_image_match(self, painter: QPainter):
-        image_path = self._preview_data.get('image_path', '')
         confidence = self._preview_data.get('confidence', 0.9)
+        result = self._image_result
+        
+        if result is None:
+            font = QFont()
+            font.setPointSize(12)
+            painter.setFont(font)
+            painter.setPen(QPen(QColor(255, 255, 255)))
+            screen_center = self.rect().center()
+            text_rect = QRect(screen_center.x() - 120, screen_center.y() - 20, 240, 40)
+            painter.fillRect(text_rect, QColor(0, 0, 0, 200))
+            painter.drawText(text_rect, Qt.AlignCenter, "正在匹配图片...")
+            return
         
         try:
-            import pyautogui
-            import cv2
-            import numpy as np
+            if result.get('error'):
+                raise Exception(result['error'])
             
-            try:
-                location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-            except pyautogui.ImageNotFoundException:
-                location = None
-            
-            actual_confidence = confidence
-            if location:
-                try:
-                    screenshot = pyautogui.screenshot(region=(location.left - 5, location.top - 5, 
-                                                              location.width + 10, location.height + 10))
-                    screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-                    template = cv2.imread(image_path)
-                    if template is not None:
-                        result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-                        _, max_val, _, _ = cv2.minMaxLoc(result)
-                        actual_confidence = round(max_val, 3)
-                except:
-                    pass
+            location = result['location']
+            actual_confidence = result['actual_confidence']
             
             if location:
                 color = QColor(50, 200, 50, 200) if self._blink_state else QColor(100, 230, 100, 150)
@@ -333,14 +448,8 @@ class PreviewOverlay(QWidget):
                 line3 = f"尺寸: {location.width}x{location.height}"
                 line4 = f"置信度: {actual_confidence} (阈值: {confidence})"
                 
-                info_x = location.left
-                info_y = location.top - 80
-                if info_y < 10:
-                    info_y = location.top + location.height + 10
-                
-                info_width = 180
-                info_height = 75
-                info_rect = QRect(info_x, info_y, info_width, info_height)
+                info_rect = self._image_info_rect(location)
+                info_x, info_y = info_rect.x(), info_rect.y()
                 painter.fillRect(info_rect, QColor(50, 200, 50, 230))
                 
                 painter.drawText(info_x + 10, info_y + 18, line1)
@@ -354,17 +463,6 @@ class PreviewOverlay(QWidget):
                 painter.drawLine(center_x - 10, center_y, center_x + 10, center_y)
                 painter.drawLine(center_x, center_y - 10, center_x, center_y + 10)
             else:
-                try:
-                    screenshot = pyautogui.screenshot()
-                    screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-                    template = cv2.imread(image_path)
-                    if template is not None:
-                        result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-                        _, max_val, _, _ = cv2.minMaxLoc(result)
-                        actual_confidence = round(max_val, 3)
-                except:
-                    actual_confidence = confidence
-                
                 font = QFont()
                 font.setPointSize(12)
                 font.setBold(True)
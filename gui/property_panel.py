@@ -7,14 +7,15 @@ from PyQt5.QtCore import Qt, pyqtSignal, QSize, QTimer
 from PyQt5.QtGui import QPixmap, QFont
 from typing import List, Optional, Dict, Any, Set, Tuple
 from core.actions import Action, ActionType, ActionManager, VariableManager
+from core.image_matcher import MatchOptions
 
 from qfluentwidgets import (
     StrongBodyLabel, BodyLabel, PushButton,
     SpinBox, DoubleSpinBox, LineEdit, ComboBox,
-    ScrollArea, MessageBox, CardWidget, CheckBox
+    ScrollArea, MessageBox, CardWidget, CheckBox, InfoBar, InfoBarPosition
 )
 
-from .widgets import CoordinateWidget, KeySequenceDialog, CaptureWidget, DragCoordinateWidget
+from .widgets import CoordinateWidget, KeySequenceDialog, CaptureWidget, DragCoordinateWidget, ScreenPickWidget
 from .preview_overlay import PreviewOverlay
 
 
@@ -51,10 +52,12 @@ class PropertyPanel(CardWidget):
     def _collect_script_variables(self) -> Set[str]:
         variables = set()
         for action in self._all_actions:
-            if action.action_type == ActionType.IMAGE_CHECK:
+            if action.action_type in [ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL, ActionType.PIXEL_CHECK]:
                 marker = action.condition_marker
                 if marker:
                     variables.add(marker[1:])
+                    if action.action_type in [ActionType.IMAGE_FIND_ALL, ActionType.PIXEL_CHECK]:
+                        variables.add(f"{marker[1:]}_count")
         var_manager = VariableManager.get_instance()
         for var_name in var_manager.get_all().keys():
             variables.add(var_name)
@@ -221,12 +224,33 @@ class PropertyPanel(CardWidget):
                 processed_params.add('image_path')
                 continue
             
+            if param_name == 'anchor_image':
+                self._add_anchor_picker(param_name, param_desc, current_value)
+                processed_params.add(param_name)
+                continue
+            
+            if param_name == 'anchor_offset':
+                self._add_param_widget(param_name, param_type, param_desc, current_value)
+                record_btn = PushButton("记录相对锚点偏移")
+                record_btn.setMinimumHeight(36)
+                record_btn.clicked.connect(self._record_anchor_offset)
+                self._content_layout.addWidget(record_btn)
+                processed_params.add(param_name)
+                continue
+            
             if param_name == 'region':
-                self._add_region_picker(param_name, current_value)
+                self._add_region_picker(param_name, current_value,
+                                        "检测区域" if self._current_action.action_type in (ActionType.WAIT_STABLE, ActionType.WAIT_REGION_CHANGE)
+                                        else "截图区域")
                 processed_params.add('region')
                 continue
             
-            self._add_param_widget(param_name, param_type, param_desc, current_value)
+            if param_type == 'points':
+                self._add_probe_picker(param_name, param_desc, current_value, window_offset_for_pick)
+                processed_params.add(param_name)
+                continue
+            
+            self._add_param_widget(param_name, param_type, param_desc, current_value, param_def.get('options'))
             processed_params.add(param_name)
         
         self._content_layout.addSpacing(8)
@@ -320,10 +344,15 @@ class PropertyPanel(CardWidget):
                 self._var_combo.setCurrentIndex(idx)
                 self._var_combo.blockSignals(False)
         
-        if self._current_action and self._current_action.action_type == ActionType.IMAGE_CHECK:
+        if self._current_action and self._current_action.action_type in [ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL, ActionType.PIXEL_CHECK]:
             current_marker = self._current_action.condition_marker
             if current_marker:
-                info_label = BodyLabel(f"💡 此动作将生成条件标记: {current_marker}")
+                info_text = f"💡 此动作将生成条件标记: {current_marker}"
+                if self._current_action.action_type == ActionType.IMAGE_FIND_ALL:
+                    info_text += f"，数量 {current_marker}_count，坐标 {current_marker}_1_x / {current_marker}_1_y ..."
+                elif self._current_action.action_type == ActionType.PIXEL_CHECK:
+                    info_text += f"，匹配数 {current_marker}_count，各点 {current_marker}_1 / {current_marker}_1_color ..."
+                info_label = BodyLabel(info_text)
                 info_label.setStyleSheet("color: #666; font-size: 11px;")
                 self._content_layout.addWidget(info_label)
     
@@ -388,11 +417,21 @@ class PropertyPanel(CardWidget):
                 self._current_action.description = self._current_action._generate_description()
                 self.action_updated.emit(self._current_action)
     
-    def _add_param_widget(self, param_name: str, param_type: str, param_desc: str, current_value: Any):
+    def _add_param_widget(self, param_name: str, param_type: str, param_desc: str, current_value: Any,
+                          options: Optional[List[Tuple[str, Any]]] = None):
         param_label = BodyLabel(f"{param_desc}")
         self._content_layout.addWidget(param_label)
         
-        if param_type == 'int':
+        if options:
+            widget = ComboBox()
+            for text, value in options:
+                widget.addItem(text, value)
+            values = [value for _, value in options]
+            widget.setCurrentIndex(values.index(current_value) if current_value in values else 0)
+            widget.setMinimumHeight(36)
+            widget.currentIndexChanged.connect(lambda i, n=param_name, v=values: self._on_param_changed(n, v[i]))
+        
+        elif param_type == 'int':
             widget = SpinBox()
             widget.setRange(-9999, 9999)
             widget.setValue(current_value)
@@ -461,8 +500,104 @@ class PropertyPanel(CardWidget):
             self._image_path_edit.blockSignals(False)
             self._show_image_preview(current_value)
     
-    def _add_region_picker(self, param_name: str, current_value):
-        region_widget = DragCoordinateWidget(title="截图区域")
+    def _add_anchor_picker(self, param_name: str, param_desc: str, current_value: str):
+        self._content_layout.addWidget(BodyLabel(param_desc))
+        
+        anchor_edit = LineEdit()
+        anchor_edit.setPlaceholderText("对话框标题等固定元素，留空则整屏查找")
+        anchor_edit.setText(str(current_value or ''))
+        anchor_edit.setMinimumHeight(36)
+        anchor_edit.textChanged.connect(lambda v, n=param_name: self._on_param_changed(n, v))
+        self._content_layout.addWidget(anchor_edit)
+        self._param_widgets[param_name] = anchor_edit
+        
+        capture_btn = PushButton("截取锚点")
+        capture_btn.setMinimumHeight(36)
+        capture_btn.clicked.connect(lambda: self._capture_region(param_name))
+        self._content_layout.addWidget(capture_btn)
+    
+    def _record_anchor_offset(self, child: Optional[Tuple[int, int]] = None):
+        """在当前屏幕上定位锚点，把子图片左上角相对锚点的偏移写入 anchor_offset"""
+        if not self._current_action:
+            return
+        from core.image_matcher import ImageMatcher
+        params = self._current_action.params
+        anchor_path = params.get('anchor_image', '')
+        image_path = params.get('image_path', '')
+        if not anchor_path or not os.path.exists(anchor_path):
+            if child is None:
+                InfoBar.warning(title="记录偏移失败", content="请先设置锚点图片", parent=self,
+                                position=InfoBarPosition.TOP)
+            return
+        confidence = params.get('confidence', 0.9)
+        options = MatchOptions.from_params(params)
+        matcher = ImageMatcher.get_instance()
+        try:
+            anchor = self._current_action._load_template(anchor_path)
+            if child is None:
+                if not image_path or not os.path.exists(image_path):
+                    raise Exception("请先设置图片路径")
+                template = self._current_action._load_template(image_path)
+                location = matcher.locate_on_screen(template, confidence, None, None, options)
+                if location is None:
+                    raise Exception("屏幕上未找到子图片")
+                child = (location.left, location.top)
+            offset = matcher.measure_offset(anchor, child, confidence, anchor_path, options)
+            if offset is None:
+                raise Exception("屏幕上未找到锚点图片")
+        except Exception as e:
+            InfoBar.warning(title="记录偏移失败", content=str(e), parent=self, position=InfoBarPosition.TOP)
+            return
+        widget = self._param_widgets.get('anchor_offset')
+        if widget is not None:
+            widget.setText(f"{offset[0]},{offset[1]}")
+        else:
+            self._on_param_changed('anchor_offset', f"{offset[0]},{offset[1]}")
+        InfoBar.success(title="已记录偏移", content=f"相对锚点 ({offset[0]}, {offset[1]})", parent=self,
+                        position=InfoBarPosition.TOP)
+    
+    def _add_probe_picker(self, param_name: str, param_desc: str, current_value: str,
+                          window_offset: Optional[Tuple[int, int]]):
+        points_label = BodyLabel(param_desc)
+        self._content_layout.addWidget(points_label)
+        
+        points_edit = LineEdit()
+        points_edit.setPlaceholderText("例如: 100,200,#00FF00; 120,200,#00FF00")
+        points_edit.setText(str(current_value or ''))
+        points_edit.setMinimumHeight(36)
+        points_edit.textChanged.connect(lambda v, n=param_name: self._on_param_changed(n, v))
+        self._content_layout.addWidget(points_edit)
+        self._param_widgets[param_name] = points_edit
+        
+        pick_btn = PushButton("拾取取色点")
+        pick_btn.setMinimumHeight(36)
+        pick_btn.clicked.connect(lambda checked=False, o=window_offset: self._start_probe_pick(points_edit, o))
+        self._content_layout.addWidget(pick_btn)
+    
+    def _start_probe_pick(self, points_edit, window_offset: Optional[Tuple[int, int]]):
+        self._probe_pick_widget = ScreenPickWidget(window_offset=window_offset)
+        self._probe_pick_widget.position_picked.connect(
+            lambda x, y: QTimer.singleShot(150, lambda: self._on_probe_picked(points_edit, window_offset, x, y)))
+        self._probe_pick_widget.show()
+    
+    def _on_probe_picked(self, points_edit, window_offset: Optional[Tuple[int, int]], x: int, y: int):
+        from core.frame_grabber import FrameGrabber
+        from core.pixel_probe import color_to_hex, sample_colors
+        import numpy as np
+        
+        screen_x, screen_y = (x + window_offset[0], y + window_offset[1]) if window_offset else (x, y)
+        try:
+            frame = FrameGrabber.get_instance().grab((screen_x, screen_y, 1, 1), max_age=0)
+            color = tuple(int(c) for c in sample_colors(frame.image, np.array([0]), np.array([0]))[0])
+        except Exception as e:
+            print(f"取色失败: {e}")
+            return
+        text = points_edit.text().strip().rstrip(';')
+        point = f"{x},{y},{color_to_hex(color)}"
+        points_edit.setText(f"{text}; {point}" if text else point)
+    
+    def _add_region_picker(self, param_name: str, current_value, title: str = "截图区域"):
+        region_widget = DragCoordinateWidget(title=title)
         
         if current_value and isinstance(current_value, (list, tuple)) and len(current_value) == 4:
             region_widget.set_region(current_value[0], current_value[1], current_value[2], current_value[3])
@@ -493,26 +628,30 @@ class PropertyPanel(CardWidget):
     
     def _on_captured(self, rect, param_name: str):
         if rect and rect.width() > 10 and rect.height() > 10:
-            import pyautogui
             import os
             import time
+            import uuid
+            from core.capture import save_image
+            from core.frame_grabber import FrameGrabber
             
             images_dir = os.path.join(os.path.expanduser('~'), '.simpleRPA', 'images')
             os.makedirs(images_dir, exist_ok=True)
             
-            filename = f"capture_{int(time.time())}.png"
+            # 锚点和子图片常在同一秒内截取，文件名不能只用秒级时间
+            filename = f"capture_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}.png"
             filepath = os.path.join(images_dir, filename)
             
-            screenshot = pyautogui.screenshot(region=(
-                rect.x(),
-                rect.y(),
-                rect.width(),
-                rect.height()
-            ))
-            screenshot.save(filepath)
+            frame = FrameGrabber.get_instance().grab(
+                (rect.x(), rect.y(), rect.width(), rect.height()), max_age=0)
+            save_image(frame.image, filepath)
             
+            if param_name != 'image_path':
+                self._param_widgets[param_name].setText(filepath)
+                return
             self._image_path_edit.setText(filepath)
             self._show_image_preview(filepath)
+            if self._current_action and self._current_action.params.get('anchor_image'):
+                self._record_anchor_offset((rect.x(), rect.y()))
     
     def _show_image_preview(self, filepath: str):
         if not self._image_preview_label:
@@ -698,6 +837,25 @@ class PropertyPanel(CardWidget):
             keys = params.get('keys', [])
             self._preview_overlay.show_hotkey_preview(keys)
         
+        elif action_type == ActionType.WAIT_STABLE:
+            region = params.get('region')
+            text = f"画面连续 {params.get('stable_ms', 300)} 毫秒无变化后继续 (最多 {params.get('timeout', 10.0)} 秒)"
+            if region and len(region) == 4 and region[2] > 0 and region[3] > 0:
+                self._preview_overlay.show_region(region[0], region[1], region[2], region[3], text)
+            else:
+                self._preview_overlay.show_text_preview(text, "等待画面稳定预览")
+        
+        elif action_type == ActionType.WAIT_REGION_CHANGE:
+            region = params.get('region')
+            if params.get('mode') == 'stable':
+                text = f"区域变化后连续 {params.get('stable_ms', 300)} 毫秒无变化时继续 (最多 {params.get('timeout', 10.0)} 秒)"
+            else:
+                text = f"区域一有变化立即继续 (最多 {params.get('timeout', 10.0)} 秒)"
+            if region and len(region) == 4 and region[2] > 0 and region[3] > 0:
+                self._preview_overlay.show_region(region[0], region[1], region[2], region[3], text)
+            else:
+                self._preview_overlay.show_text_preview(text, "等待区域变化预览")
+        
         elif action_type == ActionType.WAIT:
             seconds = params.get('seconds', 1.0)
             self._preview_overlay.show_text_preview(f"等待 {seconds} 秒", "等待预览")
@@ -710,10 +868,26 @@ class PropertyPanel(CardWidget):
             else:
                 self._preview_overlay.show_text_preview(f"全屏截图: {filename}", "截图预览")
         
-        elif action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK]:
+        elif action_type in [ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK, ActionType.IMAGE_FIND_ALL]:
             image_path = params.get('image_path', '')
             confidence = params.get('confidence', 0.9)
             if image_path and os.path.exists(image_path):
-                self._preview_overlay.show_image_match(image_path, confidence)
+                self._preview_overlay.show_image_match(image_path, confidence, MatchOptions.from_params(params))
             else:
                 self._preview_overlay.show_text_preview("请先选择图片文件", "图片识别预览")
+        
+        elif action_type == ActionType.PIXEL_CHECK:
+            from core.pixel_probe import parse_probes, probe_settings, check_pixels, color_to_hex
+            try:
+                probes = parse_probes(params.get('points', ''))
+                tolerance, radius = probe_settings(params)
+                offset = self._window_offset if action.use_relative_coords else None
+                result = check_pixels(probes, tolerance, radius, offset, max_age=0)
+                lines = [f"({p.x}, {p.y}) {color_to_hex(c)} {'✓' if m else '✗'}"
+                         for p, c, m in zip(probes, result.colors, result.matched)]
+                text = f"{result.count}/{len(probes)} 个点匹配: " + "  ".join(lines) if probes else "请先设置取色点"
+            except ValueError as e:
+                text = f"取色参数错误: {e}"
+            except Exception as e:
+                text = f"取色失败: {e}"
+            self._preview_overlay.show_text_preview(text, "像素颜色预览")
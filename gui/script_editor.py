@@ -8,6 +8,7 @@ from PyQt5 import sip
 from typing import List, Optional, Dict
 from core.actions import Action as ScriptAction
 from core.action_group import ActionGroup, LocalActionGroupManager, GlobalActionGroupManager
+from core.image_matcher import MatchOptions
 from gui.preview_overlay import PreviewOverlay
 import copy
 
@@ -864,7 +865,7 @@ class ScriptTabContent(QWidget):
         elif action.action_type == ActionType.IMAGE_CLICK:
             image_path = action.params.get('image_path', '')
             confidence = action.params.get('confidence', 0.9)
-            self._preview_overlay.show_image_match(image_path, confidence)
+            self._preview_overlay.show_image_match(image_path, confidence, MatchOptions.from_params(action.params))
         
         elif action.action_type == ActionType.ACTION_GROUP_REF:
             group_name = action.params.get('group_name', '')
@@ -1407,6 +1408,10 @@ class ActionGroupEditDialog(MessageBoxBase):
             (ActionType.IMAGE_CLICK, "图片点击"),
             (ActionType.IMAGE_WAIT_CLICK, "等待图片点击"),
             (ActionType.IMAGE_CHECK, "图片检查"),
+            (ActionType.IMAGE_FIND_ALL, "查找全部图片"),
+            (ActionType.PIXEL_CHECK, "检查像素颜色"),
+            (ActionType.WAIT_STABLE, "等待画面稳定"),
+            (ActionType.WAIT_REGION_CHANGE, "等待区域变化"),
         ]
         
         menu = RoundMenu("选择动作类型", self)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import multiprocessing
 import sys
 import traceback
 
@@ -27,4 +28,6 @@ qInstallMessageHandler(message_handler)
 from gui.app import run_app
 
 if __name__ == '__main__':
+    # 打包后 match_backend='process' 的子进程不能重新启动界面
+    multiprocessing.freeze_support()
     run_app()
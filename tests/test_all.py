@@ -394,6 +394,1764 @@ class TestRecorder(unittest.TestCase):
         self.assertEqual(config.image_capture_size, 50)
 
 
+class TestTemplateCache(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        import cv2
+        from core.template_cache import TemplateCache
+        
+        self.np = np
+        self.cv2 = cv2
+        self.cache = TemplateCache()
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.temp_dir, "button.png")
+        self._write_image(self.image_path, 40, 30, 120)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _write_image(self, path, width, height, value):
+        image = self.np.full((height, width, 3), value, dtype=self.np.uint8)
+        self.cv2.imwrite(path, image)
+    
+    def test_hit_after_first_load(self):
+        first = self.cache.get(self.image_path)
+        second = self.cache.get(self.image_path)
+        self.assertIsNotNone(first)
+        self.assertIs(first, second)
+        self.assertEqual(first.shape, (30, 40, 3))
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 1)
+    
+    def test_cached_array_is_read_only(self):
+        image = self.cache.get(self.image_path)
+        with self.assertRaises(ValueError):
+            image[0, 0, 0] = 0
+    
+    def test_reload_when_file_changes(self):
+        first = self.cache.get(self.image_path)
+        self._write_image(self.image_path, 50, 30, 200)
+        stat = os.stat(self.image_path)
+        os.utime(self.image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        second = self.cache.get(self.image_path)
+        self.assertEqual(second.shape, (30, 50, 3))
+        self.assertIsNot(first, second)
+        self.assertEqual(self.cache.get_stats()['entries'], 1)
+    
+    def test_lru_eviction_respects_memory_cap(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir, f"icon_{i}.png")
+            self._write_image(path, 40, 30, 10 * i)
+            paths.append(path)
+        
+        self.cache.set_max_bytes(40 * 30 * 3 * 2)
+        for path in paths:
+            self.cache.get(path)
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        
+        self.cache.get(paths[0])
+        self.assertEqual(self.cache.misses, 4)
+    
+    def test_missing_file_returns_none(self):
+        self.assertIsNone(self.cache.get(os.path.join(self.temp_dir, "missing.png")))
+
+
+def make_synthetic_screen(width, height, seed=0):
+    import numpy as np
+    import cv2
+    
+    rng = np.random.RandomState(seed)
+    screen = np.full((height, width, 3), 235, dtype=np.uint8)
+    screen[:, :, 0] = np.linspace(200, 250, width, dtype=np.uint8)[None, :]
+    for _ in range(40):
+        x, y = rng.randint(0, width - 120), rng.randint(0, height - 60)
+        color = tuple(int(c) for c in rng.randint(0, 255, 3))
+        cv2.rectangle(screen, (x, y), (x + rng.randint(30, 120), y + rng.randint(15, 60)), color, -1)
+    return screen
+
+
+def make_synthetic_template(width, height, seed=1):
+    import numpy as np
+    import cv2
+    
+    rng = np.random.RandomState(seed)
+    template = rng.randint(0, 255, (height, width, 3)).astype(np.uint8)
+    template = cv2.GaussianBlur(template, (3, 3), 0)
+    cv2.putText(template, "OK", (4, height - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return template
+
+
+class TestImageMatcher(unittest.TestCase):
+    def setUp(self):
+        from core.image_matcher import ImageMatcher
+        self.matcher = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID)
+    
+    def _embed(self, screen, template, x, y):
+        screen = screen.copy()
+        screen[y:y + template.shape[0], x:x + template.shape[1]] = template
+        return screen
+    
+    def test_finds_embedded_template(self):
+        template = make_synthetic_template(60, 40)
+        for x, y in [(0, 0), (333, 217), (1219, 679), (517, 3)]:
+            screen = self._embed(make_synthetic_screen(1280, 720), template, x, y)
+            location = self.matcher.match(screen, template, 0.9)
+            self.assertIsNotNone(location)
+            self.assertEqual((location.left, location.top), (x, y))
+            self.assertEqual((location.width, location.height), (60, 40))
+            self.assertGreater(location.score, 0.99)
+    
+    def test_same_location_as_pyscreeze(self):
+        try:
+            import pyscreeze
+        except Exception:
+            self.skipTest("pyscreeze not available")
+        
+        for seed, (w, h), (x, y) in [(2, (30, 30), (101, 57)), (3, (64, 48), (700, 411)), (4, (120, 90), (1001, 5))]:
+            template = make_synthetic_template(w, h, seed=seed)
+            screen = self._embed(make_synthetic_screen(1280, 720, seed=seed), template, x, y)
+            expected = pyscreeze.locate(template, screen, confidence=0.9)
+            location = self.matcher.match(screen, template, 0.9)
+            self.assertEqual(tuple(location[:4]), tuple(expected))
+    
+    def test_no_match_below_confidence(self):
+        template = make_synthetic_template(60, 40)
+        screen = make_synthetic_screen(800, 600)
+        self.assertIsNone(self.matcher.match(screen, template, 0.9))
+    
+    def test_template_larger_than_screen(self):
+        template = make_synthetic_template(60, 40)
+        screen = make_synthetic_screen(800, 600)[:30, :50]
+        self.assertIsNone(self.matcher.match(screen, template, 0.5))
+    
+    def test_small_template_uses_full_resolution(self):
+        template = make_synthetic_template(12, 12)
+        screen = self._embed(make_synthetic_screen(640, 480), template, 77, 301)
+        self.assertEqual(self.matcher._pyramid_levels(screen, template), 0)
+        location = self.matcher.match(screen, template, 0.9)
+        self.assertEqual((location.left, location.top), (77, 301))
+    
+    def test_grayscale_half_scale_options(self):
+        from core.image_matcher import MatchOptions
+        template = make_synthetic_template(80, 60)
+        screen = self._embed(make_synthetic_screen(1280, 720), template, 640, 358)
+        options = MatchOptions.from_params({'color_mode': 'grayscale', 'match_scale': 0.5})
+        self.assertEqual(options, MatchOptions(True, 0.5))
+        self.assertEqual(options.prepare(screen).shape, (360, 640))
+        location = self.matcher.match(screen, template, 0.8, options)
+        self.assertEqual((location.left, location.top, location.width, location.height), (640, 358, 80, 60))
+    
+    def test_match_options_from_params(self):
+        from core.image_matcher import MatchOptions
+        self.assertTrue(MatchOptions.from_params({}).is_default)
+        self.assertEqual(MatchOptions.from_params({'match_scale': 5}).scale, 1.0)
+        self.assertEqual(MatchOptions.from_params({'match_scale': 0.01}).scale, MatchOptions.MIN_SCALE)
+        self.assertEqual(MatchOptions.from_params({'match_scale': 'abc'}).scale, 1.0)
+
+
+class TestImageCheckBatch(unittest.TestCase):
+    def setUp(self):
+        import cv2
+        from core.actions import Action, ActionType, ImageCheckBatch, VariableManager
+        from core.image_matcher import ImageMatcher
+        
+        self.Action = Action
+        self.ActionType = ActionType
+        self.ImageCheckBatch = ImageCheckBatch
+        self.ImageMatcher = ImageMatcher
+        ImageMatcher.get_instance().set_engine(ImageMatcher.ENGINE_PYRAMID)
+        self.var_manager = VariableManager.get_instance()
+        self.var_manager.clear()
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.screen = make_synthetic_screen(800, 600, seed=7)
+        self.positions = [(40, 50), (400, 300), (610, 20)]
+        self.paths = []
+        for i, (x, y) in enumerate(self.positions):
+            template = make_synthetic_template(50, 30, seed=20 + i)
+            self.screen[y:y + 30, x:x + 50] = template
+            path = os.path.join(self.temp_dir, f"marker{i}.png")
+            cv2.imwrite(path, template)
+            self.paths.append(path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.var_manager.clear()
+    
+    def _frame(self, screen):
+        from core.frame_grabber import Frame
+        return Frame(screen, 0, 0, time.monotonic(), full_screen=True)
+    
+    def _check_actions(self):
+        return [self.Action(action_type=self.ActionType.IMAGE_CHECK, params={'image_path': path, 'confidence': 0.9})
+                for path in self.paths]
+    
+    def test_single_capture_for_all_checks(self):
+        actions = self._check_actions()
+        batch = self.ImageCheckBatch(actions)
+        
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self._frame(self.screen)) as capture:
+            for action in actions:
+                action._image_check_batch = batch
+                self.assertTrue(action.execute())
+                del action._image_check_batch
+        
+        self.assertEqual(capture.call_count, 1)
+        for i, (x, y) in enumerate(self.positions):
+            self.assertTrue(self.var_manager.get(f"marker{i}"))
+            self.assertEqual(self.var_manager.get(f"marker{i}_x"), x)
+            self.assertEqual(self.var_manager.get(f"marker{i}_y"), y)
+            self.assertEqual(self.var_manager.get(f"marker{i}_width"), 50)
+            self.assertEqual(self.var_manager.get(f"marker{i}_height"), 30)
+    
+    def test_retries_only_missing_templates(self):
+        actions = self._check_actions()
+        screen = self.screen.copy()
+        screen[300:330, 400:450] = 0
+        batch = self.ImageCheckBatch(actions)
+        
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self._frame(screen)) as capture, \
+                patch('core.actions.time.sleep'):
+            for action in actions:
+                action._image_check_batch = batch
+                action.execute()
+                del action._image_check_batch
+        
+        self.assertEqual(capture.call_count, 3)
+        self.assertTrue(self.var_manager.get("marker0"))
+        self.assertFalse(self.var_manager.get("marker1"))
+        self.assertTrue(self.var_manager.get("marker2"))
+    
+    def test_player_groups_adjacent_checks(self):
+        from core.player import Player
+        
+        actions = self._check_actions()
+        actions.insert(2, self.Action(action_type=self.ActionType.WAIT, params={'seconds': 0}))
+        actions.append(self.Action(action_type=self.ActionType.IMAGE_CHECK,
+                                   params={'image_path': self.paths[0]}, delay_before=0.5))
+        
+        player = Player()
+        player.set_actions(actions)
+        
+        batch = player._get_image_check_batch(0, None)
+        self.assertEqual(len(batch), 2)
+        self.assertIs(player._get_image_check_batch(1, None), batch)
+        self.assertIsNone(player._get_image_check_batch(2, None))
+        self.assertIsNone(player._get_image_check_batch(3, None))
+        self.assertIsNone(player._get_image_check_batch(4, None))
+
+
+class TestFrameGrabber(unittest.TestCase):
+    def setUp(self):
+        from core.frame_grabber import FrameGrabber
+        self.screen = make_synthetic_screen(640, 480, seed=3)
+        self.grabber = FrameGrabber(tick_interval=60)
+        self.grabber._capture = MagicMock(side_effect=self._capture)
+    
+    def _capture(self, region):
+        if region is None:
+            return self.screen.copy()
+        x, y, w, h = region
+        return self.screen[y:y + h, x:x + w].copy()
+    
+    def test_reuse_within_tick(self):
+        first = self.grabber.grab()
+        second = self.grabber.grab()
+        self.assertIs(first, second)
+        self.assertEqual(self.grabber.captures, 1)
+        self.assertEqual(self.grabber.reuses, 1)
+    
+    def test_region_served_from_full_frame(self):
+        self.grabber.grab()
+        frame = self.grabber.grab((100, 50, 40, 30))
+        self.assertEqual(self.grabber.captures, 1)
+        self.assertEqual((frame.left, frame.top, frame.width, frame.height), (100, 50, 40, 30))
+        self.assertTrue((frame.image == self.screen[50:80, 100:140]).all())
+    
+    def test_max_age_zero_forces_capture(self):
+        self.grabber.grab()
+        self.grabber.grab(max_age=0)
+        self.assertEqual(self.grabber.captures, 2)
+    
+    def test_region_frame_does_not_serve_full_screen(self):
+        self.grabber.grab((0, 0, 100, 100))
+        frame = self.grabber.grab()
+        self.assertEqual(self.grabber.captures, 2)
+        self.assertTrue(frame.full_screen)
+    
+    def test_frame_is_read_only(self):
+        frame = self.grabber.grab()
+        with self.assertRaises(ValueError):
+            frame.image[0, 0, 0] = 1
+    
+    def test_invalidate(self):
+        self.grabber.grab()
+        self.grabber.invalidate()
+        self.grabber.grab()
+        self.assertEqual(self.grabber.captures, 2)
+
+
+class TestMultiMonitor(unittest.TestCase):
+    def setUp(self):
+        from core.capture import MemoryCapture
+        from core.frame_grabber import FrameGrabber
+        self.screen = make_synthetic_screen(1280, 480, seed=5)
+        self.monitors = [(0, 0, 640, 480), (640, 0, 640, 480)]
+        self.backend = MemoryCapture([self.screen], monitors=self.monitors)
+        self.grabber = FrameGrabber(tick_interval=60, backend=self.backend)
+    
+    def test_monitor_topology(self):
+        self.assertEqual(self.grabber.monitors(), self.monitors)
+        self.assertEqual(self.grabber.monitors_for((600, 100, 100, 50)), [(600, 100, 40, 50), (640, 100, 60, 50)])
+        self.assertEqual(self.grabber.clip_region((1200, -20, 200, 100)), (1200, 0, 80, 80))
+        self.assertEqual(self.grabber.clip_region((5000, 0, 10, 10)), (5000, 0, 10, 10))
+        self.assertEqual(self.grabber.grab().region, (0, 0, 640, 480))
+    
+    def test_grab_monitors_captures_each_display(self):
+        frames = self.grabber.grab_monitors()
+        self.assertEqual([f.region for f in frames], self.monitors)
+        self.assertTrue((frames[1].image == self.screen[:, 640:]).all())
+        self.assertEqual(self.grabber.grab_monitors((700, 10, 100, 100))[0].region, (700, 10, 100, 100))
+        self.assertEqual(self.grabber.captures, 2)
+        self.assertEqual(self.grabber.get_stats()['monitor_captures'], {0: 1, 1: 1})
+    
+    def test_caches_are_per_monitor(self):
+        primary = self.grabber.grab()
+        for i in range(self.grabber.MAX_CACHED_FRAMES + 2):
+            self.grabber.grab((700 + i, 0, 50, 50))
+        self.assertIs(self.grabber.grab(), primary)
+        
+        self.grabber.grab_monitors()
+        captures = self.grabber.captures
+        self.grabber.invalidate((900, 100, 10, 10))
+        self.assertIs(self.grabber.grab(), primary)
+        self.grabber.grab((700, 0, 50, 50))
+        self.assertEqual(self.grabber.captures, captures + 1)
+        
+        self.grabber.grab((600, 0, 100, 50))
+        self.grabber.invalidate((0, 0, 10, 10))
+        self.grabber.grab((600, 0, 100, 50))
+        self.assertEqual(self.grabber.captures, captures + 3)
+    
+    def test_match_on_secondary_monitor(self):
+        from core.frame_grabber import FrameGrabber
+        from core.image_matcher import ImageMatcher
+        template = make_synthetic_template(40, 30, seed=6)
+        screen = self.screen.copy()
+        screen[200:230, 1000:1040] = template
+        self.backend.push(screen)
+        matcher = ImageMatcher(use_hints=False)
+        with patch.object(FrameGrabber, 'get_instance', return_value=self.grabber):
+            location = matcher.locate_on_screen(template, 0.9)
+            self.assertEqual((location.left, location.top), (1000, 200))
+            self.assertEqual([(m.left, m.top) for m in matcher.locate_all_on_screen(template, 0.9)], [(1000, 200)])
+            location = matcher.locate_on_screen(template, 0.9, (900, 150, 400, 400))
+            self.assertEqual((location.left, location.top), (1000, 200))
+        self.assertEqual(self.grabber.get_stats()['monitor_captures'], {0: 1, 1: 1})
+        self.assertGreater(self.grabber.reuses, 0)
+
+    
+    def test_wait_click_on_secondary_monitor(self):
+        import cv2
+        from core.actions import Action, ActionType
+        from core.frame_grabber import FrameGrabber
+        from core.image_matcher import ImageMatcher
+        template = make_synthetic_template(40, 30, seed=6)
+        screen = self.screen.copy()
+        screen[200:230, 1000:1040] = template
+        self.backend.push(screen)
+        self.grabber.tick_interval = 0
+        temp_dir = tempfile.mkdtemp()
+        try:
+            image_path = os.path.join(temp_dir, "ok.png")
+            cv2.imwrite(image_path, template)
+            action = Action(ActionType.IMAGE_WAIT_CLICK, {'image_path': image_path, 'confidence': 0.9, 'timeout': 5})
+            with patch.object(FrameGrabber, 'get_instance', return_value=self.grabber), \
+                    patch.object(ImageMatcher, 'get_instance', return_value=ImageMatcher(use_hints=False)), \
+                    patch('core.actions.time.sleep'), \
+                    patch('core.actions.pyautogui.click') as click:
+                self.assertTrue(action.execute())
+            click.assert_called_once_with(1020, 215)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def test_wait_stable_without_region_watches_primary(self):
+        from core.actions import Action, ActionType
+        from core.frame_grabber import FrameGrabber
+        self.grabber.tick_interval = 0
+        action = Action(ActionType.WAIT_STABLE, {'stable_ms': 50, 'timeout': 5})
+        with patch.object(FrameGrabber, 'get_instance', return_value=self.grabber), \
+                patch.object(self.grabber, 'grab', wraps=self.grabber.grab) as grab:
+            self.assertTrue(action.execute())
+        self.assertTrue(all(call[0][0] is None for call in grab.call_args_list))
+        self.assertEqual(self.grabber.get_stats()['monitor_captures'], {0: grab.call_count})
+
+class TestCaptureBackend(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        from core.capture import MemoryCapture
+        self.np = np
+        self.MemoryCapture = MemoryCapture
+        self.screens = [make_synthetic_screen(320, 240) for _ in range(2)]
+        self.screens[1][:] = 255 - self.screens[1]
+    
+    def test_memory_capture_sequence(self):
+        np = self.np
+        backend = self.MemoryCapture(self.screens)
+        self.assertEqual(backend.screen_size(), (320, 240))
+        self.assertTrue(np.array_equal(backend.capture(), self.screens[0]))
+        self.assertTrue(np.array_equal(backend.capture(), self.screens[1]))
+        self.assertTrue(np.array_equal(backend.capture(), self.screens[1]))
+        
+        looped = self.MemoryCapture(self.screens, loop=True)
+        for expected in self.screens + self.screens:
+            self.assertTrue(np.array_equal(looped.capture(), expected))
+        
+        with self.assertRaises(RuntimeError):
+            self.MemoryCapture().capture()
+    
+    def test_memory_capture_region_padding(self):
+        np = self.np
+        backend = self.MemoryCapture(self.screens[:1])
+        crop = backend.capture((300, 10, 40, 20))
+        self.assertEqual(crop.shape, (20, 40, 3))
+        self.assertTrue(np.array_equal(crop[:, :20], self.screens[0][10:30, 300:320]))
+        self.assertFalse(crop[:, 20:].any())
+    
+    def test_headless_match_and_screenshot(self):
+        import cv2
+        np = self.np
+        from core.actions import Action, ActionType
+        from core.capture import create_capture_backend
+        from core.frame_grabber import FrameGrabber
+        from core.image_matcher import ImageMatcher
+        
+        screen = self.screens[0].copy()
+        template = make_synthetic_template(40, 30, seed=3)
+        screen[60:90, 150:190] = template
+        grabber = FrameGrabber(tick_interval=0, backend=self.MemoryCapture([screen]))
+        self.assertEqual(grabber.get_stats()['backend'], 'memory')
+        
+        with patch.object(FrameGrabber, 'get_instance', return_value=grabber):
+            location = ImageMatcher(use_hints=False).locate_on_screen(template, 0.9)
+            self.assertEqual((location.left, location.top), (150, 60))
+            
+            with tempfile.TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, '截图.png')
+                action = Action(ActionType.SCREENSHOT, {'filename': filename, 'region': [150, 60, 40, 30]})
+                self.assertTrue(action.execute())
+                saved = cv2.imdecode(np.fromfile(filename, dtype=np.uint8), cv2.IMREAD_COLOR)
+                self.assertTrue(np.array_equal(saved, template))
+        
+        self.assertEqual(create_capture_backend('memory').name, 'memory')
+        if sys.platform != 'win32':
+            self.assertEqual(create_capture_backend('auto').name, 'pyautogui')
+
+
+class TestPixelProbe(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        from core.capture import MemoryCapture
+        from core.frame_grabber import FrameGrabber
+        self.np = np
+        self.screen = np.zeros((200, 300, 3), dtype=np.uint8)
+        self.screen[40:50, 100:110] = (0, 200, 0)
+        self.screen[120:130, 250:260] = (0, 0, 220)
+        self.screen[45, 105] = (255, 255, 255)
+        self.grabber = FrameGrabber(tick_interval=0, backend=MemoryCapture([self.screen]))
+        self.patcher = patch.object(FrameGrabber, 'get_instance', return_value=self.grabber)
+        self.patcher.start()
+        from core.actions import VariableManager
+        VariableManager.get_instance().clear()
+    
+    def tearDown(self):
+        self.patcher.stop()
+    
+    def test_parse_probes(self):
+        from core.pixel_probe import parse_probes, format_probes, PixelProbe
+        probes = parse_probes("100,40,#00C800; 250,120,220,0,0")
+        self.assertEqual(probes, [PixelProbe(100, 40, (0, 200, 0)), PixelProbe(250, 120, (220, 0, 0))])
+        self.assertEqual(parse_probes(format_probes(probes)), probes)
+        self.assertEqual(parse_probes([{'x': 1, 'y': 2, 'color': '#010203'}]), [PixelProbe(1, 2, (1, 2, 3))])
+        with self.assertRaises(ValueError):
+            parse_probes("1,2,#GGGGGG")
+    
+    def test_single_region_capture(self):
+        from core.pixel_probe import parse_probes, check_pixels
+        probes = parse_probes("100,40,#00C800; 250,120,#DC0000; 10,10,#FFFFFF")
+        result = check_pixels(probes, tolerance=10)
+        self.assertEqual(result.matched, [True, True, False])
+        self.assertEqual(result.colors[2], (0, 0, 0))
+        self.assertFalse(result.passed('all'))
+        self.assertTrue(result.passed('any'))
+        self.assertEqual(self.grabber.captures, 1)
+    
+    def test_radius_averages_neighbourhood(self):
+        from core.pixel_probe import parse_probes, check_pixels
+        probes = parse_probes("105,45,#00C800")
+        self.assertFalse(check_pixels(probes, tolerance=10).matched[0])
+        self.assertTrue(check_pixels(probes, tolerance=30, radius=2).matched[0])
+    
+    def test_probe_settings_are_clamped(self):
+        from core.actions import Action, ActionType
+        from core.pixel_probe import probe_settings
+        self.assertEqual(probe_settings({}), (20, 0))
+        self.assertEqual(probe_settings({'tolerance': 300, 'radius': -2}), (255, 0))
+        self.assertEqual(probe_settings({'tolerance': '-5', 'radius': '3'}), (0, 3))
+        with self.assertRaises(ValueError):
+            probe_settings({'tolerance': 'abc'})
+        
+        action = Action(ActionType.PIXEL_CHECK, {'variable': 'status', 'points': "100,40,#00C800",
+                                                 'tolerance': 10, 'radius': -3})
+        self.assertTrue(action.execute())
+        self.assertIn("pixel_screen.getpixel((0, 0))", action.to_code())
+        action.params['radius'] = 'x'
+        self.assertFalse(action.validate()[0])
+    
+    def test_negative_virtual_desktop_coordinates(self):
+        from core.pixel_probe import parse_probes, probe_region, evaluate_probes
+        probes = parse_probes("-1820,40,#00C800; -1670,120,#DC0000")
+        self.assertEqual(probe_region(probes), (-1820, 40, 151, 81))
+        self.assertEqual(probe_region(probes, radius=2), (-1822, 38, 155, 85))
+        # 副屏截图的左上角在 (-1920, 0)
+        result = evaluate_probes(self.screen, (-1920, 0), probes, tolerance=10)
+        self.assertEqual(result.matched, [True, True])
+    
+    def test_action_sets_condition_variables(self):
+        from core.actions import Action, ActionType, VariableManager
+        action = Action(ActionType.PIXEL_CHECK, {'variable': 'status', 'points': "100,40,#00C800; 250,120,#00FF00",
+                                                 'tolerance': 10, 'match_mode': 'any'})
+        self.assertEqual(action.condition_marker, '$status')
+        self.assertEqual(action.validate(), (True, ""))
+        self.assertTrue(action.execute())
+        
+        var_manager = VariableManager.get_instance()
+        self.assertTrue(var_manager.get('status'))
+        self.assertEqual(var_manager.get('status_count'), 1)
+        self.assertFalse(var_manager.get('status_2'))
+        self.assertEqual(var_manager.get('status_2_color'), '#DC0000')
+        self.assertTrue(Action(ActionType.WAIT, {'seconds': 0}, condition='$status').check_condition())
+        
+        code = action.to_code()
+        self.assertIn("pyautogui.screenshot(region=(100, 40, 151, 81))", code)
+        self.assertIn("status = any([status_1, status_2])", code)
+        compile("if True:\n" + code, '<pixel>', 'exec')
+        self.assertFalse(Action(ActionType.PIXEL_CHECK, {'variable': 'x', 'points': ''}).validate()[0])
+
+
+class TestChangeDetector(unittest.TestCase):
+    def setUp(self):
+        from core.change_detector import FrameChangeDetector, AdaptiveInterval
+        self.FrameChangeDetector = FrameChangeDetector
+        self.AdaptiveInterval = AdaptiveInterval
+        self.screen = make_synthetic_screen(1920, 1080, seed=5)
+    
+    def test_static_screen_is_unchanged(self):
+        detector = self.FrameChangeDetector()
+        self.assertTrue(detector.update(self.screen))
+        self.assertFalse(detector.update(self.screen.copy()))
+    
+    def test_small_button_is_detected(self):
+        detector = self.FrameChangeDetector()
+        detector.update(self.screen)
+        changed = self.screen.copy()
+        changed[500:524, 900:924] = make_synthetic_template(24, 24)
+        self.assertTrue(detector.update(changed))
+    
+    def test_adaptive_interval(self):
+        interval = self.AdaptiveInterval(min_interval=0.1, max_interval=0.5, growth=2)
+        self.assertAlmostEqual(interval.on_static(), 0.2)
+        self.assertAlmostEqual(interval.on_static(), 0.4)
+        self.assertAlmostEqual(interval.on_static(), 0.5)
+        self.assertAlmostEqual(interval.on_change(), 0.1)
+    
+    def test_wait_click_skips_match_on_static_screen(self):
+        import cv2
+        from core.actions import Action, ActionType
+        from core.image_matcher import ImageMatcher
+        from core.frame_grabber import Frame
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            template = make_synthetic_template(40, 30)
+            image_path = os.path.join(temp_dir, "ok.png")
+            cv2.imwrite(image_path, template)
+            
+            final_screen = self.screen.copy()
+            final_screen[200:230, 300:340] = template
+            screens = [self.screen] * 5 + [final_screen]
+            frames = [Frame(screen, 0, 0, time.monotonic(), full_screen=True) for screen in screens]
+            
+            action = Action(action_type=ActionType.IMAGE_WAIT_CLICK,
+                            params={'image_path': image_path, 'confidence': 0.9, 'timeout': 10})
+            matcher = ImageMatcher.get_instance()
+            matcher.set_engine(ImageMatcher.ENGINE_PYRAMID)
+            with patch.object(ImageMatcher, 'grab_frame', side_effect=frames), \
+                    patch.object(ImageMatcher, 'locate_in_frame', wraps=matcher.locate_in_frame) as locate, \
+                    patch('core.actions.time.sleep'), \
+                    patch('core.actions.pyautogui.click') as click:
+                self.assertTrue(action.execute())
+            
+            self.assertEqual(locate.call_count, 2)
+            click.assert_called_once_with(320, 215)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _fake_clock(self):
+        clock = [0.0]
+        
+        def sleep(seconds):
+            clock[0] += seconds
+        return clock, patch('core.change_detector.time.monotonic', side_effect=lambda: clock[0]), \
+            patch('core.change_detector.time.sleep', side_effect=sleep)
+    
+    def test_wait_until_stable(self):
+        from core.change_detector import wait_until_stable
+        changed = self.screen.copy()
+        changed[500:524, 900:924] = make_synthetic_template(24, 24)
+        screens = iter([self.screen, changed] * 3 + [self.screen] * 100)
+        clock, monotonic, sleep = self._fake_clock()
+        with monotonic, sleep:
+            self.assertTrue(wait_until_stable(lambda: next(screens), stable_time=0.25, timeout=5, interval=0.0625))
+        self.assertEqual(clock[0], 0.625)
+        
+        flicker = iter([self.screen, changed] * 200)
+        clock, monotonic, sleep = self._fake_clock()
+        with monotonic, sleep:
+            self.assertFalse(wait_until_stable(lambda: next(flicker), stable_time=0.25, timeout=1, interval=0.0625))
+        self.assertEqual(clock[0], 1.0)
+        
+        grabs = []
+        clock, monotonic, sleep = self._fake_clock()
+        with monotonic, sleep:
+            self.assertFalse(wait_until_stable(lambda: grabs.append(1) or self.screen, should_stop=lambda: len(grabs) >= 3))
+        self.assertEqual(len(grabs), 3)
+    
+    def test_wait_stable_action(self):
+        from core.actions import Action, ActionType
+        from core.capture import MemoryCapture
+        from core.frame_grabber import FrameGrabber
+        changed = self.screen.copy()
+        changed[10:40, 10:40] = 0
+        grabber = FrameGrabber(tick_interval=0, backend=MemoryCapture([changed, self.screen]))
+        action = Action(ActionType.WAIT_STABLE, {'region': (0, 0, 200, 100), 'stable_ms': 100, 'timeout': 5})
+        self.assertEqual(action.validate(), (True, ""))
+        self.assertIn(".reduce(16)", action.to_code())
+        self.assertIn("region=(0, 0, 200, 100)", action.to_code())
+        
+        clock, monotonic, sleep = self._fake_clock()
+        with patch.object(FrameGrabber, 'get_instance', return_value=grabber), monotonic, sleep:
+            self.assertTrue(action.execute())
+        self.assertGreaterEqual(clock[0], 0.1)
+        self.assertLess(clock[0], 1.0)
+        self.assertEqual(grabber.backend.captures, grabber.captures)
+        
+        action.params['stable_ms'] = 0
+        self.assertFalse(action.validate()[0])
+    
+    def _sequence_grab(self, frames):
+        calls = []
+        
+        def grab():
+            calls.append(time.monotonic())
+            return frames[min(len(calls), len(frames)) - 1]
+        return grab, calls
+    
+    def test_region_watcher_change(self):
+        from core.change_detector import RegionWatcher, wait_for_region_change
+        changed = self.screen.copy()
+        changed[500:524, 900:924] = make_synthetic_template(24, 24)
+        grab, calls = self._sequence_grab([self.screen] * 4 + [changed])
+        watcher = RegionWatcher(grab, sample_rate=200)
+        start = time.monotonic()
+        self.assertTrue(watcher.wait(timeout=5))
+        self.assertEqual(watcher.samples, 5)
+        self.assertLess(watcher.triggered_at - start, 1.0)
+        self.assertFalse(watcher._thread.is_alive())
+        
+        grab, calls = self._sequence_grab([self.screen])
+        self.assertFalse(wait_for_region_change(grab, timeout=0.1, sample_rate=200))
+        self.assertGreater(len(calls), 2)
+        
+        grab, calls = self._sequence_grab([self.screen])
+        start = time.monotonic()
+        self.assertFalse(wait_for_region_change(grab, timeout=10, should_stop=lambda: True, sample_rate=200))
+        self.assertLess(time.monotonic() - start, 1.0)
+        
+        with self.assertRaises(ValueError):
+            RegionWatcher(grab, mode='bogus')
+        
+        def broken():
+            raise RuntimeError("截图失败")
+        with self.assertRaises(RuntimeError):
+            wait_for_region_change(broken, timeout=5)
+    
+    def test_region_watcher_stable(self):
+        from core.change_detector import RegionWatcher
+        frames = [self.screen]
+        for i in range(5):
+            frame = self.screen.copy()
+            frame[100:140, 100 + i * 40:140 + i * 40] = 255
+            frames.append(frame)
+        grab, calls = self._sequence_grab(frames)
+        watcher = RegionWatcher(grab, RegionWatcher.STABLE, stable_time=0.05, sample_rate=200)
+        self.assertTrue(watcher.wait(timeout=5))
+        self.assertGreater(watcher.samples, len(frames))
+        # 静止画面不会触发: 必须先变化
+        grab, calls = self._sequence_grab([self.screen])
+        watcher = RegionWatcher(grab, RegionWatcher.STABLE, stable_time=0.01, sample_rate=200)
+        self.assertFalse(watcher.wait(timeout=0.1))
+    
+    def test_wait_region_change_action(self):
+        from core.actions import Action, ActionType
+        from core.capture import MemoryCapture
+        from core.frame_grabber import FrameGrabber
+        changed = self.screen.copy()
+        changed[10:40, 10:40] = 0
+        grabber = FrameGrabber(tick_interval=0, backend=MemoryCapture([self.screen, self.screen, changed]))
+        action = Action(ActionType.WAIT_REGION_CHANGE, {'region': (0, 0, 200, 100), 'mode': 'change',
+                                                        'timeout': 5, 'sample_rate': 100})
+        self.assertEqual(action.validate(), (True, ""))
+        code = action.to_code()
+        self.assertIn("region=(0, 0, 200, 100)", code)
+        self.assertIn("time.sleep(0.01)", code)
+        self.assertNotIn("watch_changed_at = time.time()", code)
+        with patch.object(FrameGrabber, 'get_instance', return_value=grabber):
+            self.assertTrue(action.execute())
+        self.assertEqual(grabber.backend.captures, 3)
+        
+        action.params['mode'] = 'stable'
+        self.assertIn("watch_changed_at = time.time()", action.to_code())
+        action.params['sample_rate'] = 0
+        self.assertFalse(action.validate()[0])
+
+
+class TestMatchHints(unittest.TestCase):
+    def setUp(self):
+        import cv2
+        from core.match_hints import MatchHintStore
+        from core.image_matcher import ImageMatcher
+        from core.frame_grabber import Frame
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.MatchHintStore = MatchHintStore
+        self.store_path = os.path.join(self.temp_dir, "match_hints.json")
+        self.old_instance = MatchHintStore._instance
+        MatchHintStore._instance = MatchHintStore(self.store_path)
+        self.store = MatchHintStore._instance
+        
+        self.template = make_synthetic_template(48, 32)
+        self.image_path = os.path.join(self.temp_dir, "button.png")
+        cv2.imwrite(self.image_path, self.template)
+        self.matcher = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID)
+        self.Frame = Frame
+    
+    def tearDown(self):
+        self.store.save()
+        self.MatchHintStore._instance = self.old_instance
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _frame(self, x, y, left=0, top=0):
+        screen = make_synthetic_screen(1280, 720)
+        screen[y:y + 32, x:x + 48] = self.template
+        return self.Frame(screen, left, top, time.monotonic())
+    
+    def test_second_search_uses_hint(self):
+        first = self.matcher.locate_in_frame(self._frame(400, 300), self.template, 0.9, self.image_path)
+        self.assertEqual((first.left, first.top), (400, 300))
+        
+        with patch.object(self.matcher, 'search', wraps=self.matcher.search) as search:
+            second = self.matcher.locate_in_frame(self._frame(405, 298), self.template, 0.9, self.image_path)
+        self.assertEqual((second.left, second.top), (405, 298))
+        self.assertEqual(search.call_count, 1)
+        self.assertLess(search.call_args[0][0].shape[1], 200)
+        self.assertEqual(self.store.get_stats()['hits'], 1)
+    
+    def test_miss_falls_back_to_full_search(self):
+        self.matcher.locate_in_frame(self._frame(400, 300), self.template, 0.9, self.image_path)
+        location = self.matcher.locate_in_frame(self._frame(1000, 600), self.template, 0.9, self.image_path)
+        self.assertEqual((location.left, location.top), (1000, 600))
+        stats = self.store.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 1))
+        
+        self.matcher.locate_in_frame(self._frame(1000, 600), self.template, 0.9, self.image_path)
+        self.assertAlmostEqual(self.store.get_stats()['hit_rate'], 0.5)
+    
+    def test_hint_is_relative_to_window(self):
+        self.matcher.locate_in_frame(self._frame(400, 300, left=100, top=50), self.template, 0.9, self.image_path)
+        with patch.object(self.matcher, 'search', wraps=self.matcher.search) as search:
+            location = self.matcher.locate_in_frame(self._frame(400, 300, left=700, top=200),
+                                                    self.template, 0.9, self.image_path)
+        self.assertEqual((location.left, location.top), (1100, 500))
+        self.assertEqual(search.call_count, 1)
+    
+    def test_persisted_across_instances(self):
+        self.matcher.locate_in_frame(self._frame(400, 300), self.template, 0.9, self.image_path)
+        self.assertTrue(self.store.save())
+        
+        reloaded = self.MatchHintStore(self.store_path)
+        key = reloaded.make_key(self.image_path, (1280, 720))
+        self.assertEqual(reloaded.lookup(key), [(400, 300)])
+    
+    def test_record_defers_save_to_end_of_run(self):
+        from core.player import Player
+        key = self.store.make_key(self.image_path, (1280, 720))
+        with patch.object(self.store, 'save', wraps=self.store.save) as save:
+            for offset in [(400, 300), (900, 500)]:
+                self.store.record(key, offset)
+            save.assert_not_called()
+            self.assertFalse(os.path.exists(self.store_path))
+            
+            Player._save_match_hints()
+            save.assert_called_once()
+        self.assertEqual(self.MatchHintStore(self.store_path).lookup(key), [(900, 500), (400, 300)])
+    
+    def test_changed_template_file_drops_hint(self):
+        import cv2
+        key = self.store.make_key(self.image_path, (1280, 720))
+        self.store.record(key, (400, 300))
+        cv2.imwrite(self.image_path, make_synthetic_template(50, 30, seed=9))
+        os.utime(self.image_path, ns=(0, 0))
+        self.assertEqual(self.store.lookup(self.store.make_key(self.image_path, (1280, 720))), [])
+        self.assertEqual(self.store.get_stats()['entries'], 0)
+        self.assertEqual(self.store.get_stats()['invalidated'], 1)
+    
+    def test_regions_ordered_by_probability(self):
+        key = self.store.make_key(self.image_path, (1280, 720))
+        for offset in [(100, 100), (900, 500), (903, 498), (900, 500), (100, 100), (40, 600)]:
+            self.store.record(key, offset)
+        self.assertEqual(self.store.lookup(key), [(900, 500), (100, 100), (40, 600)])
+        probabilities = dict(self.store.probabilities(key))
+        self.assertAlmostEqual(probabilities[(900, 500)], 0.5)
+        
+        for offset in [(10, 10), (20, 200), (300, 30)]:
+            self.store.record(key, offset)
+        self.assertEqual(len(self.store.lookup(key)), self.store.MAX_REGIONS)
+        self.assertEqual(self.store.lookup(key)[:2], [(900, 500), (100, 100)])
+    
+    def test_searches_regions_in_order_then_widens(self):
+        key = self.store.make_key(self.image_path, (1280, 720))
+        for offset in [(400, 300), (400, 300), (1000, 100)]:
+            self.store.record(key, offset)
+        
+        location = self.matcher.locate_in_frame(self._frame(1000, 100), self.template, 0.9, self.image_path)
+        self.assertEqual((location.left, location.top), (1000, 100))
+        self.assertEqual(self.store.get_stats()['rank_hits'], [0, 1])
+        
+        with patch.object(self.matcher, 'search', wraps=self.matcher.search) as search:
+            location = self.matcher.locate_in_frame(self._frame(1060, 150), self.template, 0.9, self.image_path)
+        self.assertEqual((location.left, location.top), (1060, 150))
+        self.assertTrue(all(call[0][0].shape[1] < 1280 for call in search.call_args_list))
+        stats = self.store.get_stats()
+        self.assertEqual((stats['widened_hits'], stats['misses']), (1, 0))
+        self.assertGreater(stats['avg_prior_ms'], 0)
+    
+    def test_preview_does_not_record(self):
+        self.matcher.set_result_cache(True)
+        location = self.matcher.locate_in_frame(self._frame(400, 300), self.template, 0.9, self.image_path,
+                                                record=False)
+        self.assertEqual((location.left, location.top), (400, 300))
+        key = self.store.make_key(self.image_path, (1280, 720))
+        self.assertEqual(self.store.lookup(key), [])
+        self.assertEqual(self.matcher.result_cache.get_stats()['entries'], 0)
+    
+    def test_legacy_hint_file_loads(self):
+        import json
+        key = self.store.make_key(self.image_path, (1280, 720))
+        with open(self.store_path, 'w', encoding='utf-8') as f:
+            json.dump({'hints': {key: [12, 34]}}, f)
+        self.assertEqual(self.MatchHintStore(self.store_path).lookup(key), [(12, 34)])
+
+
+class TestMultiScaleMatch(unittest.TestCase):
+    def setUp(self):
+        import cv2
+        from core.scale_cache import TemplateScaleCache
+        from core.image_matcher import ImageMatcher
+        from core.frame_grabber import Frame
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.TemplateScaleCache = TemplateScaleCache
+        self.cache_path = os.path.join(self.temp_dir, "template_scales.json")
+        self.old_instance = TemplateScaleCache._instance
+        TemplateScaleCache._instance = TemplateScaleCache(self.cache_path)
+        
+        self.template = cv2.GaussianBlur(make_synthetic_template(64, 48), (5, 5), 0)
+        self.image_path = os.path.join(self.temp_dir, "button.png")
+        cv2.imwrite(self.image_path, self.template)
+        self.matcher = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID, use_hints=False, multi_scale=True)
+        
+        screen = make_synthetic_screen(1280, 720)
+        scaled = self.matcher.scale_template(self.template, 1.5)
+        screen[200:200 + scaled.shape[0], 500:500 + scaled.shape[1]] = scaled
+        self.frame = Frame(screen, 0, 0, time.monotonic())
+    
+    def tearDown(self):
+        self.TemplateScaleCache._instance = self.old_instance
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_finds_template_at_display_scale(self):
+        self.assertIsNone(self.matcher.match(self.frame.image, self.template, 0.8))
+        
+        with patch.object(self.TemplateScaleCache, 'display_key', return_value='1280x720@144'):
+            location = self.matcher.locate_in_frame(self.frame, self.template, 0.8, self.image_path)
+            self.assertEqual((location.left, location.top), (500, 200))
+            self.assertEqual((location.width, location.height), (96, 72))
+            
+            with patch.object(self.matcher, '_locate_template', wraps=self.matcher._locate_template) as locate:
+                location = self.matcher.locate_in_frame(self.frame, self.template, 0.8, self.image_path)
+            self.assertEqual(locate.call_count, 1)
+            self.assertEqual((location.left, location.top), (500, 200))
+        
+        reloaded = self.TemplateScaleCache(self.cache_path)
+        with patch.object(self.TemplateScaleCache, 'display_key', return_value='1280x720@144'):
+            self.assertEqual(reloaded.get(reloaded.make_key(self.image_path)), 1.5)
+        with patch.object(self.TemplateScaleCache, 'display_key', return_value='1280x720@96'):
+            self.assertIsNone(reloaded.get(reloaded.make_key(self.image_path)))
+    
+    def test_stale_scale_falls_back_to_sweep(self):
+        cache = self.TemplateScaleCache.get_instance()
+        with patch.object(self.TemplateScaleCache, 'display_key', return_value='1280x720@144') as display_key:
+            key = cache.make_key(self.image_path)
+            cache.set(key, 2.0)
+            display_key.reset_mock()
+            location = self.matcher.locate_in_frame(self.frame, self.template, 0.8, self.image_path)
+            self.assertEqual((location.left, location.top), (500, 200))
+            self.assertEqual(cache.get(key), 1.5)
+            # 同一帧内只查询一次显示配置
+            self.assertEqual(display_key.call_count, 1)
+    
+    def test_not_found_is_not_cached(self):
+        frame = type(self.frame)(make_synthetic_screen(640, 480, seed=8), 0, 0, time.monotonic())
+        self.assertIsNone(self.matcher.locate_in_frame(frame, self.template, 0.9, self.image_path))
+        self.assertEqual(self.TemplateScaleCache.get_instance().get_stats()['entries'], 0)
+
+
+class TestFindAllMatches(unittest.TestCase):
+    def setUp(self):
+        from core.image_matcher import ImageMatcher
+        from core.frame_grabber import Frame
+        self.matcher = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID)
+        self.Frame = Frame
+        self.template = make_synthetic_template(50, 30)
+        self.positions = [(100, 80), (100, 200), (400, 200), (700, 80), (700, 500)]
+        self.screen = make_synthetic_screen(1024, 768)
+        for x, y in self.positions:
+            self.screen[y:y + 30, x:x + 50] = self.template
+    
+    def test_finds_every_occurrence_once(self):
+        matches = self.matcher.find_all(self.screen, self.template, 0.9)
+        self.assertEqual([(m.left, m.top) for m in matches], sorted(self.positions, key=lambda p: (p[1], p[0])))
+        self.assertTrue(all(m.score > 0.99 for m in matches))
+    
+    def test_max_results_keeps_best(self):
+        self.assertEqual(len(self.matcher.find_all(self.screen, self.template, 0.9, max_results=2)), 2)
+    
+    def test_non_max_suppression(self):
+        import numpy as np
+        boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 10, 10]], dtype=np.float32)
+        scores = np.array([0.8, 0.95, 0.9], dtype=np.float32)
+        self.assertEqual(self.matcher.non_max_suppression(boxes, scores), [1, 2])
+    
+    def test_grayscale_half_scale(self):
+        from core.image_matcher import MatchOptions
+        matches = self.matcher.find_all(self.screen, self.template, 0.8, options=MatchOptions(True, 0.5))
+        self.assertEqual(len(matches), len(self.positions))
+        for match, (x, y) in zip(matches, sorted(self.positions, key=lambda p: (p[1], p[0]))):
+            self.assertLessEqual(abs(match.left - x), 1)
+            self.assertLessEqual(abs(match.top - y), 1)
+    
+    def test_action_publishes_variables(self):
+        import cv2
+        from core.actions import Action, ActionType, VariableManager
+        from core.image_matcher import ImageMatcher
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            image_path = os.path.join(temp_dir, "row button.png")
+            cv2.imwrite(image_path, self.template)
+            action = Action(action_type=ActionType.IMAGE_FIND_ALL,
+                            params={'image_path': image_path, 'confidence': 0.9, 'max_results': 20},
+                            background_mode=True)
+            self.assertEqual(action.condition_marker, "$row_button")
+            
+            frame = self.Frame(self.screen, 10, 20, time.monotonic(), full_screen=True)
+            with patch.object(ImageMatcher, 'grab_frame', return_value=frame):
+                self.assertTrue(action.execute())
+            
+            var_manager = VariableManager.get_instance()
+            self.assertTrue(var_manager.get("row_button"))
+            self.assertEqual(var_manager.get("row_button_count"), 5)
+            self.assertEqual((var_manager.get("row_button_1_x"), var_manager.get("row_button_1_y")), (110, 100))
+            self.assertEqual(var_manager.get("row_button_5_width"), 50)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def test_export(self):
+        from core.actions import Action, ActionType
+        from core.exporter import Exporter
+        action = Action(action_type=ActionType.IMAGE_FIND_ALL, params={'image_path': 'row.png', 'confidence': 0.85})
+        code = Exporter()._generate_python_code([action])
+        self.assertIn("def locate_all_on_screen(", code)
+        self.assertIn("row_list = locate_all_on_screen(r'row.png', 0.85, 20, scale=1.0, grayscale=False)", code)
+        self.assertIn("row_count = len(row_list)", code)
+        compile(code, '<export>', 'exec')
+    
+    def test_generated_code_matches_runtime_variables(self):
+        from core.actions import Action, ActionType
+        from core.match_code import find_all_lines
+        from gui.dashboard_page import DashboardPage
+        action = Action(action_type=ActionType.IMAGE_FIND_ALL,
+                        params={'image_path': 'row.png', 'confidence': 0.85, 'color_mode': 'grayscale'})
+        snippet = action.to_code()
+        batch = DashboardPage._action_to_python_code(None, action, 1)
+        for code in (snippet, batch):
+            self.assertIn("row_list = locate_all_on_screen(r'row.png', 0.85, 20, scale=1.0, grayscale=True)", code)
+            self.assertNotIn("locateAllOnScreen", code)
+        self.assertIn("def locate_all_on_screen(", snippet)
+        
+        lines = find_all_lines(action, "r'row.png'", 'row')
+        self.assertIn("\n".join("    " + line for line in lines), snippet)
+        namespace = {'locate_all_on_screen': lambda *args, **kwargs: [(110, 100, 50, 30), (110, 160, 50, 30)]}
+        exec("def run():\n" + "\n".join("    " + line for line in lines), namespace)
+        namespace['run']()
+        self.assertEqual((namespace['row_1_x'], namespace['row_1_y']), (110, 100))
+        self.assertEqual((namespace['row_2_y'], namespace['row_2_width'], namespace['row_2_height']), (160, 50, 30))
+
+
+class TestParallelMatcher(unittest.TestCase):
+    def setUp(self):
+        from core.image_matcher import ImageMatcher
+        from core.frame_grabber import Frame
+        self.ImageMatcher = ImageMatcher
+        screen = make_synthetic_screen(800, 600)
+        self.templates = []
+        self.positions = []
+        for i in range(6):
+            template = make_synthetic_template(40, 30, seed=50 + i)
+            x, y = 30 + i * 120, 40 + i * 80
+            screen[y:y + 30, x:x + 40] = template
+            self.templates.append(template)
+            self.positions.append((x + 5, y + 7))
+        self.templates.append(make_synthetic_template(40, 30, seed=99))
+        self.frame = Frame(screen, 5, 7, time.monotonic(), full_screen=True)
+        self.matchers = []
+    
+    def tearDown(self):
+        for matcher in self.matchers:
+            matcher.set_backend('serial')
+    
+    def _locate(self, mode):
+        matcher = self.ImageMatcher(use_hints=False, match_backend=mode, match_workers=3)
+        self.matchers.append(matcher)
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self.frame):
+            return matcher, matcher.locate_many(self.templates, [0.9] * len(self.templates))
+    
+    def test_backends_agree_with_serial(self):
+        _, expected = self._locate('serial')
+        self.assertEqual([(m.left, m.top) for m in expected[:-1]], self.positions)
+        self.assertIsNone(expected[-1])
+        for mode in ('thread', 'process'):
+            matcher, results = self._locate(mode)
+            self.assertIsNotNone(matcher._backend)
+            self.assertEqual(results, expected, mode)
+    
+    def test_process_workers_use_parent_settings(self):
+        from core.parallel_matcher import _worker_matcher
+        parent = self.ImageMatcher(prefilter=True, fft=False, atlas=False)
+        worker = _worker_matcher(parent.worker_settings())
+        self.assertEqual(worker.worker_settings(), parent.worker_settings())
+        self.assertIsNotNone(worker.prefilter)
+        self.assertIsNone(worker.fft)
+        self.assertFalse(worker.use_hints)
+        self.assertIs(_worker_matcher(parent.worker_settings()), worker)
+        
+        matcher = self.ImageMatcher(use_hints=False, match_backend='process', match_workers=2, prefilter=True)
+        self.matchers.append(matcher)
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self.frame), \
+                patch.object(matcher._backend, '_get_executor') as executor:
+            executor.return_value.submit.return_value.result.return_value = ((None, None, 0.0), None)
+            matcher.locate_many(self.templates, [0.9] * len(self.templates))
+        settings = {call[0][-1] for call in executor.return_value.submit.call_args_list}
+        self.assertEqual(settings, {matcher.worker_settings()})
+    
+    def test_backends_report_best_scores(self):
+        from core.image_matcher import MatchOptions
+        options = [MatchOptions(grayscale=True)] * len(self.templates)
+        serial = self.ImageMatcher(use_hints=False)
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self.frame):
+            with serial.track_scores(self.templates) as expected:
+                expected_results = serial.locate_many(self.templates, [0.9] * len(self.templates), options=options)
+            for mode in ('thread', 'process'):
+                matcher = self.ImageMatcher(use_hints=False, match_backend=mode, match_workers=3)
+                self.matchers.append(matcher)
+                with matcher.track_scores(self.templates) as scores:
+                    results = matcher.locate_many(self.templates, [0.9] * len(self.templates), options=options)
+                self.assertEqual(results, expected_results, mode)
+                self.assertEqual(set(scores), {id(template) for template in self.templates}, mode)
+                missing = id(self.templates[-1])
+                self.assertLess(scores[missing], 0.9)
+                self.assertAlmostEqual(scores[missing], expected[missing], places=4)
+    
+    def test_single_worker_disables_backend(self):
+        matcher = self.ImageMatcher(match_backend='thread', match_workers=1)
+        self.assertIsNone(matcher._backend)
+
+
+class TestPrefilter(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        import cv2
+        from core.prefilter import ColorTilePrefilter
+        self.np = np
+        self.prefilter = ColorTilePrefilter()
+        self.template = np.full((24, 40, 3), (40, 120, 230), dtype=np.uint8)
+        cv2.putText(self.template, "Go", (6, 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        self.screen = make_synthetic_screen(1280, 720)
+        self.screen[403:427, 911:951] = self.template
+    
+    def test_regions_cover_true_location(self):
+        regions = self.prefilter.candidate_regions(self.screen, self.template)
+        self.assertIsNotNone(regions)
+        self.assertTrue(any(x <= 911 and y <= 403 and x + w >= 951 and y + h >= 427 for x, y, w, h in regions))
+        area = sum(w * h for _, _, w, h in regions)
+        self.assertLess(area, 0.2 * 1280 * 720)
+        self.assertGreater(self.prefilter.get_stats()['avg_skipped'], 0.8)
+    
+    def test_absent_color_rejects_frame(self):
+        screen = make_synthetic_screen(1280, 720)
+        screen[:] = 235
+        self.assertEqual(self.prefilter.candidate_regions(screen, self.template), [])
+    
+    def test_textured_template_not_applicable(self):
+        template = self.np.random.RandomState(5).randint(0, 255, (40, 60, 3)).astype(self.np.uint8)
+        self.assertIsNone(self.prefilter.candidate_regions(self.screen, template))
+        self.assertIsNone(self.prefilter.candidate_regions(self.screen[:60, :80], self.template))
+    
+    def test_matcher_results_unchanged(self):
+        from core.image_matcher import ImageMatcher
+        plain = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID)
+        filtered = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID, prefilter=True)
+        expected = plain.match(self.screen, self.template, 0.9)
+        self.assertEqual((expected.left, expected.top), (911, 403))
+        self.assertEqual(filtered.match(self.screen, self.template, 0.9), expected)
+        
+        template = make_synthetic_template(60, 40)
+        screen = self.screen.copy()
+        screen[100:140, 200:260] = template
+        self.assertEqual(filtered.match(screen, template, 0.9), plain.match(screen, template, 0.9))
+        self.assertIsNone(filtered.match(make_synthetic_screen(1280, 720), self.template, 0.9))
+    
+    def test_brightness_shift_matches_by_default(self):
+        import cv2
+        from core.image_matcher import ImageMatcher
+        from utils.config import Config
+        self.assertFalse(Config().image_prefilter)
+        screen = make_synthetic_screen(1280, 720)
+        for shift in (50, 70):
+            screen[403:427, 911:951] = cv2.add(self.template, (shift, shift, shift, 0))
+            score = cv2.minMaxLoc(cv2.matchTemplate(screen, self.template, cv2.TM_CCOEFF_NORMED))[1]
+            self.assertGreater(score, 0.8)
+            found = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID).match(screen, self.template, 0.8)
+            self.assertEqual((found.left, found.top), (911, 403))
+
+
+class TestFFTCorrelation(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        import cv2
+        from core.fft_match import FFTCorrelator
+        self.np = np
+        self.cv2 = cv2
+        self.correlator = FFTCorrelator()
+        self.template = make_synthetic_template(120, 90, seed=6)
+        self.screen = make_synthetic_screen(640, 480, seed=6)
+        self.screen[211:301, 377:497] = self.template
+    
+    def test_scores_match_opencv(self):
+        np, cv2 = self.np, self.cv2
+        gray = cv2.cvtColor(self.screen, cv2.COLOR_BGR2GRAY)
+        gray_template = cv2.cvtColor(self.template, cv2.COLOR_BGR2GRAY)
+        for screen, template in [(self.screen, self.template), (gray, gray_template),
+                                 (self.screen[200:320, 360:520], self.template)]:
+            expected = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+            result = self.correlator.match_template(screen, template)
+            self.assertEqual(result.shape, expected.shape)
+            self.assertEqual(result.dtype, np.float32)
+            self.assertLess(np.abs(result - expected).max(), 2e-3)
+            self.assertEqual(np.unravel_index(result.argmax(), result.shape),
+                             np.unravel_index(expected.argmax(), expected.shape))
+    
+    def test_flat_window_scores_zero(self):
+        np = self.np
+        screen = np.full((200, 260, 3), 128, dtype=np.uint8)
+        result = self.correlator.match_template(screen, self.template)
+        self.assertTrue(np.all(result == 0))
+    
+    def test_flat_template_scores_one(self):
+        np, cv2 = self.np, self.cv2
+        template = np.full((90, 120, 3), (30, 160, 220), dtype=np.uint8)
+        for screen in [self.screen, np.full((200, 260, 3), 128, dtype=np.uint8)]:
+            expected = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+            result = self.correlator.match_template(screen, template)
+            self.assertEqual(result.shape, expected.shape)
+            self.assertEqual(result.dtype, np.float32)
+            self.assertTrue(np.array_equal(result, expected))
+    
+    def test_spectrum_cache_and_threshold(self):
+        self.assertFalse(self.correlator.should_use(self.screen.shape, (40, 30, 3)))
+        self.assertTrue(self.correlator.should_use(self.screen.shape, self.template.shape))
+        self.assertFalse(self.correlator.should_use((80, 100, 3), self.template.shape))
+        
+        for _ in range(3):
+            self.correlator.match_template(self.screen, self.template)
+        stats = self.correlator.get_stats()
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['spectrum_hits'], 2)
+        self.assertEqual(stats['cached_spectra'], 1)
+    
+    def test_spectrum_cache_keyed_by_content(self):
+        np, cv2 = self.np, self.cv2
+        gray = cv2.cvtColor(self.screen, cv2.COLOR_BGR2GRAY)
+        for _ in range(3):
+            # 每次新建的灰度模板内容相同，共用一份频谱
+            self.correlator.match_template(gray, cv2.cvtColor(self.template, cv2.COLOR_BGR2GRAY))
+        stats = self.correlator.get_stats()
+        self.assertEqual((stats['spectrum_hits'], stats['cached_spectra']), (2, 1))
+        
+        # 同形状但内容不同的临时模板不会拿到旧的频谱
+        other = cv2.cvtColor(make_synthetic_template(120, 90, seed=7), cv2.COLOR_BGR2GRAY)
+        result = self.correlator.match_template(gray, other)
+        expected = cv2.matchTemplate(gray, other, cv2.TM_CCOEFF_NORMED)
+        self.assertLess(np.abs(result - expected).max(), 2e-3)
+        self.assertEqual(self.correlator.get_stats()['cached_spectra'], 2)
+    
+    def test_matcher_uses_fft_for_large_templates(self):
+        from core.image_matcher import ImageMatcher
+        matcher = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID)
+        direct = ImageMatcher(engine=ImageMatcher.ENGINE_PYRAMID, fft=False)
+        location = matcher.match(self.screen, self.template, 0.9)
+        self.assertEqual((location.left, location.top), (377, 211))
+        self.assertGreater(matcher.fft.get_stats()['calls'], 0)
+        self.assertAlmostEqual(location.score, direct.match(self.screen, self.template, 0.9).score, places=3)
+        self.assertIsNone(direct.fft)
+    
+    def test_benchmark_threshold(self):
+        from core.benchmark import correlation_threshold
+        rows = [
+            {'template_area': 100, 'direct_ms': 1.0, 'fft_ms': 2.0},
+            {'template_area': 400, 'direct_ms': 3.0, 'fft_ms': 2.0},
+            {'template_area': 400, 'direct_ms': 5.0, 'fft_ms': 6.0},
+            {'template_area': 900, 'direct_ms': 9.0, 'fft_ms': 4.0},
+        ]
+        self.assertEqual(correlation_threshold(rows), 900)
+        self.assertIsNone(correlation_threshold(rows[:1]))
+
+
+class TestTemplateAtlas(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        self.np = np
+        self.screen = make_synthetic_screen(1280, 720, seed=8)
+        self.templates = [make_synthetic_template(w, h, seed=20 + i)
+                          for i, (w, h) in enumerate([(32, 32), (48, 48), (48, 48), (64, 40), (12, 12)])]
+        self.positions = [(100, 80), (700, 300), None, (1000, 600), (500, 500)]
+        for template, position in zip(self.templates, self.positions):
+            if position:
+                x, y = position
+                self.screen[y:y + template.shape[0], x:x + template.shape[1]] = template
+    
+    def test_packed_layout_and_coarse_scores(self):
+        import cv2
+        from core.image_matcher import ImageMatcher
+        from core.template_atlas import TemplateAtlas
+        np = self.np
+        matcher = ImageMatcher()
+        levels = [matcher._pyramid_levels(self.screen, template) for template in self.templates]
+        atlas = TemplateAtlas(self.templates, self.screen.shape, levels)
+        self.assertEqual(atlas.packed_count, 4)
+        for group in atlas.groups:
+            self.assertTrue(group.spectra.flags['C_CONTIGUOUS'])
+            self.assertEqual(group.spectra.dtype, np.float32)
+            self.assertEqual(group.spectra.shape[:2], (len(group.indices), 3))
+        self.assertEqual(atlas.nbytes, sum(group.spectra.nbytes for group in atlas.groups))
+        
+        coarse = atlas.coarse_scores(self.screen)
+        self.assertNotIn(4, coarse)
+        for index, (level, scores, small_shape) in coarse.items():
+            small_screen, small_template = self.screen, self.templates[index]
+            for _ in range(level):
+                small_screen, small_template = cv2.pyrDown(small_screen), cv2.pyrDown(small_template)
+            expected = cv2.matchTemplate(small_screen, small_template, cv2.TM_CCOEFF_NORMED)
+            self.assertEqual(scores.shape, expected.shape)
+            self.assertLess(np.abs(scores - expected).max(), 2e-3)
+        
+        with self.assertRaises(ValueError):
+            atlas.coarse_scores(self.screen[:700])
+    
+    def test_search_many_matches_individual_search(self):
+        from core.image_matcher import ImageMatcher
+        matcher = ImageMatcher()
+        found = matcher.search_many(self.screen, self.templates)
+        for template, position, result in zip(self.templates, self.positions, found):
+            expected = matcher.search(self.screen, template)
+            self.assertEqual(result[:2], expected[:2])
+            self.assertAlmostEqual(result[2], expected[2], places=3)
+            if position:
+                self.assertEqual(result[:2], position)
+    
+    def test_locate_many_reuses_atlas_across_frames(self):
+        from core.frame_grabber import Frame
+        from core.image_matcher import ImageMatcher
+        matcher = ImageMatcher(use_hints=False)
+        frame = Frame(self.screen, 10, 20, time.monotonic())
+        with patch.object(ImageMatcher, 'grab_frame', return_value=frame):
+            with patch.object(matcher, 'search_many', wraps=matcher.search_many) as search_many:
+                first = matcher.locate_many(self.templates, [0.9] * 5)
+                second = matcher.locate_many(self.templates, [0.9] * 5)
+        self.assertEqual(search_many.call_count, 2)
+        self.assertEqual(len(matcher._atlases), 1)
+        self.assertEqual(first, second)
+        for position, location in zip(self.positions, first):
+            if position is None:
+                self.assertIsNone(location)
+            else:
+                self.assertEqual((location.left, location.top), (position[0] + 10, position[1] + 20))
+        
+        with patch.object(ImageMatcher, 'grab_frame', return_value=frame):
+            with patch.object(matcher, 'search_many') as search_many:
+                matcher.locate_many(self.templates[:3], [0.9] * 3)
+        search_many.assert_not_called()
+
+
+class TestAnchoredSearch(unittest.TestCase):
+    def setUp(self):
+        from core.image_matcher import ImageMatcher
+        self.ImageMatcher = ImageMatcher
+        self.matcher = ImageMatcher(use_hints=False)
+        self.anchor = make_synthetic_template(120, 40, seed=31)
+        self.child = make_synthetic_template(40, 24, seed=32)
+        self.offset = (150, 90)
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _screen(self, anchor_at, child_at=None, decoy_at=(40, 600)):
+        screen = make_synthetic_screen(1280, 720, seed=9)
+        if anchor_at:
+            x, y = anchor_at
+            screen[y:y + 40, x:x + 120] = self.anchor
+            if child_at is None:
+                child_at = (x + self.offset[0], y + self.offset[1])
+        if child_at:
+            screen[child_at[1]:child_at[1] + 24, child_at[0]:child_at[0] + 40] = self.child
+        if decoy_at:
+            screen[decoy_at[1]:decoy_at[1] + 24, decoy_at[0]:decoy_at[0] + 40] = self.child
+        return screen
+    
+    def _frame(self, screen, left=0, top=0):
+        from core.frame_grabber import Frame
+        return Frame(screen, left, top, time.monotonic())
+    
+    def test_child_follows_anchor(self):
+        for anchor_at in [(300, 200), (900, 100), (10, 400)]:
+            frame = self._frame(self._screen(anchor_at))
+            location = self.matcher.locate_anchored(frame, self.anchor, self.child, 0.9, self.offset)
+            self.assertEqual((location.left, location.top),
+                             (anchor_at[0] + self.offset[0], anchor_at[1] + self.offset[1]))
+    
+    def test_frame_offset_and_small_shift(self):
+        screen = self._screen((300, 200), child_at=(300 + 150 + 7, 200 + 90 - 5))
+        frame = self._frame(screen[100:, 200:], 200, 100)
+        location = self.matcher.locate_anchored(frame, self.anchor, self.child, 0.9, self.offset)
+        self.assertEqual((location.left, location.top), (457, 285))
+    
+    def test_child_outside_window_not_found(self):
+        screen = self._screen((300, 200), child_at=(700, 500))
+        location = self.matcher.locate_anchored(self._frame(screen), self.anchor, self.child, 0.9, self.offset)
+        self.assertIsNone(location)
+    
+    def test_missing_anchor_falls_back_to_full_search(self):
+        frame = self._frame(self._screen(None, decoy_at=(640, 333)))
+        location = self.matcher.locate_anchored(frame, self.anchor, self.child, 0.9, self.offset)
+        self.assertEqual((location.left, location.top), (640, 333))
+    
+    def test_anchor_located_once_per_frame(self):
+        frame = self._frame(self._screen((300, 200)))
+        with patch.object(self.matcher, 'locate_in_frame', wraps=self.matcher.locate_in_frame) as locate:
+            for _ in range(3):
+                self.assertIsNotNone(self.matcher.locate_anchored(frame, self.anchor, self.child, 0.9, self.offset))
+            self.assertEqual(locate.call_count, 1)
+            self.matcher.locate_anchored(self._frame(frame.image), self.anchor, self.child, 0.9, self.offset)
+            self.assertEqual(locate.call_count, 2)
+    
+    def test_measure_offset(self):
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self._frame(self._screen((300, 200)))):
+            self.assertEqual(self.matcher.measure_offset(self.anchor, (450, 290), 0.9), (150, 90))
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self._frame(self._screen(None))):
+            self.assertIsNone(self.matcher.measure_offset(self.anchor, (450, 290), 0.9))
+    
+    def test_parse_offset(self):
+        self.assertIsNone(self.ImageMatcher.parse_offset(''))
+        self.assertEqual(self.ImageMatcher.parse_offset(' 12, -8 '), (12, -8))
+        self.assertEqual(self.ImageMatcher.parse_offset([3, 4]), (3, 4))
+        for bad in ['12', '1,2,3', 'a,b']:
+            with self.assertRaises(ValueError):
+                self.ImageMatcher.parse_offset(bad)
+    
+    def test_export_anchored_search(self):
+        import cv2
+        from core.actions import Action, ActionType
+        from core.exporter import Exporter
+        from core.match_code import ANCHORED_HELPER
+        anchor_path = os.path.join(self.temp_dir, "dialog.png")
+        child_path = os.path.join(self.temp_dir, "ok_button.png")
+        cv2.imwrite(anchor_path, self.anchor)
+        cv2.imwrite(child_path, self.child)
+        action = Action(action_type=ActionType.IMAGE_CLICK,
+                        params={'image_path': child_path, 'confidence': 0.9,
+                                'anchor_image': anchor_path, 'anchor_offset': '150,90'})
+        exporter = Exporter()
+        exporter._collect_embedded_images([action])
+        self.assertIn(anchor_path, exporter._embedded_images)
+        code = exporter._generate_python_code([action])
+        t_h, t_w = self.child.shape[:2]
+        self.assertIn(f"locate_near_anchor(get_embedded_image('dialog_png'), image_path, 0.9, 150, 90, {t_w}, {t_h}, 16, "
+                      f"scale=1.0, grayscale=False)", code)
+        self.assertIn("def locate_near_anchor(", code)
+        compile(code, '<export>', 'exec')
+        
+        calls = []
+        
+        def locate(path, confidence, grayscale=False, region=None):
+            calls.append((path, region))
+            return (500, 300, 200, 120) if path == 'anchor' else None
+        namespace = {'pyautogui': type('FakePyAutoGUI', (), {'locateOnScreen': staticmethod(locate)})}
+        exec('\n'.join(ANCHORED_HELPER), namespace)
+        namespace['locate_near_anchor']('anchor', 'child', 0.9, 150, 90, t_w, t_h, 16)
+        self.assertEqual(calls[-1], ('child', (634, 374, t_w + 32, t_h + 32)))
+        namespace['locate_near_anchor'](None, 'child', 0.9, 150, 90, t_w, t_h, 16)
+        self.assertEqual(calls[-1], ('child', None))
+        
+        class ImageNotFoundException(Exception):
+            pass
+        
+        def locate_or_raise(path, confidence, grayscale=False, region=None):
+            calls.append((path, region))
+            if path == 'anchor':
+                raise ImageNotFoundException()
+            return (40, 50, t_w, t_h)
+        namespace['pyautogui'] = type('FakePyAutoGUI', (), {'locateOnScreen': staticmethod(locate_or_raise),
+                                                            'ImageNotFoundException': ImageNotFoundException})
+        self.assertEqual(namespace['locate_near_anchor']('anchor', 'child', 0.9, 150, 90, t_w, t_h, 16),
+                         (40, 50, t_w, t_h))
+        self.assertEqual(calls[-1], ('child', None))
+        
+        namespace['pyautogui'] = type('FakePyAutoGUI', (), {'locateOnScreen': staticmethod(locate),
+                                                            'ImageNotFoundException': ImageNotFoundException})
+        calls.clear()
+        namespace['locate_near_anchor']('anchor', 'child', 0.9, -600, -320, t_w, t_h, 16)
+        self.assertEqual(calls[-1], ('child', (-116, -36, t_w + 32, t_h + 32)))
+    
+    def test_dashboard_export_uses_match_helpers(self):
+        import cv2
+        from core.actions import Action, ActionType
+        from core.match_code import helper_lines
+        from gui.dashboard_page import DashboardPage
+        anchor_path = os.path.join(self.temp_dir, "dialog.png")
+        child_path = os.path.join(self.temp_dir, "ok_button.png")
+        cv2.imwrite(anchor_path, self.anchor)
+        cv2.imwrite(child_path, self.child)
+        t_h, t_w = self.child.shape[:2]
+        params = {'image_path': child_path, 'confidence': 0.9, 'color_mode': 'grayscale', 'match_scale': 0.5}
+        for action_type in (ActionType.IMAGE_CLICK, ActionType.IMAGE_WAIT_CLICK, ActionType.IMAGE_CHECK):
+            scaled = DashboardPage._action_to_python_code(None, Action(action_type, dict(params)), 1)
+            self.assertIn(f"locate_on_screen_scaled(r'{child_path}', 0.9, 0.5, grayscale=True)", scaled)
+            self.assertNotIn("pyautogui.locateOnScreen", scaled)
+            
+            anchored = Action(action_type, dict(params, anchor_image=anchor_path, anchor_offset='150,90'))
+            code = DashboardPage._action_to_python_code(None, anchored, 1)
+            self.assertIn(f"locate_near_anchor(r'{anchor_path}', r'{child_path}', 0.9, 150, 90, {t_w}, {t_h}, 16, "
+                          f"scale=0.5, grayscale=True)", code)
+            helpers = '\n'.join(helper_lines([anchored]))
+            self.assertIn("def locate_on_screen_scaled(", helpers)
+            self.assertIn("def locate_near_anchor(", helpers)
+            compile("import pyautogui\n" + helpers + "\n" + code, '<dashboard>', 'exec')
+    
+    def test_anchored_action(self):
+        import cv2
+        from core.actions import Action, ActionType, VariableManager
+        anchor_path = os.path.join(self.temp_dir, "dialog.png")
+        child_path = os.path.join(self.temp_dir, "ok_button.png")
+        cv2.imwrite(anchor_path, self.anchor)
+        cv2.imwrite(child_path, self.child)
+        action = Action(action_type=ActionType.IMAGE_CHECK,
+                        params={'image_path': child_path, 'confidence': 0.9,
+                                'anchor_image': anchor_path, 'anchor_offset': '150,90'})
+        self.assertEqual(action.validate(), (True, ""))
+        code = action.to_code()
+        self.assertIn("def locate_near_anchor(", code)
+        self.assertIn("location = locate_near_anchor(r'", code)
+        compile("def run():\n" + code, '<to_code>', 'exec')
+        
+        VariableManager.get_instance().clear()
+        with patch.object(self.ImageMatcher, 'grab_frame', return_value=self._frame(self._screen((500, 300)))):
+            self.assertTrue(action.execute())
+        self.assertEqual(VariableManager.get_instance().get("ok_button_x"), 650)
+        self.assertEqual(VariableManager.get_instance().get("ok_button_y"), 390)
+        VariableManager.get_instance().clear()
+        
+        action.params['anchor_offset'] = '150'
+        self.assertFalse(action.validate()[0])
+        action.params['anchor_image'] = os.path.join(self.temp_dir, "missing.png")
+        self.assertFalse(action.validate()[0])
+
+
+class TestMatchResultCache(unittest.TestCase):
+    def setUp(self):
+        from core.frame_grabber import Frame
+        from core.image_matcher import ImageMatcher
+        self.Frame = Frame
+        self.ImageMatcher = ImageMatcher
+        self.template = make_synthetic_template(40, 30, seed=12)
+        self.screen = make_synthetic_screen(800, 600, seed=12)
+        self.screen[100:130, 200:240] = self.template
+    
+    def _frame(self, screen, left=0, top=0):
+        return self.Frame(screen, left, top, time.monotonic())
+    
+    def test_unchanged_region_skips_matching(self):
+        matcher = self.ImageMatcher(use_hints=False, result_cache=True)
+        missing = make_synthetic_template(40, 30, seed=13)
+        with patch.object(matcher, 'search_in_frame', wraps=matcher.search_in_frame) as search:
+            for _ in range(3):
+                frame = self._frame(self.screen.copy())
+                self.assertEqual(matcher.locate_in_frame(frame, self.template, 0.9)[:2], (200, 100))
+                self.assertIsNone(matcher.locate_in_frame(frame, missing, 0.9))
+            self.assertEqual(search.call_count, 2)
+            
+            changed = self.screen.copy()
+            changed[500, 700] = 0
+            self.assertIsNotNone(matcher.locate_in_frame(self._frame(changed), self.template, 0.9))
+            matcher.locate_in_frame(self._frame(self.screen, 10, 0), self.template, 0.9)
+            matcher.locate_in_frame(self._frame(self.screen), self.template, 0.8)
+            self.assertEqual(search.call_count, 5)
+        stats = matcher.result_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (4, 5))
+    
+    def test_locate_many_uses_cache(self):
+        matcher = self.ImageMatcher(use_hints=False, result_cache=True)
+        templates = [self.template, make_synthetic_template(24, 24, seed=14)]
+        with patch.object(self.ImageMatcher, 'grab_frame', side_effect=lambda region=None: self._frame(self.screen)), \
+                patch.object(matcher, '_search_many_in_frame', wraps=matcher._search_many_in_frame) as search:
+            first = matcher.locate_many(templates, [0.9, 0.9])
+            second = matcher.locate_many(templates, [0.9, 0.9])
+        self.assertEqual(first, second)
+        self.assertEqual(first[0][:2], (200, 100))
+        self.assertIsNone(first[1])
+        self.assertEqual(search.call_args_list[1][0][1], [])
+    
+    def test_bounded_and_expiring(self):
+        from core.result_cache import MatchResultCache
+        cache = MatchResultCache(max_entries=2, ttl=60)
+        templates = [make_synthetic_template(8, 8, seed=i) for i in range(3)]
+        frame = self._frame(self.screen)
+        for template in templates:
+            cache.store(frame, template, 0.9, None)
+        self.assertEqual(cache.get_stats()['entries'], 2)
+        self.assertFalse(cache.lookup(frame, templates[0], 0.9)[0])
+        self.assertEqual(cache.lookup(frame, templates[2], 0.9), (True, None))
+        
+        cache.ttl = 0
+        with patch('core.result_cache.time.monotonic', return_value=time.monotonic() + 1):
+            self.assertFalse(cache.lookup(frame, templates[2], 0.9)[0])
+        self.assertEqual(cache.get_stats()['expired'], 1)
+    
+    def test_crop_hash_matches_copy(self):
+        import numpy as np
+        from core.result_cache import MatchResultCache
+        crop = self._frame(self.screen).crop((50, 40, 300, 200)).image
+        self.assertFalse(crop.flags['C_CONTIGUOUS'])
+        self.assertEqual(MatchResultCache.image_hash(crop), MatchResultCache.image_hash(np.ascontiguousarray(crop)))
+
+
+class TestMatchTelemetry(unittest.TestCase):
+    def setUp(self):
+        from core.frame_grabber import Frame
+        from core.image_matcher import ImageMatcher, MatchOptions
+        from core.match_telemetry import MatchTelemetry
+        self.ImageMatcher = ImageMatcher
+        self.MatchOptions = MatchOptions
+        self.telemetry = MatchTelemetry()
+        self.template = make_synthetic_template(40, 30, seed=31)
+        self.screen = make_synthetic_screen(800, 600, seed=31)
+        self.screen[100:130, 200:240] = self.template
+        self.frame = Frame(self.screen, 0, 0, time.monotonic())
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_record_and_stats(self):
+        t = self.telemetry
+        t.record('a.png', 0.004, 0.97, 0.9, 0, t.HIT)
+        t.record('a.png', 0.030, 0.88, 0.9, 2, t.MISS)
+        t.record('a.png', 0.150, None, 0.9, 0, t.TIMEOUT)
+        t.record('dead.png', 0.010, 0.40, 0.9, 2, t.MISS)
+        
+        stats = t.get_template_stats('a.png')
+        self.assertEqual(stats['count'], 3)
+        self.assertAlmostEqual(stats['hit_rate'], 1 / 3)
+        self.assertEqual(stats['outcomes'][t.TIMEOUT], 1)
+        self.assertEqual((stats['retries'], stats['near_misses']), (2, 1))
+        self.assertEqual((stats['min_score'], stats['max_score']), (0.88, 0.97))
+        self.assertEqual(sum(stats['latency_histogram']), 3)
+        self.assertEqual(sum(stats['score_histogram']), 2)
+        self.assertEqual(stats['score_histogram'][19], 1)
+        self.assertEqual(stats['p50_ms'], 50.0)
+        self.assertAlmostEqual(stats['max_ms'], 150.0)
+        
+        self.assertEqual(list(t.get_stats()), ['a.png', 'dead.png'])
+        summary = t.get_summary()
+        self.assertEqual((summary['templates'], summary['matches']), (2, 4))
+        self.assertEqual(summary['never_hit'], ['dead.png'])
+        with self.assertRaises(ValueError):
+            t.record('a.png', 0.01, 0.5, 0.9, 0, 'bogus')
+        
+        t.enabled = False
+        t.record('b.png', 0.01, 0.5, 0.9)
+        self.assertIsNone(t.get_template_stats('b.png'))
+        t.clear()
+        self.assertEqual(t.get_stats(), {})
+    
+    def test_tracks_scores_below_threshold(self):
+        matcher = self.ImageMatcher(use_hints=False)
+        other = make_synthetic_template(24, 24, seed=32)
+        with matcher.track_scores([self.template]) as scores:
+            self.assertIsNone(matcher.locate_in_frame(self.frame, self.template, 1.01))
+            matcher.locate_in_frame(self.frame, other, 0.9)
+        self.assertGreater(scores[id(self.template)], 0.99)
+        self.assertNotIn(id(other), scores)
+        
+        with matcher.track_scores([self.template]) as scores:
+            matcher.locate_in_frame(self.frame, self.template, 0.9, options=self.MatchOptions(True, 0.5))
+        self.assertGreater(scores[id(self.template)], 0.9)
+        self.assertEqual((matcher._tracked, matcher._aliases), ({}, {}))
+        
+        templates = [make_synthetic_template(24, 24, seed=40 + i) for i in range(4)] + [self.template]
+        with matcher.track_scores(templates) as scores:
+            matcher._locate_many_in_frame(self.frame, templates, [0.9] * 5, [None] * 5, [None] * 5)
+        self.assertEqual(len(scores), 5)
+        self.assertGreater(scores[id(self.template)], 0.99)
+    
+    def test_measure_outcomes(self):
+        matcher = self.ImageMatcher(use_hints=False)
+        t = self.telemetry
+        with patch.object(self.ImageMatcher, 'get_instance', return_value=matcher):
+            with t.measure('hit.png', self.template, 0.9) as probe:
+                for _ in range(2):
+                    with probe.attempt():
+                        location = matcher.locate_in_frame(self.frame, self.template, 0.9)
+                probe.outcome = t.HIT if location else t.MISS
+            
+            def stopped():
+                with t.measure('stop.png', self.template, 0.9) as probe:
+                    with probe.attempt():
+                        pass
+                    return False
+            stopped()
+            
+            with self.assertRaises(RuntimeError):
+                with t.measure('error.png', self.template, 0.9):
+                    raise RuntimeError("截图失败")
+        
+        hit = t.get_template_stats('hit.png')
+        self.assertEqual((hit['hits'], hit['retries']), (1, 1))
+        self.assertGreater(hit['max_score'], 0.99)
+        self.assertEqual(t.get_template_stats('stop.png')['last_outcome'], t.STOPPED)
+        self.assertEqual(t.get_template_stats('error.png')['last_outcome'], t.ERROR)
+    
+    def test_image_check_batch_records(self):
+        import cv2
+        from core.actions import Action, ActionType, ImageCheckBatch
+        from core.frame_grabber import Frame
+        from core.match_telemetry import MatchTelemetry
+        found_path = os.path.join(self.temp_dir, "found.png")
+        missing_path = os.path.join(self.temp_dir, "missing.png")
+        cv2.imwrite(found_path, self.template)
+        cv2.imwrite(missing_path, make_synthetic_template(40, 30, seed=33))
+        actions = [Action(action_type=ActionType.IMAGE_CHECK, params={'image_path': path, 'confidence': 0.9})
+                   for path in (found_path, missing_path)]
+        batch = ImageCheckBatch(actions)
+        matcher = self.ImageMatcher(use_hints=False)
+        frame = Frame(self.screen, 0, 0, time.monotonic(), full_screen=True)
+        with patch.object(MatchTelemetry, 'get_instance', return_value=self.telemetry), \
+                patch.object(self.ImageMatcher, 'get_instance', return_value=matcher), \
+                patch.object(self.ImageMatcher, 'grab_frame', return_value=frame), \
+                patch('core.actions.time.sleep'):
+            for action in actions:
+                action._image_check_batch = batch
+                action.execute()
+                del action._image_check_batch
+        
+        found = self.telemetry.get_template_stats(found_path)
+        missing = self.telemetry.get_template_stats(missing_path)
+        self.assertEqual((found['hits'], found['retries']), (1, 0))
+        self.assertEqual((missing['outcomes']['miss'], missing['retries']), (1, 2))
+        self.assertLess(missing['max_score'], 0.9)
+    
+    def test_export_json_and_csv(self):
+        import csv
+        import json
+        t = self.telemetry
+        t.record('图片/a.png', 0.004, 0.97, 0.9, 0, t.HIT)
+        t.record('b.png', 0.030, 0.5, 0.9, 2, t.MISS)
+        json_path = os.path.join(self.temp_dir, 'out', 'telemetry.json')
+        csv_path = os.path.join(self.temp_dir, 'telemetry.csv')
+        self.assertTrue(t.export(json_path))
+        self.assertTrue(t.export(csv_path))
+        
+        with open(json_path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(data['summary']['matches'], 2)
+        self.assertEqual(data['templates']['图片/a.png']['hits'], 1)
+        with open(csv_path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual({row['template'] for row in rows}, {'图片/a.png', 'b.png'})
+        row = next(r for r in rows if r['template'] == 'b.png')
+        self.assertEqual((row['miss'], row['retries']), ('1', '2'))
+        self.assertEqual(len(row['score_histogram'].split(';')), t.SCORE_BINS)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_headless_report(self):
+        import json
+        from core import benchmark
+        from core.frame_grabber import FrameGrabber
+        
+        previous = FrameGrabber._instance
+        report = benchmark.run_benchmark(resolutions=[(480, 320)], variants=('clean', 'scaled', 'absent'), repeats=3)
+        self.assertIs(FrameGrabber._instance, previous)
+        
+        report = json.loads(json.dumps(report))
+        self.assertEqual([case['variant'] for case in report['results']], ['clean', 'scaled', 'absent'])
+        for case in report['results']:
+            self.assertNotIn('error', case)
+            self.assertEqual(case['accuracy']['correct_rate'], 1.0)
+            self.assertLessEqual(case['latency_ms']['p50'], case['latency_ms']['max'])
+        self.assertEqual(report['results'][2]['accuracy']['found_rate'], 0.0)
+        
+        rows = benchmark.compare_results(report, report)
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row['ratio'] == 1.0 for row in rows))
+
+
 class TestPlayer(unittest.TestCase):
     def setUp(self):
         from core.player import Player, PlayerState
@@ -419,6 +2177,26 @@ class TestPlayer(unittest.TestCase):
         ]
         player.actions = actions
         self.assertEqual(len(player.actions), 1)
+    
+    def test_image_search_region_from_bound_window(self):
+        from core.actions import Action, ActionType
+        window_utils = MagicMock()
+        window_utils.get_client_rect_screen.return_value = (100, 200, 900, 800)
+        
+        player = self.Player()
+        player.set_window_hwnd(1234, window_utils)
+        player.set_image_search_padding(10)
+        
+        image_action = Action(action_type=ActionType.IMAGE_CHECK, params={'image_path': 'a.png'})
+        click_action = Action(action_type=ActionType.MOUSE_CLICK, params={'x': 1, 'y': 1})
+        self.assertEqual(player._get_image_search_region(image_action), (90, 190, 820, 620))
+        self.assertIsNone(player._get_image_search_region(click_action))
+    
+    def test_image_search_region_without_window(self):
+        from core.actions import Action, ActionType
+        player = self.Player()
+        image_action = Action(action_type=ActionType.IMAGE_CLICK, params={'image_path': 'a.png'})
+        self.assertIsNone(player._get_image_search_region(image_action))
 
 
 class TestExporter(unittest.TestCase):
@@ -464,6 +2242,32 @@ class TestExporter(unittest.TestCase):
         self.assertIn("pyautogui.click", code)
         self.assertIn("pyautogui.typewrite", code)
     
+    def test_export_image_match_modes(self):
+        actions = [
+            self.Action(action_type=self.ActionType.IMAGE_CLICK,
+                        params={'image_path': 'a.png', 'confidence': 0.8, 'color_mode': 'grayscale'}),
+            self.Action(action_type=self.ActionType.IMAGE_CHECK,
+                        params={'image_path': 'b.png', 'confidence': 0.9, 'match_scale': 0.5}),
+        ]
+        
+        exporter = self.Exporter()
+        code = exporter._generate_python_code(actions)
+        
+        self.assertIn("pyautogui.locateOnScreen(r'a.png', confidence=0.8, grayscale=True)", code)
+        self.assertIn("locate_on_screen_scaled(r'b.png', 0.9, 0.5, grayscale=False)", code)
+        self.assertIn("def locate_on_screen_scaled(", code)
+        compile(code, '<export>', 'exec')
+        
+        plain = exporter._generate_python_code(actions[:1])
+        self.assertNotIn("def locate_on_screen_scaled(", plain)
+        
+        for action in actions:
+            snippet = action.to_code()
+            self.assertIn(exporter._locate_code(action, f"r'{action.params['image_path']}'"), snippet)
+            compile("def run():\n" + snippet, '<to_code>', 'exec')
+        self.assertIn("def locate_on_screen_scaled(", actions[1].to_code())
+        self.assertNotIn("def locate_on_screen_scaled(", actions[0].to_code())
+    
     def test_export_to_python_file(self):
         actions = [
             self.Action(action_type=self.ActionType.MOUSE_CLICK, params={'x': 100, 'y': 200})
@@ -575,6 +2379,46 @@ class TestGUIComponents(unittest.TestCase):
         self.assertIsNotNone(widget)
         self.assertIsNotNone(widget._screen_pixmap)
         widget.close()
+    
+    def test_preview_overlay_caches_image_match(self):
+        import cv2
+        from gui.preview_overlay import PreviewOverlay
+        from core.change_detector import FrameChangeDetector
+        from core.frame_grabber import Frame, FrameGrabber
+        from core.image_matcher import ImageMatcher
+        
+        screen = make_synthetic_screen(400, 300)
+        template = make_synthetic_template(40, 30, seed=7)
+        screen[100:130, 200:240] = template
+        changed = screen.copy()
+        changed[250:290, 20:80] = 255
+        frames = [Frame(image, 0, 0, time.monotonic(), full_screen=True) for image in (screen, screen, changed)]
+        matcher = ImageMatcher(use_hints=False)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'target.png')
+            cv2.imwrite(path, template)
+            overlay = PreviewOverlay()
+            overlay._preview_type = 'image'
+            overlay._preview_data = {'image_path': path, 'confidence': 0.9, 'options': None}
+            overlay._image_generation = 1
+            detector = FrameChangeDetector()
+            
+            with patch.object(ImageMatcher, 'get_instance', return_value=matcher), \
+                 patch.object(FrameGrabber.get_instance(), 'grab', side_effect=frames), \
+                 patch.object(matcher, 'locate_in_frame', wraps=matcher.locate_in_frame) as locate:
+                for force in (True, False, False):
+                    masks = overlay._image_overlay_rects(overlay._image_result)
+                    overlay._image_match_worker(1, dict(overlay._preview_data), detector, force, masks, (200, 150))
+                    if locate.call_count == 1:
+                        location = overlay._image_result['location']
+                        self.assertEqual((location.left, location.top), (200, 100))
+                        self.assertGreater(overlay._image_result['actual_confidence'], 0.99)
+            
+            self.assertEqual(locate.call_count, 2)
+            overlay._on_image_match_ready(0, {'location': None, 'actual_confidence': 0.1, 'error': None})
+            self.assertIsNotNone(overlay._image_result['location'])
+            overlay.close()
 
 
 class TestIntegration(unittest.TestCase):
@@ -636,6 +2480,25 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestActionGroup))
     suite.addTests(loader.loadTestsFromTestCase(TestActionGroupManager))
     suite.addTests(loader.loadTestsFromTestCase(TestRecorder))
+    suite.addTests(loader.loadTestsFromTestCase(TestTemplateCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestImageMatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestImageCheckBatch))
+    suite.addTests(loader.loadTestsFromTestCase(TestFrameGrabber))
+    suite.addTests(loader.loadTestsFromTestCase(TestMultiMonitor))
+    suite.addTests(loader.loadTestsFromTestCase(TestCaptureBackend))
+    suite.addTests(loader.loadTestsFromTestCase(TestPixelProbe))
+    suite.addTests(loader.loadTestsFromTestCase(TestChangeDetector))
+    suite.addTests(loader.loadTestsFromTestCase(TestMatchHints))
+    suite.addTests(loader.loadTestsFromTestCase(TestMultiScaleMatch))
+    suite.addTests(loader.loadTestsFromTestCase(TestFindAllMatches))
+    suite.addTests(loader.loadTestsFromTestCase(TestParallelMatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestPrefilter))
+    suite.addTests(loader.loadTestsFromTestCase(TestFFTCorrelation))
+    suite.addTests(loader.loadTestsFromTestCase(TestTemplateAtlas))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnchoredSearch))
+    suite.addTests(loader.loadTestsFromTestCase(TestMatchResultCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestMatchTelemetry))
+    suite.addTests(loader.loadTestsFromTestCase(TestBenchmark))
     suite.addTests(loader.loadTestsFromTestCase(TestPlayer))
     suite.addTests(loader.loadTestsFromTestCase(TestExporter))
     suite.addTests(loader.loadTestsFromTestCase(TestConfig))
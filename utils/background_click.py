@@ -8,7 +8,7 @@ from ctypes import wintypes
 from dataclasses import dataclass
 from typing import Optional, Tuple, List
 
-user32 = ctypes.windll.user32
+user32 = ctypes.windll.user32 if sys.platform == 'win32' else None
 
 WM_LBUTTONDOWN = 0x0201
 WM_LBUTTONUP = 0x0202
@@ -30,6 +30,23 @@ class Config:
     
     last_dashboard_list: str = ''
     
+    image_search_padding: int = 0
+    image_match_engine: str = 'pyramid'
+    frame_tick_ms: int = 50
+    capture_backend: str = 'auto'
+    image_match_hints: bool = True
+    image_multi_scale: bool = False
+    image_match_scales: list = field(default_factory=lambda: [1.0, 1.25, 1.5, 1.75, 2.0, 0.8, 0.67])
+    match_backend: str = 'serial'
+    match_workers: int = 0
+    image_prefilter: bool = False
+    image_fft: bool = True
+    template_atlas: bool = True
+    match_result_cache: bool = True
+    match_result_ttl: float = 30.0
+    match_telemetry: bool = True
+    match_telemetry_export: str = ''
+    
     _config_path: str = field(default='', repr=False)
     
     def __post_init__(self):
@@ -66,6 +83,22 @@ class Config:
                 'infinite_loop': self.infinite_loop,
                 'timeout_seconds': self.timeout_seconds,
                 'last_dashboard_list': self.last_dashboard_list,
+                'image_search_padding': self.image_search_padding,
+                'image_match_engine': self.image_match_engine,
+                'frame_tick_ms': self.frame_tick_ms,
+                'capture_backend': self.capture_backend,
+                'image_match_hints': self.image_match_hints,
+                'image_multi_scale': self.image_multi_scale,
+                'image_match_scales': self.image_match_scales,
+                'match_backend': self.match_backend,
+                'match_workers': self.match_workers,
+                'image_prefilter': self.image_prefilter,
+                'image_fft': self.image_fft,
+                'template_atlas': self.template_atlas,
+                'match_result_cache': self.match_result_cache,
+                'match_result_ttl': self.match_result_ttl,
+                'match_telemetry': self.match_telemetry,
+                'match_telemetry_export': self.match_telemetry_export,
             }
             
             with open(save_path, 'w', encoding='utf-8') as f:
@@ -107,6 +140,22 @@ class Config:
             self.infinite_loop = data.get('infinite_loop', False)
             self.timeout_seconds = data.get('timeout_seconds', 0)
             self.last_dashboard_list = data.get('last_dashboard_list', '')
+            self.image_search_padding = data.get('image_search_padding', self.image_search_padding)
+            self.image_match_engine = data.get('image_match_engine', self.image_match_engine)
+            self.frame_tick_ms = data.get('frame_tick_ms', self.frame_tick_ms)
+            self.capture_backend = data.get('capture_backend', self.capture_backend)
+            self.image_match_hints = data.get('image_match_hints', self.image_match_hints)
+            self.image_multi_scale = data.get('image_multi_scale', self.image_multi_scale)
+            self.image_match_scales = data.get('image_match_scales', self.image_match_scales)
+            self.match_backend = data.get('match_backend', self.match_backend)
+            self.match_workers = data.get('match_workers', self.match_workers)
+            self.image_prefilter = data.get('image_prefilter', self.image_prefilter)
+            self.image_fft = data.get('image_fft', self.image_fft)
+            self.template_atlas = data.get('template_atlas', self.template_atlas)
+            self.match_result_cache = data.get('match_result_cache', self.match_result_cache)
+            self.match_result_ttl = data.get('match_result_ttl', self.match_result_ttl)
+            self.match_telemetry = data.get('match_telemetry', self.match_telemetry)
+            self.match_telemetry_export = data.get('match_telemetry_export', self.match_telemetry_export)
             
             return True
         except Exception as e: